@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+
+import contextlib
+import io
+import json
+import logging
+import os
+import random
+import statistics
+import time
+from collections.abc import Callable, Iterable
+from datetime import datetime
+from typing import Any, override
+
+from django.conf import settings
+from django.core.management import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext, override_settings
+
+from apps.actions.management.digester import build_digester
+from apps.actions.management.helpers import synthetic
+from apps.entities.models import Entity
+from apps.entities.services import EntityService
+from apps.participants.models import Participant
+from apps.participants.services import ParticipantService
+from apps.races.models import Flag, Race, Trophy
+from apps.races.services import CompetitionService, RaceService, TrophyService
+from apps.utils import build_client
+from apps.utils.choices import CATEGORY_ABSOLUT, ENTITY_CLUB, GENDER_MALE, RACE_CONVENTIONAL, RACE_TRAINERA
+from rscraping.data.models import Datasource
+from rscraping.data.models import Participant as RSParticipant
+from rscraping.data.models import Race as RSRace
+
+logger = logging.getLogger(__name__)
+
+# a cache that never stores anything, so the cached queries are timed instead of the cache lookups
+_NO_CACHE = {"default": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"}}
+
+# errors raised by the services for inputs that can't be resolved, counted instead of aborting the run
+_EXPECTED_ERRORS = (
+    AssertionError,
+    Entity.DoesNotExist,
+    Entity.MultipleObjectsReturned,
+    Flag.DoesNotExist,
+    Flag.MultipleObjectsReturned,
+    Race.DoesNotExist,
+    Race.MultipleObjectsReturned,
+    Trophy.DoesNotExist,
+    Trophy.MultipleObjectsReturned,
+)
+
+
+class Command(BaseCommand):
+    help = """
+    Generate a seeded synthetic dataset and time the matching services, speed queries and digester on it.
+
+    Everything runs inside a transaction that is rolled back, so the dataset is never persisted, and with a dummy cache,
+    so the cached queries are timed too. Results are written as JSON so runs with different scales or code versions can
+    be compared.
+    """
+
+    @override
+    def add_arguments(self, parser):
+        parser.add_argument("--scale", type=float, default=1, help="dataset size relative to the production one.")
+        parser.add_argument("--seed", type=int, default=0, help="seed used to generate the dataset and inputs.")
+        parser.add_argument("--inputs", type=int, default=50, help="number of inputs for each benchmark.")
+        parser.add_argument("--repeat", type=int, default=3, help="times each benchmark runs over its inputs.")
+        parser.add_argument("-o", "--output", type=str, default=None, help="file where the JSON results are written.")
+
+    @override
+    def handle(self, *_, **options):
+        logger.debug(f"{options}")
+        scale, seed, inputs, repeat = options["scale"], options["seed"], options["inputs"], options["repeat"]
+
+        with transaction.atomic():
+            started = time.perf_counter()
+            dataset = synthetic.generate(scale=scale, seed=seed)
+            generation = time.perf_counter() - started
+
+            rng = random.Random(seed)
+            with override_settings(CACHES=_NO_CACHE):
+                results = {
+                    name: run_benchmark(function, cases, repeat)
+                    for name, function, cases in build_benchmarks(dataset, rng, inputs)
+                }
+            transaction.set_rollback(True)
+
+        report = {
+            "date": datetime.now().isoformat(),
+            "scale": scale,
+            "seed": seed,
+            "inputs": inputs,
+            "repeat": repeat,
+            "dataset": dataset.counts,
+            "generation": generation,
+            "results": results,
+        }
+
+        output = options["output"] or os.path.join(
+            settings.LOG_ROOT,
+            "benchmarks",
+            f"{datetime.now().strftime('%Y%m%d%H%M%S')}-x{scale}.json",
+        )
+        os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+        with open(output, "w") as file:
+            json.dump(report, file, indent=4)
+
+        for name, result in results.items():
+            self.stdout.write(
+                f"{name:<28} mean={result['mean'] * 1000:8.2f}ms p95={result['p95'] * 1000:8.2f}ms "
+                f"queries={result['queries']:<6} errors={result['errors']}"
+            )
+        self.stdout.write(f"results written to {output}")
+
+
+def build_benchmarks(
+    dataset: synthetic.SyntheticDataset,
+    rng: random.Random,
+    inputs: int,
+) -> Iterable[tuple[str, Callable[..., Any], list[tuple]]]:
+    """
+    Benchmarks as (name, function, arguments of each call) built from representative inputs of the dataset.
+    """
+
+    def sample[T](items: list[T]) -> list[T]:
+        return [rng.choice(items) for _ in range(inputs)]
+
+    clubs, flags, races = sample(dataset.clubs), sample(dataset.flags), sample(dataset.races)
+    league_races = [r for r in dataset.races if r.league] or dataset.races
+
+    yield (
+        "entity_closest_by_name",
+        EntityService.get_closest_by_name_type,
+        [(rng.choice(club.known_names), ENTITY_CLUB) for club in clubs],
+    )
+    yield (
+        "competition_closest_by_name",
+        CompetitionService.get_closest_by_name,
+        [(Flag, flag.name) for flag in flags],
+    )
+    if dataset.trophies:
+        yield (
+            "trophy_closest_by_name",
+            CompetitionService.get_closest_by_name,
+            [(Trophy, trophy.name) for trophy in sample(dataset.trophies)],
+        )
+    yield (
+        "race_closest_match",
+        RaceService.get_closest_match,
+        [(None, r.flag, r.league, r.gender, r.category, r.date, r.day) for r in races],
+    )
+    yield (
+        "race_keywords",
+        lambda keywords: list(RaceService.filter(Race.objects.all(), {"keywords": keywords})[:50]),
+        [(rng.choice(flag.name.split()[1:]),) for flag in flags],
+    )
+    yield (
+        "year_speeds",
+        ParticipantService.get_year_speeds_filtered_by,
+        [(club, None, None, GENDER_MALE, CATEGORY_ABSOLUT, 1, False, False, True) for club in clubs],
+    )
+    yield (
+        "nth_speed",
+        ParticipantService.get_nth_speed_filtered_by,
+        [(1, None, r.league, r.gender, r.category, r.date.year, 1, False, True, False) for r in sample(league_races)],
+    )
+
+    trophy_races = [r for r in dataset.races if r.trophy]
+    if trophy_races:
+        yield (
+            "trophy_edition",
+            TrophyService.infer_trophy_edition,
+            [(r.trophy, r.gender, r.category, r.date.year) for r in sample(trophy_races)],
+        )
+
+    digester = build_digester(build_client(Datasource.TRAINERAS, GENDER_MALE, CATEGORY_ABSOLUT))
+    race = _rs_race()
+    yield (
+        "digester_retrieve_clubs",
+        digester.retrieve_clubs,
+        [
+            ([_rs_participant(rng.choice(c.known_names), race) for c in rng.sample(clubs, min(10, len(clubs)))],)
+            for _ in range(max(1, inputs // 10))
+        ],
+    )
+
+    # races of a year after the dataset ones, named after their competitions and editions so nothing is prompted
+    year = max(r.date.year for r in dataset.races) + 1
+    yield (
+        "digester_ingest_race",
+        _quiet(digester.ingest),
+        [
+            (
+                _rs_race(
+                    name=r.race_names[0],
+                    date=f"01/07/{year}",
+                    normalized_names=([(r.trophy.name, r.trophy_edition)] if r.trophy else [])
+                    + [(r.flag.name, r.flag_edition)],
+                ),
+            )
+            for r in races
+        ],
+    )
+
+    # participants of clubs that didn't row the race, so they are never merged with an existing one
+    rowed = set(Participant.objects.filter(race__in=races).values_list("race_id", "club_id"))
+    candidates = [(r, rng.choice(dataset.clubs)) for r in races]
+    yield (
+        "digester_ingest_participant",
+        _quiet(digester.ingest_participant),
+        [(r, _rs_participant(c.name, race), False, c) for r, c in candidates if (r.pk, c.pk) not in rowed],
+    )
+
+
+def run_benchmark(function: Callable[..., Any], cases: list[tuple], repeat: int) -> dict[str, Any]:
+    timings, errors = [], 0
+    with CaptureQueriesContext(connection) as queries:
+        for _ in range(repeat):
+            for args in cases:
+                started = time.perf_counter()
+                try:
+                    function(*args)
+                except _EXPECTED_ERRORS:
+                    errors += 1
+                timings.append(time.perf_counter() - started)
+
+    timings.sort()
+    return {
+        "calls": len(timings),
+        "errors": errors,
+        "queries": len(queries),
+        "total": sum(timings),
+        "mean": statistics.mean(timings),
+        "median": statistics.median(timings),
+        "p95": timings[min(len(timings) - 1, int(len(timings) * 0.95))],
+        "min": timings[0],
+        "max": timings[-1],
+    }
+
+
+def _quiet(function: Callable[..., Any]) -> Callable[..., Any]:
+    """
+    Discard what the digester prints for the user to review, keeping the benchmark output readable.
+    """
+
+    def wrapper(*args):
+        with contextlib.redirect_stdout(io.StringIO()):
+            return function(*args)
+
+    return wrapper
+
+
+def _rs_race(
+    name: str = "BENCHMARK",
+    date: str = "01/07/2024",
+    normalized_names: list[tuple[str, int | None]] | None = None,
+) -> RSRace:
+    return RSRace(
+        name=name,
+        date=date,
+        day=1,
+        modality=RACE_TRAINERA,
+        type=RACE_CONVENTIONAL,
+        league=None,
+        town=None,
+        organizer=None,
+        sponsor=None,
+        normalized_names=normalized_names or [(name, None)],
+        race_ids=["1"],
+        url=None,
+        datasource=Datasource.TRAINERAS.value,
+        gender=GENDER_MALE,
+        category=CATEGORY_ABSOLUT,
+        participants=[],
+        race_laps=4,
+        race_lanes=4,
+        cancelled=False,
+    )
+
+
+def _rs_participant(name: str, race: RSRace) -> RSParticipant:
+    return RSParticipant(
+        club_name=name,
+        participant=name,
+        gender=GENDER_MALE,
+        category=CATEGORY_ABSOLUT,
+        lane=1,
+        series=1,
+        handicap=None,
+        laps=["05:30.00", "11:00.00", "16:30.00", "22:00.00"],
+        distance=5556,
+        retired=False,
+        absent=False,
+        guest=False,
+        race=race,
+    )
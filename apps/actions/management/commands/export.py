@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+
+import logging
+import os
+import shutil
+from itertools import batched
+from typing import override
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+from django.core.management import BaseCommand
+from django.db.models import Exists, F, OuterRef, QuerySet
+from django.db.models.functions import Coalesce, ExtractYear
+
+from apps.participants.models import Participant, Penalty
+from apps.races.models import Race
+from apps.utils import db
+
+logger = logging.getLogger(__name__)
+
+_DICTIONARY = pa.dictionary(pa.int32(), pa.string())
+_PARTITIONS = ["year", "gender"]
+
+RACES_SCHEMA = pa.schema(
+    [
+        ("id", pa.int64()),
+        ("date", pa.date32()),
+        ("year", pa.int16()),
+        ("gender", pa.string()),
+        ("category", _DICTIONARY),
+        ("modality", _DICTIONARY),
+        ("type", _DICTIONARY),
+        ("day", pa.int16()),
+        ("competition", _DICTIONARY),
+        ("trophy_name", _DICTIONARY),
+        ("trophy_edition", pa.int16()),
+        ("flag_name", _DICTIONARY),
+        ("flag_edition", pa.int16()),
+        ("league_name", _DICTIONARY),
+        ("sponsor", _DICTIONARY),
+        ("town_name", _DICTIONARY),
+        ("laps", pa.int16()),
+        ("lanes", pa.int16()),
+        ("cancelled", pa.bool_()),
+    ]
+)
+
+PARTICIPANTS_SCHEMA = pa.schema(
+    [
+        ("id", pa.int64()),
+        ("race_id", pa.int64()),
+        ("year", pa.int16()),
+        ("gender", pa.string()),
+        ("category", _DICTIONARY),
+        ("club_id", pa.int64()),
+        ("club_name", _DICTIONARY),
+        ("branch", _DICTIONARY),
+        ("league_name", _DICTIONARY),
+        ("competition", _DICTIONARY),
+        ("day", pa.int16()),
+        ("distance", pa.int32()),
+        ("lane", pa.int16()),
+        ("series", pa.int16()),
+        ("laps_cs", pa.list_(pa.int32())),
+        ("time_cs", pa.int32()),
+        ("guest", pa.bool_()),
+        ("absent", pa.bool_()),
+        ("retired", pa.bool_()),
+        ("disqualified", pa.bool_()),
+    ]
+)
+
+PENALTIES_SCHEMA = pa.schema(
+    [
+        ("id", pa.int64()),
+        ("participant_id", pa.int64()),
+        ("race_id", pa.int64()),
+        ("year", pa.int16()),
+        ("gender", pa.string()),
+        ("penalty", pa.int32()),
+        ("disqualification", pa.bool_()),
+        ("reason", _DICTIONARY),
+    ]
+)
+
+
+class Command(BaseCommand):
+    help = """
+    Export races, participants and penalties to a Parquet dataset partitioned by year and gender.
+
+    Each table is written to its own folder inside 'output', replacing any previous export.
+    """
+
+    @override
+    def add_arguments(self, parser):
+        parser.add_argument("output", type=str, help="folder where the Parquet datasets will be written.")
+        parser.add_argument("--chunk-size", type=int, default=5000, help="number of rows fetched and written at once.")
+
+    @override
+    def handle(self, *_, **options):
+        logger.debug(f"{options}")
+        output, chunk_size = options["output"], options["chunk_size"]
+
+        with db.read_replica():
+            self.export(races_queryset(), RACES_SCHEMA, os.path.join(output, "races"), chunk_size)
+            self.export(
+                participants_queryset(),
+                PARTICIPANTS_SCHEMA,
+                os.path.join(output, "participants"),
+                chunk_size,
+                with_speed=True,
+            )
+            self.export(penalties_queryset(), PENALTIES_SCHEMA, os.path.join(output, "penalties"), chunk_size)
+
+    def export(self, queryset: QuerySet, schema: pa.Schema, path: str, chunk_size: int, with_speed: bool = False):
+        logger.info(f"exporting {queryset.model.__name__} to {path}")
+        if os.path.exists(path):
+            shutil.rmtree(path)
+
+        # '.iterator' streams the rows using a server-side cursor
+        rows = queryset.order_by("pk").values(*schema.names).iterator(chunk_size=chunk_size)
+        for idx, chunk in enumerate(batched(rows, chunk_size)):
+            table = pa.Table.from_pylist(list(chunk), schema=schema)
+            if with_speed:
+                table = table.append_column("speed", compute_speed(table))
+
+            pq.write_to_dataset(
+                table,
+                root_path=path,
+                partition_cols=_PARTITIONS,
+                basename_template=f"part-{idx}-{{i}}.parquet",
+                existing_data_behavior="overwrite_or_ignore",
+            )
+            logger.info(f"written {(idx * chunk_size) + table.num_rows} rows")
+
+
+def compute_speed(table: pa.Table) -> pa.ChunkedArray:
+    """
+    Speed in km/h of each participant, NULL when the distance or the final time are unknown.
+    """
+    time_cs = pc.if_else(pc.greater(table["time_cs"], 0), table["time_cs"], pa.scalar(None, pa.int32()))
+    seconds = pc.divide(pc.cast(time_cs, pa.float64()), 100)
+    return pc.multiply(pc.divide(pc.cast(table["distance"], pa.float64()), seconds), 3.6)
+
+
+def races_queryset() -> QuerySet[Race]:
+    return Race.objects.annotate(
+        year=ExtractYear("date"),
+        competition=Coalesce("trophy__name", "flag__name"),
+        trophy_name=F("trophy__name"),
+        flag_name=F("flag__name"),
+        league_name=F("league__name"),
+        town_name=F("place__town__name"),
+    )
+
+
+def participants_queryset() -> QuerySet[Participant]:
+    disqualifications = Penalty.objects.filter(participant=OuterRef("pk"), disqualification=True)
+    return Participant.objects.annotate(
+        year=ExtractYear("race__date"),
+        club_name=F("club__name"),
+        league_name=F("race__league__name"),
+        competition=Coalesce("race__trophy__name", "race__flag__name"),
+        day=F("race__day"),
+        disqualified=Exists(disqualifications),
+    )
+
+
+def penalties_queryset() -> QuerySet[Penalty]:
+    return Penalty.objects.annotate(
+        race_id=F("participant__race_id"),
+        year=ExtractYear("participant__race__date"),
+        gender=F("participant__gender"),
+    )
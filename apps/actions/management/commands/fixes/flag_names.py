@@ -1,11 +1,11 @@
 #!/usr/bin/env python
 
 import logging
-import time
 from typing import override
 
-from django.core.management import BaseCommand
+from django.db.models import QuerySet
 
+from apps.actions.management.helpers.repair import RepairCommand
 from apps.races.models import Flag
 from apps.utils import build_client
 from rscraping.clients import TrainerasClient
@@ -15,35 +15,60 @@ from rscraping.data.models import Datasource
 logger = logging.getLogger(__name__)
 
 
-class Command(BaseCommand):
+class Command(RepairCommand):
     help = """"""
 
+    client: TrainerasClient = build_client(Datasource.TRAINERAS, GENDER_FEMALE, CATEGORY_ABSOLUT)  # type: ignore
+    update_fields = {Flag: ["metadata"]}
+
+    @override
+    def get_queryset(self, **_) -> QuerySet[Flag]:
+        return Flag.objects.filter(pk__gt=0, verified=False)
+
     @override
-    def handle(self, *_, **options):
-        client: TrainerasClient = build_client(Datasource.TRAINERAS, GENDER_FEMALE, CATEGORY_ABSOLUT)  # type: ignore
-        for flag in Flag.objects.filter(pk__gt=0, verified=False).order_by("id"):
-            if len(flag.metadata["datasource"]) == 0:
-                # TODO:
+    def fetch(self, flag: Flag) -> dict[str, list[tuple[str, int | None]]] | None:
+        if len(flag.metadata["datasource"]) == 0:
+            # TODO:
+            return None
+
+        names: dict[str, list[tuple[str, int | None]]] = {}
+        for datasource in flag.metadata["datasource"]:
+            if datasource["datasource_name"] != Datasource.TRAINERAS or "ref_name" in datasource:
                 continue
-            for datasource in flag.metadata["datasource"]:
-                if datasource["datasource_name"] != Datasource.TRAINERAS or "ref_name" in datasource:
-                    continue
-
-                logger.info(f"parsing name={flag.name} ref_id={datasource['ref_id']}")
-                race_ids = client.get_race_ids_by_flag(datasource["ref_id"])
-                for race_id in race_ids:
-                    race = client.get_race_by_id(race_id, table=1)
-                    if race is not None:
-                        if len(race.normalized_names) == 1:
-                            logger.info(f"updating flag id={flag.pk} with ref_name={race.normalized_names[0][0]}")
-                            datasource["ref_name"] = race.normalized_names[0][0]
-                        else:
-                            print(race.normalized_names)
-                            idx = -1
-                            while idx < 0 or idx > len(race.normalized_names):
-                                idx = int(input("select name index: "))
-                            logger.info(f"updating flag id={flag.pk} with ref_name={race.normalized_names[idx][0]}")
-                            datasource["ref_name"] = race.normalized_names[idx][0]
-                        break
-            flag.save()
-            time.sleep(10)
+
+            logger.info(f"parsing name={flag.name} ref_id={datasource['ref_id']}")
+            race_ids = self.client.get_race_ids_by_flag(datasource["ref_id"])
+            for race_id in race_ids:
+                race = self.client.get_race_by_id(race_id, table=1)
+                if race is not None:
+                    names[datasource["ref_id"]] = race.normalized_names
+                    break
+        return names
+
+    @override
+    def prepare(self, flag: Flag, names: dict[str, list[tuple[str, int | None]]]) -> dict[str, str]:
+        ref_names: dict[str, str] = {}
+        for ref_id, normalized_names in names.items():
+            if not normalized_names:
+                continue
+
+            if len(normalized_names) == 1:
+                ref_names[ref_id] = normalized_names[0][0]
+            else:
+                print(normalized_names)
+                idx = -1
+                while idx < 0 or idx >= len(normalized_names):
+                    idx = int(input("select name index: "))
+                ref_names[ref_id] = normalized_names[idx][0]
+        return ref_names
+
+    @override
+    def process(self, flag: Flag, ref_names: dict[str, str]) -> list[Flag]:
+        for datasource in flag.metadata["datasource"]:
+            ref_name = ref_names.get(datasource["ref_id"])
+            if datasource["datasource_name"] != Datasource.TRAINERAS or not ref_name:
+                continue
+
+            logger.info(f"updating flag id={flag.pk} with ref_name={ref_name}")
+            datasource["ref_name"] = ref_name
+        return [flag] if ref_names else []
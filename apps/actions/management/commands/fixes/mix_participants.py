@@ -1,159 +1,118 @@
 #!/usr/bin/env python3
 
 import logging
-import time
-from collections.abc import Generator
 from datetime import datetime
+from typing import override
 
-from django.core.management import BaseCommand
 from django.db.models import QuerySet
 
 from apps.actions.management.digester._digester import Digester
+from apps.actions.management.helpers.repair import RepairCommand
 from apps.participants.models import Participant
-from apps.races.models import Flag, Race
+from apps.participants.services import ParticipantService
+from apps.races.models import Race
 from pyutils.dicts import clean_dict
 from rscraping.clients import TrainerasClient
-from rscraping.data.constants import CATEGORY_ABSOLUT, CATEGORY_SCHOOL, GENDER_ALL, GENDER_MIX
+from rscraping.data.constants import CATEGORY_ABSOLUT, CATEGORY_SCHOOL, CATEGORY_VETERAN, GENDER_ALL, GENDER_MIX
 from rscraping.data.models import Datasource
-from rscraping.data.models import Participant as RSParticipant
+from rscraping.data.models import Race as RSRace
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.DEBUG)
 
-file_handler = logging.FileHandler("fixes4.log")
-formatter = logging.Formatter("%(levelname)s %(asctime)s %(message)s")
-file_handler.setFormatter(formatter)
-logger.addHandler(file_handler)
 
-
-class Command(BaseCommand):
+class Command(RepairCommand):
     client = TrainerasClient(source=Datasource.TRAINERAS, gender=GENDER_MIX, category=CATEGORY_ABSOLUT)
     digester = Digester(client, force_gender=True, force_category=True)
+    datasource = Datasource.TRAINERAS
+    # school participants are matched first as they are the most likely to be mixed
+    categories = [CATEGORY_SCHOOL, CATEGORY_ABSOLUT, CATEGORY_VETERAN]
+
+    update_fields = {
+        Race: ["metadata"],
+        Participant: ["metadata", "gender", "category"],
+    }
+
+    @override
+    def get_queryset(self, **_) -> QuerySet[Race]:
+        return Race.objects.prefetch_related("participants").filter(
+            gender=GENDER_ALL,
+            flag__metadata__datasource__contains=[{"datasource_name": self.datasource.value}],
+            metadata__datasource__contains=[{"datasource_name": self.datasource.value}],
+        )
 
-    def filter_races(
-        self,
-        races: QuerySet[Race],
-        datasource: Datasource,
-        race_refs: list[str],
-    ) -> Generator[tuple[Race, str]]:
-        for race in races:
-            if race.gender != GENDER_ALL:
+    @override
+    def fetch(self, db_race: Race) -> list[tuple[str, RSRace | None]]:
+        return [
+            (ds["ref_id"], self.client.get_race_by_id(ds["ref_id"]))
+            for ds in db_race.metadata["datasource"]
+            if ds["datasource_name"] == self.datasource.value
+        ]
+
+    @override
+    def process(self, db_race: Race, races: list[tuple[str, RSRace | None]]) -> list[Race | Participant]:
+        updated: list[Race | Participant] = []
+        for ref_id, race in races:
+            # ensure parsed data is what we expect
+            if not race:
+                logger.error(f"no race found for {ref_id=}")
                 continue
-            for ds in race.metadata["datasource"]:
-                if ds["datasource_name"] == datasource.value and ds["ref_id"] in race_refs:
-                    yield (race, ds["ref_id"])
-
-    def filter_flags(self, flags: QuerySet[Flag], datasource: Datasource) -> Generator[tuple[Flag, str]]:
-        for flag in flags:
-            for ds in flag.metadata["datasource"]:
-                if ds["datasource_name"] == datasource.value:
-                    yield (flag, ds["ref_id"])
-
-    def handle(self, *_, **options):
-        logger.info(f"{options}")
-        assert isinstance(self.client, TrainerasClient)
-
-        datasource = Datasource.TRAINERAS
-        flags = Flag.objects.filter(
-            pk__in=Race.objects.filter(gender=GENDER_ALL).values_list("flag_id", flat=True),
-            metadata__datasource__contains=[{"datasource_name": datasource.value}],
-        )
-        flags = list(self.filter_flags(flags, datasource))
-        num_flags = len(flags)
-        for i, (flag, flag_ref) in enumerate(flags):
-            logger.info(f"processing flag {i + 1}/{num_flags} :: {flag.pk} - {flag}")
-
-            # find traineras.es MIX races
-            race_refs = list(self.client.get_race_ids_by_flag(flag_ref))
-            if len(race_refs) < 1:
+            if race.gender != GENDER_MIX:
+                logger.error("found race is not a MIX race")
                 continue
 
-            # filter races with given race_refs
-            races = Race.objects.prefetch_related("participants").filter(
-                flag=flag,
-                metadata__datasource__contains=[{"datasource_name": datasource.value}],
-            )
-            races = list(self.filter_races(races, datasource, race_refs))
-            num_races = len(races)
-            for j, (db_race, ref_id) in enumerate(races):
-                logger.info(f"processing race {j + 1}/{num_races} :: {db_race.pk} - {db_race}")
-                race = self.client.get_race_by_id(ref_id)
-                # ensure parsed data is what we expect
-                if not race:
-                    logger.error(f"no race found for {ref_id=}")
-                    continue
-                if race.gender != GENDER_MIX:
-                    logger.error("found race is not a MIX race")
-                    continue
+            # get mix participants (every participant should be a mix participant)
+            participants = [p for p in race.participants if p.gender == GENDER_MIX]
+            race.participants = []
+            if len(participants) < 1:
+                logger.error("no mix participants found")
+                continue
 
-                # get mix participants (every participant should be a mix participant)
-                participants = [p for p in race.participants if p.gender == GENDER_MIX]
-                race.participants = []
-                if len(participants) < 1:
-                    logger.error("no mix participants found")
+            ds = db_race.get_datasources(self.datasource, ref_id)
+            assert len(ds) == 1, "more than one datasource found"
+
+            ds = ds[0]
+            race_d = race.to_dict()
+            race_d.pop("participants")
+            race_d = clean_dict(race_d)
+            ds["data"] = race_d
+            ds["date"] = datetime.now().date().isoformat()
+            logger.info("updating race metadata")
+
+            to_update = []
+            index = ParticipantService.get_final_time_index(db_race.participants.all())
+            for participant in participants:
+                try:
+                    match = ParticipantService.find_by_final_time(index, participant, categories=self.categories)
+                except Participant.MultipleObjectsReturned as e:
+                    logger.error(f"ambiguous match for {participant=}: {e}")
                     continue
 
-                ds = db_race.get_datasources(datasource, ref_id)
-                assert len(ds) == 1, "more than one datasource found"
-
-                ds = ds[0]
-                race_d = race.to_dict()
-                race_d.pop("participants")
-                race_d = clean_dict(race_d)
-                ds["data"] = race_d
-                ds["date"] = datetime.now().date().isoformat()
-                logger.info("updating race metadata")
-
-                to_update = []
-                for participant in participants:
-                    match = self.find_participant(participant, list(db_race.participants.all()))
-
-                    if not match:
-                        logger.error(f"no match found for {participant=}")
-                        continue
-
-                    match.gender = GENDER_MIX
-                    match.category = CATEGORY_ABSOLUT
-
-                    ds_p = match.get_datasources(datasource)
-                    assert len(ds_p) == 1, "more than one datasource found"
-
-                    ds_p = ds_p[0]
-                    participant_d = participant.to_dict()
-                    participant_d.pop("penalty", None)
-                    participant_d.pop("race", None)
-                    participant_d = clean_dict(participant_d)
-                    ds_p["data"] = participant_d
-                    ds_p["date"] = datetime.now().date().isoformat()
-                    logger.info("updating participant metadata")
+                if not match:
+                    logger.error(f"no match found for {participant=}")
+                    continue
 
-                    to_update.append(match)
+                match.gender = GENDER_MIX
+                match.category = CATEGORY_ABSOLUT
 
-                assert len(to_update) > 0, "no participants to update"
+                ds_p = match.get_datasources(self.datasource)
+                assert len(ds_p) == 1, "more than one datasource found"
 
-                logger.info(f"updating {len(to_update)} participants")
-                Participant.objects.bulk_update(to_update, ["metadata", "gender", "category"])
-                logger.info(f"updating {db_race=}")
-                db_race.save()
+                ds_p = ds_p[0]
+                participant_d = participant.to_dict()
+                participant_d.pop("penalty", None)
+                participant_d.pop("race", None)
+                participant_d = clean_dict(participant_d)
+                ds_p["data"] = participant_d
+                ds_p["date"] = datetime.now().date().isoformat()
+                logger.info("updating participant metadata")
 
-                time.sleep(5)
-            time.sleep(5)
+                to_update.append(match)
 
-    def find_participant(self, participant: RSParticipant, db_participants: list[Participant]) -> Participant | None:
-        if len(participant.laps) < 1:
-            return
+            if not to_update:
+                logger.error(f"no participants to update for {ref_id=}")
+                return []
 
-        for p in db_participants:
-            if len(p.laps) < 1:
-                continue
-            if (
-                p.category == CATEGORY_SCHOOL
-                and p.laps[-1] == datetime.strptime(participant.laps[-1], "%M:%S.%f").time()
-            ):
-                return p
-
-        for p in db_participants:
-            if len(p.laps) < 1:
-                continue
-            if p.laps[-1] == datetime.strptime(participant.laps[-1], "%M:%S.%f").time():
-                return p
+            logger.info(f"updating {len(to_update)} participants of {db_race=}")
+            updated.extend([db_race, *to_update])
+        return updated
@@ -1,15 +1,18 @@
 #!/usr/bin/env python3
 
 import logging
-import time
-from collections.abc import Generator
+from dataclasses import dataclass, field
 from datetime import datetime
+from typing import override
 
 import inquirer
-from django.core.management import BaseCommand
-from django.db.models import Q, QuerySet
+from django.db.models import Exists, OuterRef, QuerySet
 
 from apps.actions.management.digester._digester import Digester
+from apps.actions.management.helpers.downloads import reuse_downloads
+from apps.actions.management.helpers.input import input_club
+from apps.actions.management.helpers.repair import RepairCommand
+from apps.entities.models import Entity
 from apps.entities.services import EntityService
 from apps.participants.models import Participant, Penalty
 from apps.participants.services import ParticipantService
@@ -17,20 +20,27 @@ from apps.races.models import Race
 from apps.schemas import MetadataBuilder
 from pyutils.dicts import clean_dict
 from rscraping.clients import Client, TrainerasClient
-from rscraping.data.checks import is_branch_club
 from rscraping.data.constants import CATEGORY_ABSOLUT, CATEGORY_VETERAN, GENDER_FEMALE, GENDER_MALE
 from rscraping.data.models import Datasource
+from rscraping.data.models import Participant as RSParticipant
+from rscraping.data.models import Race as RSRace
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.DEBUG)
 
-file_handler = logging.FileHandler("fixes4.log")
-formatter = logging.Formatter("%(levelname)s %(asctime)s %(message)s")
-file_handler.setFormatter(formatter)
-logger.addHandler(file_handler)
 
+@dataclass
+class PreparedRace:
+    ref_id: str
+    race: RSRace | None
+    db_participants: list[Participant] = field(default_factory=list)
+    # scraped participant of each database participant without metadata
+    matches: dict[int, RSParticipant] = field(default_factory=dict)
+    # clubs of the scraped participants left without match, digested as new participants
+    clubs: dict[str, Entity | None] = field(default_factory=dict)
 
-class Command(BaseCommand):
+
+class Command(RepairCommand):
     m_abs_client = TrainerasClient(source=Datasource.TRAINERAS, gender=GENDER_MALE, category=CATEGORY_ABSOLUT)
     m_abs_digester = Digester(m_abs_client, force_gender=True, force_category=True)
     f_abs_client = TrainerasClient(source=Datasource.TRAINERAS, gender=GENDER_FEMALE, category=CATEGORY_ABSOLUT)
@@ -40,6 +50,11 @@ class Command(BaseCommand):
     f_vet_client = TrainerasClient(source=Datasource.TRAINERAS, gender=GENDER_FEMALE, category=CATEGORY_VETERAN)
     f_vet_digester = Digester(f_vet_client, force_gender=True, force_category=True)
 
+    update_fields = {
+        Participant: ["metadata", "branch"],
+        Penalty: ["notes"],
+    }
+
     def client(self, race: Race) -> Client:
         if race.gender == GENDER_FEMALE:
             return self.f_abs_client if race.category == CATEGORY_ABSOLUT else self.f_vet_client
@@ -52,30 +67,33 @@ class Command(BaseCommand):
         else:
             return self.m_abs_digester if race.category == CATEGORY_ABSOLUT else self.m_vet_digester
 
-    def filter_races(self, races: QuerySet[Race], datasource: Datasource) -> Generator[tuple[Race, str]]:
-        for race in races:
-            if all(len(p.metadata["datasource"]) > 0 or p.absent or p.retired for p in race.participants.all()):
-                continue
-            for ds in race.metadata["datasource"]:
-                if ds["datasource_name"] == datasource.value:
-                    yield (race, ds["ref_id"])
-
-    def handle(self, *_, **options):
-        logger.info(f"{options}")
-
-        datasource = Datasource.TRAINERAS.value
-        races = Race.objects.prefetch_related("participants", "participants__penalties").filter(
-            Q(metadata__datasource__contains=[{"datasource_name": datasource}])
-            # & ~Q(metadata__datasource__has_key="data"),
+    @override
+    def get_queryset(self, **_) -> QuerySet[Race]:
+        # races with participants missing metadata that were not absent or retired
+        missing_metadata = Participant.objects.filter(
+            race=OuterRef("pk"),
+            metadata__datasource=[],
+            absent=False,
+            retired=False,
+        )
+        return Race.objects.prefetch_related("participants", "participants__penalties").filter(
+            Exists(missing_metadata),
+            metadata__datasource__contains=[{"datasource_name": Datasource.TRAINERAS.value}],
         )
 
-        races = list(self.filter_races(races, Datasource.TRAINERAS))
-        num_races = len(races)
-        for i, (db_race, ref_id) in enumerate(races):
-            logger.info(f"processing race {i + 1}/{num_races} :: {db_race.pk} - {db_race}")
-            client, digester = self.client(db_race), self.digester(db_race)
-
-            if db_race.trophy and db_race.trophy.pk == 24:
+    @override
+    def fetch(self, db_race: Race) -> list[tuple[str, RSRace | None]]:
+        return [
+            (ds["ref_id"], self.fetch_race(db_race, ds["ref_id"]))
+            for ds in db_race.metadata["datasource"]
+            if ds["datasource_name"] == Datasource.TRAINERAS.value
+        ]
+
+    def fetch_race(self, db_race: Race, ref_id: str) -> RSRace | None:
+        client, race = self.client(db_race), None
+        # every table of multi-race pages is parsed from the same download
+        with reuse_downloads():
+            if db_race.trophy_id == 24:  # pyright: ignore
                 # HACK: fix Teresa Herrera being saved as 3 tables
                 logger.info("processing Teresa Herrera Final")
                 race = client.get_race_by_id(ref_id, table=3)
@@ -83,7 +101,7 @@ class Command(BaseCommand):
                     race = client.get_race_by_id(ref_id, table=2)
                 if not race:
                     race = client.get_race_by_id(ref_id, table=1)
-            elif db_race.trophy and db_race.trophy.pk == 25:
+            elif db_race.trophy_id == 25:  # pyright: ignore
                 # HACK: fix Teresa Herrera cassification
                 if client.get_race_by_id(ref_id, table=3) is not None:
                     race_1 = client.get_race_by_id(ref_id, table=1)
@@ -100,6 +118,86 @@ class Command(BaseCommand):
                 if not race and db_race.day == 2:
                     race = client.get_race_by_id(ref_id, table=1)
 
+        return race
+
+    @override
+    def prepare(self, db_race: Race, races: list[tuple[str, RSRace | None]]) -> list[PreparedRace]:
+        prepared = []
+        for ref_id, race in races:
+            if not race:
+                prepared.append(PreparedRace(ref_id, race))
+                continue
+
+            db_participants = list(db_race.participants.filter(gender=race.gender, category=race.category))
+            matches = self.match_participants(db_race, race, db_participants)
+
+            remaining = [p for p in race.participants if p not in matches.values()]
+            clubs = self.digester(db_race).retrieve_clubs(remaining)
+            clubs = {name: club or input_club(name) for name, club in clubs.items()}
+            prepared.append(PreparedRace(ref_id, race, db_participants, matches, clubs))
+        return prepared
+
+    def match_participants(
+        self,
+        db_race: Race,
+        race: RSRace,
+        db_participants: list[Participant],
+    ) -> dict[int, RSParticipant]:
+        """
+        Match the participants without metadata with the scraped ones, asking for the ones unable to match.
+        """
+        # 1. PRELOAD PARTICIPANT CLUBS
+        logger.info("preloading participant clubs")
+        clubs = [(p, EntityService.get_closest_club_by_name(p.participant)) for p in race.participants]
+
+        # 2. MATCH PARTICIPANTS BY FINAL TIME
+        logger.info("matching participants by final time")
+        index = ParticipantService.get_final_time_index(p for p in db_participants if not p.metadata["datasource"])
+        matches: dict[int, RSParticipant] = {}
+        for p, c in clubs:
+            if not c:
+                continue
+            try:
+                match = ParticipantService.find_by_final_time(index, p, club=c)
+            except Participant.MultipleObjectsReturned as e:
+                logger.warning(f"ambiguous match for {p=}: {e}")
+                continue
+            if match:
+                matches[match.pk] = p
+
+        for db_participant in db_participants:
+            if len(db_participant.metadata["datasource"]) > 0 or db_participant.pk in matches:
+                continue
+            # 2.1. MATCH REMAINING PARTICIPANTS
+            logger.info(f"matching {db_participant=}")
+            participant = next(
+                (
+                    p
+                    for p, c in clubs
+                    if p not in matches.values() and ParticipantService.is_same_participant(db_participant, p, c)
+                ),
+                None,
+            )
+
+            # 2.2. ASK FOR PARTICIPANT IF UNABLE TO MATCH
+            if not participant and not (db_participant.absent or db_participant.retired or db_race.cancelled):
+                remaining = [p for p in race.participants if p not in matches.values()]
+                participant_names = [p.participant for p in remaining] + ["SKIP"]
+                participant = inquirer.list_input(f"participant={db_participant}", choices=participant_names)
+                participant = next((p for p in remaining if p.participant == participant), None)
+
+            if participant:
+                matches[db_participant.pk] = participant
+        return matches
+
+    @override
+    def process(self, db_race: Race, races: list[PreparedRace]) -> list[Participant | Penalty]:
+        datasource = Datasource.TRAINERAS.value
+        digester = self.digester(db_race)
+
+        updated: list[Participant | Penalty] = []
+        for prepared in races:
+            ref_id, race, db_participants = prepared.ref_id, prepared.race, prepared.db_participants
             if not race:
                 logger.error(f"no race found for {ref_id=}")
                 continue
@@ -107,7 +205,7 @@ class Command(BaseCommand):
             participants = race.participants
             race.participants = []
 
-            # 1. UPDATE RACE METADATA
+            # 3. UPDATE RACE METADATA
             logger.info("updating race metadata")
             metadata = db_race.metadata["datasource"]
             ds = [d for d in metadata if d["datasource_name"] == datasource and d["ref_id"] == ref_id][0]
@@ -117,43 +215,19 @@ class Command(BaseCommand):
             ds["data"] = race_d
             ds["date"] = datetime.now().date().isoformat()
 
-            # 2. PRELOAD PARTICIPANT CLUBS
-            logger.info("preloading participant clubs")
-            clubs = [(p, EntityService.get_closest_club_by_name(p.participant)) for p in participants]
-
-            db_participants = list(db_race.participants.filter(gender=race.gender, category=race.category))
             for db_participant in db_participants:
                 if len(db_participant.metadata["datasource"]) > 0:
                     continue
-                # 3. MATCH PARTICIPANTS
-                logger.info(f"processing {db_participant=}")
-                participant = next(
-                    (p for p, c in clubs if ParticipantService.is_same_participant(db_participant, p, c)),
-                    None,
-                )
-
-                # 3.1. ASK FOR PARTICIPANT IF UNABLE TO MATCH
-                if not participant and not (db_participant.absent or db_participant.retired or db_race.cancelled):
-                    participant_names = [p.participant for p in participants] + ["SKIP"]
-                    participant = inquirer.list_input(f"participant={db_participant}", choices=participant_names)
-                    if participant == "SKIP":
-                        continue
-                    participant = next((p for p in participants if p.participant == participant), None)
-
-                if not participant and (
-                    db_participant.retired
-                    or db_participant.absent
-                    or len(db_participant.laps) == 0
-                    or db_race.cancelled
-                ):
+
+                participant = prepared.matches.get(db_participant.pk)
+                if not participant:
                     logger.warning(f"skipping {db_participant=}")
                     continue
 
-                assert participant is not None, "participant not found"
                 assert len(db_participant.metadata["datasource"]) == 0, "metadata should be empty"
 
                 # 4. UPDATE PARTICIPANT METADATA
-                logger.info("updating participant metadata")
+                logger.info(f"updating {db_participant=} metadata")
                 participant_d = participant.to_dict()
                 participant_d.pop("penalty", None)
                 participant_d.pop("race", None)
@@ -164,12 +238,9 @@ class Command(BaseCommand):
 
                 # 5. UPDATE PARTICIPANT BRANCH
                 logger.info("updating participant branch")
-                if is_branch_club(participant.participant):
-                    db_participant.branch = "B"
-                if is_branch_club(participant.participant, letter="C"):
-                    db_participant.branch = "C"
-                if is_branch_club(participant.participant, letter="D"):
-                    db_participant.branch = "D"
+                branch = ParticipantService.get_branch(participant.participant)
+                if branch:
+                    db_participant.branch = branch
 
                 # 6. UPDATE PENALTIES
                 if participant.penalty:
@@ -177,21 +248,19 @@ class Command(BaseCommand):
                     _ = digester.save_penalty(db_participant, participant.penalty, race.race_notes)
 
                 participants = [p for p in participants if p != participant]
-                clubs = [(p, c) for p, c in clubs if p != participant]
 
             # 7. DIGEST NEW PARTICIPANTS
             if len(participants) > 0:
                 logger.warning(f"missing {participants=} in {db_race}")
+                possible_branches = ParticipantService.get_possible_branches([p.participant for p in participants])
                 for participant in participants:
                     logger.info(f"digesting new {participant=}")
-                    can_be_branch_team = db_race.league is None and ParticipantService.can_be_branch(
-                        participant.participant,
-                        [p.participant for p in participants],
-                    )
+                    can_be_branch_team = db_race.league is None and participant.participant in possible_branches
                     new_participant, status = digester.ingest_participant(
                         db_race,
                         participant,
                         can_be_branch=can_be_branch_team,
+                        club=prepared.clubs.get(participant.participant),
                     )
                     if status == Digester.Status.NEW or status == Digester.Status.MERGED:
                         new_participant, status = digester.save_participant(
@@ -205,23 +274,14 @@ class Command(BaseCommand):
             # 8. UPDATE PENALTIES (AGAIN)
             if race.race_notes:
                 logger.info("digesting penalties")
-                penalties = Penalty.objects.filter(participant__in=db_participants)
+                penalties = list(Penalty.objects.filter(participant__in=db_participants))
                 for penalty in penalties:
                     if race.race_notes not in penalty.notes:
                         penalty.notes.append(race.race_notes)
 
-                logger.info("bulk updating penalties")
-                Penalty.objects.bulk_update(penalties, ["notes"])
-
-            logger.info("bulk updating participants")
-            Participant.objects.bulk_update(db_participants, ["metadata", "branch"])
-            # logger.info(f"saving race={db_race.pk}")
-            # db_race.save()
+                updated.extend(penalties)
 
+            updated.extend(db_participants)
             if race.race_notes:
                 logger.warning(f"NOTES: {race.race_notes}")
-
-            time.sleep(5)
-            if (i + 1) % 50 == 0:
-                logger.info("sleeping longer")
-                time.sleep(60)
+        return updated
@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+
+import logging
+from typing import override
+
+from django.conf import settings
+from django.core.management import BaseCommand
+from django.db.models import Func
+
+from apps.races.models import Flag, Race, Trophy
+from apps.races.services import CompetitionService
+from apps.utils import lemmas
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = """
+    Precompute the lemmas of every known trophy, flag and race name into the on-disk lemmas cache, so competition
+    matching and token backfills don't lemmatize them again.
+    """
+
+    @override
+    def add_arguments(self, parser):
+        parser.add_argument("--output", type=str, default=None, help=f"cache file (default: {settings.LEMMAS_PATH}).")
+
+    @override
+    def handle(self, *_, **options):
+        logger.debug(f"{options}")
+
+        names = {
+            *Trophy.objects.values_list("name", flat=True),
+            *Flag.objects.values_list("name", flat=True),
+            *Race.objects.annotate(race_name=Func("race_names", function="unnest"))
+            .values_list("race_name", flat=True)
+            .distinct(),
+        }
+        names |= {CompetitionService.normalize_name(name) for name in names}
+
+        count = lemmas.precompute(names, path=options["output"])
+        logger.info(f"stored the lemmas of {count} names")
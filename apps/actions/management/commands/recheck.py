@@ -12,6 +12,8 @@ from django.db.models import Exists, OuterRef, Q
 
 from apps.actions.management.digester import build_digester
 from apps.actions.management.digester._protocol import DigesterProtocol
+from apps.actions.management.helpers.cassettes import CassetteMixin
+from apps.actions.management.helpers.profiling import ProfileMixin
 from apps.actions.management.ingester import build_ingester
 from apps.races.models import Flag, Race
 from apps.races.services import MetadataService
@@ -28,7 +30,7 @@ from .scrape import ingest_race
 logger = logging.getLogger(__name__)
 
 
-class Command(BaseCommand):
+class Command(ProfileMixin, CassetteMixin, BaseCommand):
     help = """
     Check already imported flags to find new races.
     """
@@ -107,7 +109,8 @@ class Command(BaseCommand):
         if only_new:
             flags = flags.filter(~Exists(Race.objects.filter(flag=OuterRef("pk"), date__year=datetime.now().year)))
 
-        for flag in flags:
+        # streamed with a server-side cursor, the flags are checked (slowly) one by one
+        for flag in flags.only("pk", "metadata").iterator(chunk_size=100):
             for value in flag.metadata["datasource"]:
                 if value["datasource_name"] == datasource.value:
                     yield value["ref_id"]
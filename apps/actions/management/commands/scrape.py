@@ -3,21 +3,29 @@
 import json
 import logging
 import os
+from collections import Counter
 from collections.abc import Generator
 from dataclasses import dataclass, field
 from datetime import datetime
+from functools import partial
 from itertools import chain
 from typing import Self, override
 
 from django.core.management import BaseCommand
 
 from apps.actions.management.digester import Digester, DigesterProtocol, build_digester
+from apps.actions.management.helpers import profiling
+from apps.actions.management.helpers.cassettes import CassetteMixin
 from apps.actions.management.helpers.input import input_race
+from apps.actions.management.helpers.profiling import ProfileMixin
+from apps.actions.management.helpers.workers import run_sharded
 from apps.actions.management.ingester import build_ingester
 from apps.entities.models import Entity
 from apps.entities.services import EntityService
+from apps.participants.models import deferred_refresh
 from apps.participants.services import ParticipantService
 from apps.races.models import Flag, Race, Trophy
+from apps.races.services import HintService
 from apps.schemas import MetadataBuilder
 from apps.utils import build_client
 from pyutils.shortcuts import only_one_not_none
@@ -35,10 +43,8 @@ from rscraping.data.models import Race as RSRace
 
 logger = logging.getLogger(__name__)
 
-_notes: list[str] = []
 
-
-class Command(BaseCommand):
+class Command(ProfileMixin, CassetteMixin, BaseCommand):
     help = """
     Retrieve and process race data from a web datasource, JSON file or spreadsheet.
     """
@@ -107,84 +113,44 @@ class Command(BaseCommand):
             type=str,
             help="Outputs the race data to the given folder path in JSON format.",
         )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=1,
+            help="number of processes the years are split across. Only used with year='all'.",
+        )
 
     @override
     def handle(self, *_, **options):
         logger.debug(f"{options}")
         config = ScrapeConfig.from_args(**options)
+        assert config.workers == 1 or not (options.get("record") or options.get("replay")), "cassettes need one worker"
 
         client = build_client(config.datasource, config.gender, config.category)
-        ingester = build_ingester(client=client, ignored_races=config.ignored_races)
-        digester = build_digester(
-            client=client,
-            force_gender=config.force_gender,
-            force_category=config.force_category,
-            save_old=config.save_old,
-        )
 
         # compute years to scrape
         if config.year == ScrapeConfig.ALL_YEARS:
-            start = ingester.client.FEMALE_START if config.gender == GENDER_FEMALE else ingester.client.MALE_START
-            years = range(config.start_year if config.start_year else start, datetime.now().year + 1)
+            start = client.FEMALE_START if config.gender == GENDER_FEMALE else client.MALE_START
+            years = list(range(config.start_year if config.start_year else start, datetime.now().year + 1))
         else:
             years = [config.year] if config.year else []
 
-        # fetch races depending on the configuration
-        if config.entity and config.year:
-            races = chain(*[ingester.fetch_by_entity(entity=config.entity, year=year) for year in years])
-        elif config.club_id and config.year:
-            races = chain(*[ingester.fetch_by_club(club_id=config.club_id, year=year) for year in years])
-        elif config.flag_id:
-            races = ingester.fetch_by_flag(flag_id=config.flag_id)
-        elif config.race_ids:
-            races = ingester.fetch_by_ids(race_ids=config.race_ids, table=config.table)
-        elif config.year:
-            races = chain(*[ingester.fetch(year=year) for year in years])
-        elif config.last_weekend:
-            races = ingester.fetch_last_weekend()
-        else:
-            raise ValueError("invalid state")
-
+        summary: Counter[str] = Counter()
+        notes: list[str] = []
         try:
-            self.run(config, digester, races)
-        except Exception as e:
-            for note in _notes:
-                logger.warning(note)
-            raise e
+            if config.workers > 1 and len(years) > 1:
+                # round-robin so every worker gets a similar mix of old (small) and recent (big) years
+                shards = [years[idx :: config.workers] for idx in range(min(config.workers, len(years)))]
+                for shard_summary, shard_notes in run_sharded(partial(scrape_years, config), shards):
+                    summary.update(shard_summary)
+                    notes.extend(shard_notes)
+            else:
+                summary, notes = scrape_years(config, years)
         finally:
-            for note in _notes:
+            for note in notes:
                 logger.warning(note)
 
-    def run(self, config: "ScrapeConfig", digester: DigesterProtocol, races: chain[RSRace] | Generator[RSRace]):
-        flags: set[Flag] = set()
-        hints: dict[str, tuple[Flag, Trophy]] = {}
-        for race in races:
-            if config.output_path and os.path.isdir(config.output_path):
-                file_name = f"{race.race_ids[0]}.json"
-                logger.info(f"saving race to {file_name=}")
-                with open(os.path.join(config.output_path, file_name), "w") as file:
-                    json.dump(race.to_dict(), file)
-                continue
-
-            new_race, _ = ingest_race(digester, race, hint=hints.get(race.name, None))
-            if new_race and new_race.flag:
-                flags.add(new_race.flag)
-            if new_race and race.name not in hints:
-                hints[race.name] = (new_race.flag, new_race.trophy)
-
-        if config.flag_id and config.datasource == Datasource.TRAINERAS and len(flags) == 1:
-            flag = flags.pop()
-            logger.info(f"adding metadata to {flag}")
-            if len(flag.get_datasources(config.datasource, config.flag_id)) == 0:
-                flag.add_metadata(
-                    MetadataBuilder()
-                    .ref_id(config.flag_id)
-                    .datasource_name(config.datasource)
-                    .values("details_page", f"https://traineras.es/banderas/{config.flag_id}")
-                    .build()
-                )
-                flag.save()
-                logger.info(f"{flag=} metadata has been updated")
+        logger.info(f"races by status: {dict(summary)}")
 
 
 @dataclass
@@ -209,6 +175,7 @@ class ScrapeConfig:
     save_old: bool = False
     ignored_races: list[str] = field(default_factory=list)
     output_path: str | None = None
+    workers: int = 1
 
     @classmethod
     def from_args(cls, **options) -> Self:
@@ -227,12 +194,13 @@ class ScrapeConfig:
             options["start_year"],
             options["last_weekend"],
         )
-        force_gender, force_category, save_old, ignored_races, output_path = (
+        force_gender, force_category, save_old, ignored_races, output_path, workers = (
             options["force_gender"],
             options["force_category"],
             options["save_old"],
             options["ignore"],
             options["output"],
+            options.get("workers") or 1,
         )
 
         assert input_source and Datasource.has_value(input_source), f"invalid {input_source=}"
@@ -248,6 +216,8 @@ class ScrapeConfig:
         assert not gender or gender.upper() in [GENDER_MALE, GENDER_FEMALE, GENDER_ALL, GENDER_MIX], f"invalid {gender=}"  # noqa: E501
         assert not category or category.upper() in [CATEGORY_ABSOLUT, CATEGORY_VETERAN, CATEGORY_SCHOOL], f"invalid {category=}"  # noqa: E501
         assert not table or len(race_ids) == 1, "table filtering is only supported ingesting one race"
+        assert workers > 0, f"invalid {workers=}"
+        assert workers == 1 or year == "all", "'workers' is only supported with year='all'"
         assert not entity_id or entity_id.isdigit(), f"invalid {entity_id=}"
         # fmt: on
 
@@ -277,6 +247,7 @@ class ScrapeConfig:
             save_old=save_old,
             ignored_races=ignored_races,
             output_path=output_path,
+            workers=workers,
         )
 
     @classmethod
@@ -295,44 +266,143 @@ class ScrapeConfig:
         return y
 
 
+def scrape_years(config: ScrapeConfig, years: list[int]) -> tuple[Counter[str], list[str]]:
+    """
+    Fetch the races of the configuration restricted to 'years' and ingest them.
+
+    Returns: tuple[Counter[str], list[str]]: the number of races by status and the notes found while ingesting.
+    """
+    client = build_client(config.datasource, config.gender, config.category)
+    ingester = build_ingester(client=client, ignored_races=config.ignored_races)
+    digester = build_digester(
+        client=client,
+        force_gender=config.force_gender,
+        force_category=config.force_category,
+        save_old=config.save_old,
+    )
+
+    # fetch races depending on the configuration
+    if config.entity and config.year:
+        races = chain(*[ingester.fetch_by_entity(entity=config.entity, year=year) for year in years])
+    elif config.club_id and config.year:
+        races = chain(*[ingester.fetch_by_club(club_id=config.club_id, year=year) for year in years])
+    elif config.flag_id:
+        races = ingester.fetch_by_flag(flag_id=config.flag_id)
+    elif config.race_ids:
+        races = ingester.fetch_by_ids(race_ids=config.race_ids, table=config.table)
+    elif config.year:
+        races = chain(*[ingester.fetch(year=year) for year in years])
+    elif config.last_weekend:
+        races = ingester.fetch_last_weekend()
+    else:
+        raise ValueError("invalid state")
+
+    return run(config, digester, races)
+
+
+def run(
+    config: ScrapeConfig,
+    digester: DigesterProtocol,
+    races: chain[RSRace] | Generator[RSRace],
+) -> tuple[Counter[str], list[str]]:
+    """
+    Ingest 'races' with the digester, saving the hints of their competitions.
+
+    Returns: tuple[Counter[str], list[str]]: the number of races by status and the notes found while ingesting.
+    """
+    summary: Counter[str] = Counter()
+    notes: list[str] = []
+    flags: set[Flag] = set()
+    hints: dict[str, tuple[Flag, Trophy]] = {}
+    for race in races:
+        if config.output_path and os.path.isdir(config.output_path):
+            file_name = f"{race.race_ids[0]}.json"
+            logger.info(f"saving race to {file_name=}")
+            with open(os.path.join(config.output_path, file_name), "w") as file:
+                json.dump(race.to_dict(), file)
+            continue
+
+        if race.name not in hints:
+            hint = HintService.get_hint_or_none(config.datasource, race.name) if config.datasource else None
+            if hint:
+                hints[race.name] = hint
+
+        new_race, status = ingest_race(digester, race, hint=hints.get(race.name, None))
+        summary[status.name] += 1
+        if new_race and race.race_notes:
+            notes.append(f"{race.date} :: {race.race_notes}")
+        if new_race and new_race.flag:
+            flags.add(new_race.flag)
+        # a hint resolved to another competition is stale or wrong, so the last resolution replaces it
+        if new_race and hints.get(race.name) != (new_race.flag, new_race.trophy):
+            hints[race.name] = (new_race.flag, new_race.trophy)
+            if config.datasource and status.is_saved():
+                HintService.save_hint(config.datasource, race.name, new_race.flag, new_race.trophy)
+
+    if config.flag_id and config.datasource == Datasource.TRAINERAS and len(flags) == 1:
+        flag = flags.pop()
+        logger.info(f"adding metadata to {flag}")
+        if len(flag.get_datasources(config.datasource, config.flag_id)) == 0:
+            flag.add_metadata(
+                MetadataBuilder()
+                .ref_id(config.flag_id)
+                .datasource_name(config.datasource)
+                .values("details_page", f"https://traineras.es/banderas/{config.flag_id}")
+                .build()
+            )
+            flag.save()
+            logger.info(f"{flag=} metadata has been updated")
+
+    return summary, notes
+
+
 def ingest_race(
     digester: DigesterProtocol,
     race: RSRace,
     hint: tuple[Flag, Trophy] | None = None,
 ) -> tuple[Race | None, Digester.Status]:
-    participants = race.participants
-    race.participants = []
+    # rank the race and recompute its league season once the whole race is in, not for each save
+    with deferred_refresh():
+        participants = race.participants
+        race.participants = []
 
-    try:
-        new_race, race_status = digest_race(digester, race, hint=hint)
-    except Exception as e:
-        race.participants = participants
-        with open(f"{race.race_ids[0]}.json", "w") as f:
-            json.dump(race.to_dict(), f, ensure_ascii=False)
-        raise e
-
-    if not new_race:
-        logger.warning(f"{race=} was not saved")
-        return None, Digester.Status.IGNORE
+        try:
+            new_race, race_status = digest_race(digester, race, hint=hint)
+        except Exception as e:
+            race.participants = participants
+            with open(f"{race.race_ids[0]}.json", "w") as f:
+                json.dump(race.to_dict(), f, ensure_ascii=False)
+            raise e
 
-    participant_names = [p.participant for p in participants]
-    for participant in participants:
-        can_be_branch_team = ParticipantService.can_be_branch(participant.participant, participant_names)
-        can_be_branch_team = new_race.league is None and can_be_branch_team
-        new_participant, status = digester.ingest_participant(new_race, participant, can_be_branch=can_be_branch_team)
-        if status == Digester.Status.NEW or status == Digester.Status.MERGED:
-            new_participant, status = digester.save_participant(
-                new_participant,
-                race_status=race_status,
-                participant_status=status,
+        if not new_race:
+            logger.warning(f"{race=} was not saved")
+            return None, Digester.Status.IGNORE
+
+        # resolve names, clubs and branches once for the whole race
+        possible_branches = ParticipantService.get_possible_branches([p.participant for p in participants])
+        clubs = digester.retrieve_clubs(participants)
+
+        for participant in participants:
+            can_be_branch_team = new_race.league is None and participant.participant in possible_branches
+            new_participant, status = digester.ingest_participant(
+                new_race,
+                participant,
+                can_be_branch=can_be_branch_team,
+                club=clubs.get(participant.participant),
             )
-        if new_participant.pk and participant.penalty:
-            _ = digester.save_penalty(new_participant, participant.penalty, race.race_notes)
+            if status == Digester.Status.NEW or status == Digester.Status.MERGED:
+                new_participant, status = digester.save_participant(
+                    new_participant,
+                    race_status=race_status,
+                    participant_status=status,
+                )
+            if new_participant.pk and participant.penalty:
+                _ = digester.save_penalty(new_participant, participant.penalty, race.race_notes)
 
     if race.race_notes:
         logger.warning(f"{race.date} :: {race.race_notes}")
-        _notes.append(f"{race.date} :: {race.race_notes}")
 
+    profiling.checkpoint(f"{race.date} :: {race.name}")
     return new_race, race_status
 
 
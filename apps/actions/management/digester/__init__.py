@@ -1,11 +1,14 @@
-from rscraping.clients import Client
+from typing import TYPE_CHECKING
 
 from ._digester import Digester as Digester
 from ._protocol import DigesterProtocol as DigesterProtocol
 
+if TYPE_CHECKING:
+    from rscraping.clients import Client
+
 
 def build_digester(
-    client: Client | None = None,
+    client: "Client | None" = None,
     force_gender: bool = False,
     force_category: bool = False,
     save_old: bool = False,
@@ -1,7 +1,7 @@
 import json
 import logging
 from datetime import datetime
-from typing import override
+from typing import TYPE_CHECKING, override
 
 from django.core.exceptions import ValidationError
 
@@ -25,7 +25,6 @@ from apps.actions.management.helpers.retrieval import (
     retrieve_entity,
     retrieve_league,
 )
-from apps.actions.serializers import ParticipantSerializer, RaceSerializer
 from apps.entities.models import Entity, League
 from apps.participants.models import Participant, Penalty
 from apps.participants.services import ParticipantService
@@ -34,9 +33,10 @@ from apps.places.services import PlacesService
 from apps.races.models import Flag, Race, Trophy
 from apps.races.services import FlagService, RaceService, TrophyService
 from apps.schemas import MetadataBuilder
+from apps.utils.laps import parse_lap_time, parse_laps, time_to_centiseconds
+from apps.utils.lazy import lazy_import
+from apps.utils.locks import advisory_lock
 from pyutils.dicts import clean_dict
-from rscraping.clients import ClientProtocol
-from rscraping.data.checks import is_branch_club
 from rscraping.data.constants import CATEGORY_ALL, GENDER_ALL, RACE_TIME_TRIAL
 from rscraping.data.models import Datasource
 from rscraping.data.models import Participant as RSParticipant
@@ -45,13 +45,18 @@ from rscraping.data.models import Race as RSRace
 
 from ._protocol import DigesterProtocol
 
+if TYPE_CHECKING:
+    from rscraping.clients import ClientProtocol
+
+# the REST framework is only needed to show the races and participants being compared
+serializers = lazy_import("apps.actions.serializers")
 logger = logging.getLogger(__name__)
 
 
 class Digester(DigesterProtocol):
     def __init__(
         self,
-        client: ClientProtocol,
+        client: "ClientProtocol",
         force_gender: bool = False,
         force_category: bool = False,
         save_old: bool = False,
@@ -61,6 +66,13 @@ class Digester(DigesterProtocol):
         self._force_category = force_category
         self._save_old = save_old
 
+        # participants of the race being ingested, loaded once per race and indexed by (club, gender, category, branch)
+        self._snapshot_race_id: int | None = None
+        self._snapshot: dict[tuple[int, str, str, str | None], list[Participant]] = {}
+
+        # aggregated competition information, shared by all the editions of a competition during the run
+        self._competition_profiles: dict[tuple[int | None, int | None, int | None], RaceService.CompetitionProfile] = {}
+
     @override
     def ingest(
         self,
@@ -69,6 +81,8 @@ class Digester(DigesterProtocol):
         **kwargs,
     ) -> tuple[Race, Race | None, DigesterProtocol.Status]:
         logger.info(f"ingesting {race=}")
+        self._snapshot_race_id, self._snapshot = None, {}
+
         logger.debug("searching race in the database")
         db_race = retrieve_database_race(
             race=race,
@@ -133,7 +147,8 @@ class Digester(DigesterProtocol):
             db_race = RaceService.get_race_matching_race(new_race)
             logger.info(f"using {db_race=}")
 
-        print(f"NEW RACE:\n{json.dumps(RaceSerializer(new_race).data, indent=4, skipkeys=True, ensure_ascii=False)}")
+        serialized_race = serializers.RaceSerializer(new_race).data
+        print(f"NEW RACE:\n{json.dumps(serialized_race, indent=4, skipkeys=True, ensure_ascii=False)}")
         status = DigesterProtocol.Status.NEW
         if db_race:
             new_race, status = self.merge(new_race, db_race=db_race, status=status)
@@ -145,7 +160,7 @@ class Digester(DigesterProtocol):
 
     @override
     def merge(self, race: Race, db_race: Race, status: DigesterProtocol.Status) -> tuple[Race, DigesterProtocol.Status]:
-        serialized_race = RaceSerializer(db_race).data
+        serialized_race = serializers.RaceSerializer(db_race).data
         print(f"DATABASE RACE:\n{json.dumps(serialized_race, indent=4, skipkeys=True, ensure_ascii=False)}")
         if not input_should_merge(db_race):
             logger.debug(f"races will not be merged, using {race=}")
@@ -209,14 +224,17 @@ class Digester(DigesterProtocol):
 
         if associated and not race.associated and (save_old_races or input_should_associate_races(race, associated)):
             logger.info(f"associating races {race} and {associated}")
-            race.associated = associated
-            race.save()
-            Race.objects.filter(pk=associated.pk).update(associated=race)
+            with advisory_lock(Race._meta.db_table, associated.pk):
+                race.associated = associated
+                race.save()
+                Race.objects.filter(pk=associated.pk).update(associated=race)
+            self._forget_competition_profile(race)
             return race, status.next()
 
         try:
             logger.info(f"saving {race=}")
             race.save()
+            self._forget_competition_profile(race)
             return race, status.next()
         except ValidationError as e:
             logger.error(e)
@@ -232,30 +250,26 @@ class Digester(DigesterProtocol):
         race: Race,
         participant: RSParticipant,
         can_be_branch: bool,
+        club: Entity | None = None,
         **_,
     ) -> tuple[Participant, DigesterProtocol.Status]:
         logger.info(f"ingesting {participant=}")
 
-        logger.debug("searching entity in the database")
-        club = retrieve_entity(participant.participant)
+        if not club:
+            logger.debug("searching entity in the database")
+            club = retrieve_entity(participant.participant)
         if not club:
             club = input_club(participant.participant)
         assert club, "missing club data"
         logger.info(f"using {club=}")
 
-        branch = None
-        if is_branch_club(participant.participant):
-            logger.info("'B' club detected")
-            branch = "B"
-        if is_branch_club(participant.participant, letter="C"):
-            logger.info("'C' club detected")
-            branch = "C"
-        if is_branch_club(participant.participant, letter="D"):
-            logger.info("'D' club detected")
-            branch = "D"
+        branch = ParticipantService.get_branch(participant.participant)
+        if branch:
+            logger.info(f"'{branch}' club detected")
 
         logger.debug("searching participant in the database")
-        db_participant = ParticipantService.get_by_race_and_filter_by(
+        db_participant = ParticipantService.get_from_snapshot_and_filter_by(
+            self._get_race_snapshot(race),
             race,
             club=club,
             gender=participant.gender,
@@ -265,16 +279,21 @@ class Digester(DigesterProtocol):
         )
         logger.info(f"using {db_participant=}")
 
+        # the parsed times are kept as they are, only the centiseconds mirrors are rounded
+        laps = parse_laps(participant.laps)
+        laps_cs = [time_to_centiseconds(lap) for lap in laps]
         new_participant = Participant(
             club_names=[participant.club_name.upper().replace(".", "").strip()] if participant.club_name else [],
             club=club,
             branch=branch if can_be_branch else None,
             race=race,
             distance=participant.distance,
-            laps=[datetime.strptime(lap, "%M:%S.%f").time() for lap in participant.laps],
+            laps=laps,
+            laps_cs=laps_cs,
+            time_cs=laps_cs[-1] if laps_cs else None,
             lane=participant.lane if race.type != RACE_TIME_TRIAL else 1,
             series=participant.series,
-            handicap=datetime.strptime(participant.handicap, "%M:%S.%f").time() if participant.handicap else None,
+            handicap=parse_lap_time(participant.handicap) if participant.handicap else None,
             gender=participant.gender,
             category=participant.category,
             absent=participant.absent,
@@ -287,7 +306,7 @@ class Digester(DigesterProtocol):
             new_participant.club_names = list(set(new_participant.club_names + db_participant.club_names))
             fields = self.get_participant_fields_to_update(new_participant, db_participant)
             if len(fields) > 0 and fields != ["metadata"]:
-                serialized = ParticipantSerializer(new_participant).data
+                serialized = serializers.ParticipantSerializer(new_participant).data
                 print(f"NEW PARTICIPANT:\n{json.dumps(serialized, indent=4, skipkeys=True, ensure_ascii=False)}")
                 new_participant, status = self.merge_participants(new_participant, db_participant, status)
             else:
@@ -297,12 +316,22 @@ class Digester(DigesterProtocol):
                     db_participant.add_metadata(new_participant.metadata["datasource"][0])
                     db_participant.club_names = list(set(new_participant.club_names + db_participant.club_names))
                     db_participant.save()
-                serialized = ParticipantSerializer(db_participant).data
+                serialized = serializers.ParticipantSerializer(db_participant).data
                 print(f"EXISTING PARTICIPANT:\n{json.dumps(serialized, indent=4, skipkeys=True, ensure_ascii=False)}")
                 return db_participant, DigesterProtocol.Status.EXISTING
 
         return new_participant, status
 
+    @override
+    def retrieve_clubs(self, participants: list[RSParticipant]) -> dict[str, Entity | None]:
+        clubs: dict[str, Entity | None] = {}
+        for participant in participants:
+            name = participant.participant
+            if name not in clubs:
+                logger.debug(f"searching entity for {name=} in the database")
+                clubs[name] = retrieve_entity(name)
+        return clubs
+
     @override
     def get_participant_fields_to_update(self, participant: Participant, db_participant: Participant) -> list[str]:
         fields = []
@@ -323,7 +352,7 @@ class Digester(DigesterProtocol):
         db_participant: Participant,
         status: DigesterProtocol.Status,
     ) -> tuple[Participant, DigesterProtocol.Status]:
-        serialized_participant = ParticipantSerializer(db_participant).data
+        serialized_participant = serializers.ParticipantSerializer(db_participant).data
         json_participant = json.dumps(serialized_participant, indent=4, skipkeys=True, ensure_ascii=False)
         print(f"DATABASE PARTICIPANT:\n{json_participant}")
         if not input_should_merge_participant(db_participant):
@@ -368,6 +397,8 @@ class Digester(DigesterProtocol):
 
         logger.info(f"saving {participant=}")
         participant.save()
+        if participant.race_id == self._snapshot_race_id:
+            ParticipantService.add_to_snapshot(self._snapshot, participant)
         return participant, participant_status.next()
 
     @override
@@ -399,6 +430,13 @@ class Digester(DigesterProtocol):
         new_penalty.save()
         return new_penalty
 
+    def _get_race_snapshot(self, race: Race) -> dict[tuple[int, str, str, str | None], list[Participant]]:
+        if not race.pk or race.pk != self._snapshot_race_id:
+            logger.debug(f"loading participants snapshot for {race=}")
+            self._snapshot_race_id = race.pk
+            self._snapshot = ParticipantService.get_race_snapshot(race)
+        return self._snapshot
+
     @override
     def _build_metadata(self, race: RSRace, datasource: Datasource) -> dict:
         if not race.url:
@@ -437,31 +475,37 @@ class Digester(DigesterProtocol):
         town: str | None,
         organizer_name: str | None,
     ) -> tuple[Place | None, Entity | None]:
-        place = PlacesService.get_closest_by_name_or_none(town) if town else None
+        place = PlacesService.resolve(town) if town else None
         organizer = retrieve_entity(organizer_name, entity_type=None) if organizer_name else None
-        competitions = RaceService.get_races_by_competition(trophy, flag, league)
-        if competitions.count():
-            logger.debug(f"found {competitions.count()} matching races")
-            if not place:
-                places = Place.objects.filter(
-                    id__in=competitions.select_related("place")
-                    .filter(place__isnull=False)
-                    .values_list("place", flat=True)
-                    .distinct()
-                )
-                if places.count() == 1:
-                    logger.info(f"updating {places.first()=}")
-                    place = places.first()
-
-            if not organizer:
-                organizers = Entity.all_objects.filter(
-                    id__in=competitions.filter(organizer__isnull=False).values_list("organizer", flat=True).distinct()
-                )
-                if organizers.count() == 1:
-                    logger.info(f"updating {organizer=} with {organizers.first()}")
-                    organizer = organizers.first()
+        if place and organizer:
+            return place, organizer
+
+        profile = self._get_competition_profile(trophy, flag, league)
+        if profile.editions:
+            logger.debug(f"found {profile.editions} matching races")
+            if not place and profile.place:
+                logger.info(f"updating {profile.place=}")
+                place = profile.place
+
+            if not organizer and profile.organizer:
+                logger.info(f"updating {organizer=} with {profile.organizer}")
+                organizer = profile.organizer
         return place, organizer
 
+    def _forget_competition_profile(self, race: Race):
+        self._competition_profiles.pop((race.trophy_id, race.flag_id, race.league_id), None)
+
+    def _get_competition_profile(
+        self,
+        trophy: Trophy | None,
+        flag: Flag | None,
+        league: League | None,
+    ) -> RaceService.CompetitionProfile:
+        key = (trophy.pk if trophy else None, flag.pk if flag else None, league.pk if league else None)
+        if key not in self._competition_profiles:
+            self._competition_profiles[key] = RaceService.get_competition_profile(trophy, flag, league)
+        return self._competition_profiles[key]
+
     @staticmethod
     def _retrieve_competition(
         race: RSRace,
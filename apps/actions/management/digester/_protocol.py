@@ -1,17 +1,20 @@
 from enum import Enum, auto
-from typing import Protocol
+from typing import TYPE_CHECKING, Protocol
 
+from apps.entities.models import Entity
 from apps.participants.models import Participant, Penalty
 from apps.races.models import Flag, Race, Trophy
-from rscraping.clients import ClientProtocol
 from rscraping.data.models import Datasource
 from rscraping.data.models import Participant as RSParticipant
 from rscraping.data.models import Penalty as RSPenalty
 from rscraping.data.models import Race as RSRace
 
+if TYPE_CHECKING:
+    from rscraping.clients import ClientProtocol
+
 
 class DigesterProtocol(Protocol):
-    client: ClientProtocol
+    client: "ClientProtocol"
 
     class Status(Enum):
         IGNORE = auto()
@@ -88,6 +91,7 @@ class DigesterProtocol(Protocol):
         race: Race,
         participant: RSParticipant,
         can_be_branch: bool,
+        club: Entity | None = None,
         **kwargs,
     ) -> tuple[Participant, Status]:
         """
@@ -97,6 +101,7 @@ class DigesterProtocol(Protocol):
             race Race: The Race to witch the participant belongs.
             participant: RSParticipant: The participant to ingest.
             can_be_branch: bool: Whether the participant can be a branch or not.
+            club: Entity | None: The already resolved club of the participant, searched in the database if None.
 
         Returns: tuple[Participant, bool]:
             Participant: The new ingested participant.
@@ -104,6 +109,17 @@ class DigesterProtocol(Protocol):
         """
         ...
 
+    def retrieve_clubs(self, participants: list[RSParticipant]) -> dict[str, Entity | None]:
+        """
+        Resolve the clubs of all the given participants, searching each distinct name only once.
+
+        Args:
+            participants list[RSParticipant]: The participants of a race.
+
+        Returns: dict[str, Entity | None]: The resolved clubs indexed by participant name.
+        """
+        ...
+
     def get_participant_fields_to_update(self, participant: Participant, db_participant: Participant) -> list[str]:
         """
         Check if two participants should be merged and what fields to merge.
@@ -0,0 +1,190 @@
+import base64
+import gzip
+import json
+import logging
+import threading
+import time
+from collections.abc import Callable, Generator
+from contextlib import ExitStack, contextmanager
+from typing import Any
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from requests.adapters import HTTPAdapter
+
+from apps.utils.lazy import lazy_import
+
+inquirer = lazy_import("inquirer")
+logger = logging.getLogger(__name__)
+
+CASSETTE_VERSION = 1
+_PROMPTS = ["confirm", "text", "list_input"]
+_SKIPPED_HEADERS = {"content-length", "content-encoding", "transfer-encoding"}
+
+
+class CassetteMixin:
+    """
+    Add '--record', '--replay' and '--answers' options to a management command.
+
+    '--record' stores every HTTP exchange and prompt answer of the run into a gzip compressed cassette. '--replay'
+    serves the HTTP responses from a cassette, answers the prompts from the recorded (or '--answers') file and skips
+    every sleep, reporting the wall-clock time and number of queries of the run.
+    """
+
+    def create_parser(self, prog_name: str, subcommand: str, **kwargs):
+        parser = super().create_parser(prog_name, subcommand, **kwargs)  # pyright: ignore
+        group = parser.add_mutually_exclusive_group()
+        group.add_argument("--record", type=str, default=None, help="cassette where the HTTP exchanges are recorded.")
+        group.add_argument("--replay", type=str, default=None, help="cassette to replay the HTTP exchanges from.")
+        parser.add_argument(
+            "--answers",
+            type=str,
+            default=None,
+            help="JSON list of prompt answers used in replay mode instead of the recorded ones.",
+        )
+        return parser
+
+    def execute(self, *args, **options):
+        if options.get("record"):
+            with record(options["record"]):
+                return super().execute(*args, **options)  # pyright: ignore
+        if options.get("replay"):
+            with replay(options["replay"], answers_path=options.get("answers")):
+                return super().execute(*args, **options)  # pyright: ignore
+        return super().execute(*args, **options)  # pyright: ignore
+
+
+@contextmanager
+def record(path: str) -> Generator[None]:
+    """
+    Record every HTTP exchange and prompt answer made inside the context into the cassette at 'path'.
+    """
+    lock = threading.Lock()
+    interactions: list[dict[str, Any]] = []
+    answers: list[Any] = []
+    original_send = HTTPAdapter.send
+
+    def send(adapter, request, *args, **kwargs):
+        response = original_send(adapter, request, *args, **kwargs)
+        interaction = {
+            "method": request.method,
+            "url": request.url,
+            "status": response.status_code,
+            "headers": {k: v for k, v in response.headers.items() if k.lower() not in _SKIPPED_HEADERS},
+            "content": base64.b64encode(response.content).decode(),
+        }
+        with lock:
+            interactions.append(interaction)
+        return response
+
+    def recorded(prompt: Callable[..., Any]) -> Callable[..., Any]:
+        def wrapper(*args, **kwargs):
+            answer = prompt(*args, **kwargs)
+            answers.append(answer)
+            return answer
+
+        return wrapper
+
+    HTTPAdapter.send = send
+    prompts = {name: getattr(inquirer, name) for name in _PROMPTS}
+    for name, prompt in prompts.items():
+        setattr(inquirer, name, recorded(prompt))
+    try:
+        yield
+    finally:
+        HTTPAdapter.send = original_send
+        for name, prompt in prompts.items():
+            setattr(inquirer, name, prompt)
+        save_cassette(path, interactions, answers)
+
+
+@contextmanager
+def replay(path: str, answers_path: str | None = None) -> Generator[None]:
+    """
+    Serve the HTTP responses recorded in the cassette at 'path' without any network access or sleeps.
+
+    Prompts are answered in order with the recorded answers, or with the JSON list in 'answers_path' when given. Once
+    the answers are exhausted the prompt default is used.
+    """
+    # 'responses' is only a development requirement
+    import responses
+    from responses import matchers
+
+    cassette = load_cassette(path)
+    answers = cassette["answers"]
+    if answers_path:
+        with open(answers_path) as file:
+            answers = json.load(file)
+
+    with ExitStack() as stack:
+        mock = stack.enter_context(responses.RequestsMock(assert_all_requests_are_fired=False))
+        for interaction in cassette["interactions"]:
+            url, _, query = interaction["url"].partition("?")
+            mock.add(
+                interaction["method"],
+                url,
+                body=base64.b64decode(interaction["content"]),
+                status=interaction["status"],
+                headers=interaction["headers"],
+                content_type=None,
+                match=[matchers.query_string_matcher(query)],
+            )
+
+        stack.enter_context(_scripted_prompts(answers))
+        stack.enter_context(_no_sleep())
+        queries = stack.enter_context(CaptureQueriesContext(connection))
+
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            logger.info(f"replayed {path} in {elapsed:.2f}s with {len(queries)} queries")
+
+
+def save_cassette(path: str, interactions: list[dict[str, Any]], answers: list[Any]):
+    logger.info(f"saving {len(interactions)} interactions and {len(answers)} answers to {path}")
+    cassette = {"version": CASSETTE_VERSION, "interactions": interactions, "answers": answers}
+    with gzip.open(path, "wt", encoding="utf-8") as file:
+        json.dump(cassette, file)
+
+
+def load_cassette(path: str) -> dict[str, Any]:
+    with gzip.open(path, "rt", encoding="utf-8") as file:
+        cassette = json.load(file)
+    assert cassette.get("version") == CASSETTE_VERSION, f"unsupported cassette {path}"
+    return cassette
+
+
+@contextmanager
+def _scripted_prompts(answers: list[Any]) -> Generator[None]:
+    pending = list(answers)
+
+    def scripted(message: str, *_, **kwargs):
+        if pending:
+            answer = pending.pop(0)
+        elif "default" in kwargs:
+            answer = kwargs["default"]
+        else:
+            raise RuntimeError(f"no scripted answer for {message=}")
+        logger.info(f"answering {message=} with {answer=}")
+        return answer
+
+    prompts = {name: getattr(inquirer, name) for name in _PROMPTS}
+    for name in prompts:
+        setattr(inquirer, name, scripted)
+    try:
+        yield
+    finally:
+        for name, prompt in prompts.items():
+            setattr(inquirer, name, prompt)
+
+
+@contextmanager
+def _no_sleep() -> Generator[None]:
+    original_sleep = time.sleep
+    time.sleep = lambda *_: None
+    try:
+        yield
+    finally:
+        time.sleep = original_sleep
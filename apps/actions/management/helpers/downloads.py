@@ -0,0 +1,82 @@
+import threading
+from collections.abc import Callable, Generator
+from contextlib import contextmanager
+
+from requests import PreparedRequest, Response
+from requests.adapters import HTTPAdapter
+
+_local = threading.local()
+_lock = threading.Lock()
+_active_contexts = 0
+_original_send = HTTPAdapter.send
+
+
+@contextmanager
+def reuse_downloads() -> Generator[None]:
+    """
+    Reuse the successful responses of already downloaded URLs while the context is active.
+
+    Multi-race pages are served as a single document but the clients download it once per table, inside this context
+    the page is downloaded only once and every table is parsed from the same response. Failed responses are never
+    reused so a transient error is retried by the next table.
+
+    Responses are only shared inside the thread that opened the context, so it's safe to use from concurrent fetchers.
+    """
+    previous = getattr(_local, "responses", None)
+    _local.responses = {}
+    try:
+        with _patched():
+            yield
+    finally:
+        _local.responses = previous
+
+
+@contextmanager
+def throttle(wait: Callable[[], None]) -> Generator[None]:
+    """
+    Call 'wait' before every request actually sent by this thread while the context is active, reused downloads don't
+    wait.
+    """
+    previous = getattr(_local, "wait", None)
+    _local.wait = wait
+    try:
+        with _patched():
+            yield
+    finally:
+        _local.wait = previous
+
+
+@contextmanager
+def _patched() -> Generator[None]:
+    """
+    Intercept the requests at the transport adapter, so they are seen whatever way the clients call 'requests'.
+    """
+    global _active_contexts, _original_send
+
+    with _lock:
+        if _active_contexts == 0:
+            _original_send = HTTPAdapter.send
+            HTTPAdapter.send = _send
+        _active_contexts += 1
+    try:
+        yield
+    finally:
+        with _lock:
+            _active_contexts -= 1
+            if _active_contexts == 0:
+                HTTPAdapter.send = _original_send
+
+
+def _send(adapter: HTTPAdapter, request: PreparedRequest, *args, **kwargs) -> Response:
+    responses: dict[str, Response] | None = getattr(_local, "responses", None)
+    reusable = responses is not None and request.method == "GET" and request.url is not None
+    if reusable and request.url in responses:  # pyright: ignore
+        return responses[request.url]  # pyright: ignore
+
+    wait = getattr(_local, "wait", None)
+    if wait:
+        wait()
+    response = _original_send(adapter, request, *args, **kwargs)
+    if reusable and response.ok:
+        responses[request.url] = response  # pyright: ignore
+    return response
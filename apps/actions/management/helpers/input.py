@@ -1,13 +1,14 @@
 from typing import Any
 
-import inquirer
-
 from apps.entities.models import Entity
 from apps.participants.models import Participant
 from apps.races.models import Flag, Race, Trophy
+from apps.utils.lazy import lazy_import
 from rscraping.data.models import Participant as RSParticipant
 from rscraping.data.models import Race as RSRace
 
+inquirer = lazy_import("inquirer")
+
 
 def input_new_value(key: str, value: Any, db_value: Any) -> bool:
     if not value or db_value == value:
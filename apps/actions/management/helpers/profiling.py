@@ -0,0 +1,138 @@
+import cProfile
+import io
+import logging
+import os
+import pstats
+import tracemalloc
+from collections.abc import Generator
+from contextlib import contextmanager
+from datetime import datetime
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+PROFILE_CPU = "cpu"
+PROFILE_MEM = "mem"
+PROFILE_BOTH = "both"
+PROFILE_MODES = [PROFILE_CPU, PROFILE_MEM, PROFILE_BOTH]
+
+_memory_profiler: "_MemoryProfiler | None" = None
+
+
+class ProfileMixin:
+    """
+    Add a '--profile[=cpu|mem|both]' option to a management command.
+
+    cpu: runs the command under cProfile, writing the '.prof' stats and a summary of the top '--profile-top' functions
+        by cumulative time.
+    mem: traces the allocations with tracemalloc, writing the top allocation differences between every `checkpoint`
+        (race boundaries) and for the whole run.
+
+    Reports are written into the logs folder named after the command and the current time.
+    """
+
+    def create_parser(self, prog_name: str, subcommand: str, **kwargs):
+        parser = super().create_parser(prog_name, subcommand, **kwargs)  # pyright: ignore
+        parser.add_argument(
+            "--profile",
+            nargs="?",
+            const=PROFILE_CPU,
+            default=None,
+            choices=PROFILE_MODES,
+            help="profile the command CPU usage, memory allocations or both.",
+        )
+        parser.add_argument("--profile-top", type=int, default=50, help="number of entries in the profile summaries.")
+        return parser
+
+    def execute(self, *args, **options):
+        mode = options.get("profile")
+        if not mode:
+            return super().execute(*args, **options)  # pyright: ignore
+
+        name = f"{self.__module__.rsplit('.', 1)[-1]}-{datetime.now().strftime('%Y%m%d%H%M%S')}"
+        with profile(os.path.join(settings.LOG_ROOT, name), mode, top=options.get("profile_top") or 50):
+            return super().execute(*args, **options)  # pyright: ignore
+
+
+@contextmanager
+def profile(path: str, mode: str, top: int = 50) -> Generator[None]:
+    """
+    Profile the code inside the context writing the reports to '{path}.prof', '{path}.cpu.txt' and '{path}.mem.txt'.
+    """
+    global _memory_profiler
+
+    profiler = cProfile.Profile() if mode in [PROFILE_CPU, PROFILE_BOTH] else None
+    memory_profiler = _MemoryProfiler(f"{path}.mem.txt", top) if mode in [PROFILE_MEM, PROFILE_BOTH] else None
+
+    if memory_profiler:
+        _memory_profiler = memory_profiler
+        memory_profiler.start()
+    if profiler:
+        profiler.enable()
+    try:
+        yield
+    finally:
+        if profiler:
+            profiler.disable()
+            _write_cpu_report(profiler, path, top)
+        if memory_profiler:
+            memory_profiler.stop()
+            _memory_profiler = None
+
+
+def checkpoint(label: str):
+    """
+    Mark a boundary (ex: a race was ingested) for the memory profiler, no-op when memory is not being profiled.
+    """
+    if _memory_profiler:
+        _memory_profiler.checkpoint(label)
+
+
+def _write_cpu_report(profiler: cProfile.Profile, path: str, top: int):
+    profiler.dump_stats(f"{path}.prof")
+
+    summary = io.StringIO()
+    pstats.Stats(profiler, stream=summary).sort_stats(pstats.SortKey.CUMULATIVE).print_stats(top)
+    with open(f"{path}.cpu.txt", "w") as file:
+        file.write(summary.getvalue())
+    logger.info(f"CPU profile written to {path}.prof and {path}.cpu.txt")
+
+
+class _MemoryProfiler:
+    def __init__(self, path: str, top: int):
+        self.path = path
+        self.top = top
+        self._file: io.TextIOWrapper | None = None
+        self._first: tracemalloc.Snapshot | None = None
+        self._last: tracemalloc.Snapshot | None = None
+
+    def start(self):
+        tracemalloc.start()
+        self._file = open(self.path, "w")
+        self._first = self._last = self._snapshot()
+
+    def checkpoint(self, label: str):
+        snapshot = self._snapshot()
+        assert self._last is not None
+        self._write(label, snapshot.compare_to(self._last, "lineno"))
+        self._last = snapshot
+
+    def stop(self):
+        assert self._first is not None and self._file is not None
+        self._write("TOTAL", self._snapshot().compare_to(self._first, "lineno"))
+        tracemalloc.stop()
+        self._file.close()
+        logger.info(f"memory profile written to {self.path}")
+
+    def _snapshot(self) -> tracemalloc.Snapshot:
+        return tracemalloc.take_snapshot().filter_traces([tracemalloc.Filter(False, tracemalloc.__file__)])
+
+    def _write(self, label: str, stats: list[tracemalloc.StatisticDiff]):
+        assert self._file is not None
+        current, peak = tracemalloc.get_traced_memory()
+        self._file.write(f"===== {label} :: current={current / 1024:.1f}KiB peak={peak / 1024:.1f}KiB =====\n")
+        for stat in stats[: self.top]:
+            self._file.write(f"{stat}\n")
+        self._file.write("\n")
+        self._file.flush()
@@ -0,0 +1,199 @@
+import json
+import logging
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import defaultdict
+from collections.abc import Iterable
+from concurrent.futures import ThreadPoolExecutor
+from itertools import batched
+from typing import Any, override
+
+from django.conf import settings
+from django.core.management import BaseCommand
+from django.db import models, transaction
+from django.db.models import Q, QuerySet
+
+from apps.actions.management.helpers import profiling
+from apps.actions.management.helpers.cassettes import CassetteMixin
+from apps.actions.management.helpers.downloads import throttle
+from apps.actions.management.helpers.profiling import ProfileMixin
+from apps.participants.models import deferred_refresh
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimiter:
+    """
+    Thread-safe limiter ensuring at least 'interval' seconds between consecutive calls to 'wait', called before every
+    request sent by the fetchers.
+    """
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._next_call = 0.0
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            delay = max(0.0, self._next_call - now)
+            self._next_call = max(now, self._next_call) + self.interval
+        if delay:
+            time.sleep(delay)
+
+
+class RepairCommand(ProfileMixin, CassetteMixin, BaseCommand, ABC):
+    """
+    Base command to repair database rows using data fetched from a datasource.
+
+    The queryset is streamed in chunks ordered by pk. For each chunk the HTTP fetches run in a thread pool, every
+    request under a shared rate limiter, while the already fetched objects are prepared. Then the chunk is processed in
+    a transaction, all the modified objects are written with a 'bulk_update' per model and the last processed pk is
+    saved as a checkpoint so an interrupted run can be resumed. The objects whose fetch failed are saved along with it
+    and retried by the next run.
+
+    Subclasses should implement:
+        get_queryset: the objects to repair.
+        fetch: retrieve the remote data for an object. Runs in a worker thread so it shouldn't touch the database.
+        prepare: (optional) ask for the choices needing a human, before the chunk transaction is opened.
+        process: apply the prepared data returning the modified objects to be saved.
+        update_fields: the fields to 'bulk_update' for each model returned by 'process'.
+    """
+
+    update_fields: dict[type[models.Model], list[str]] = {}
+
+    @override
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=50, help="number of objects processed per chunk.")
+        parser.add_argument("--workers", type=int, default=2, help="number of concurrent fetchers.")
+        parser.add_argument("--delay", type=float, default=5, help="minimum seconds between two fetches.")
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            default=False,
+            help="process everything but rollback the changes.",
+        )
+        parser.add_argument(
+            "--restart",
+            action="store_true",
+            default=False,
+            help="ignore the saved checkpoint and start from the beginning.",
+        )
+
+    @property
+    def repair_name(self) -> str:
+        return self.__module__.rsplit(".", 1)[-1]
+
+    @property
+    def checkpoint_path(self) -> str:
+        return os.path.join(settings.LOG_ROOT, f"{self.repair_name}.checkpoint")
+
+    @abstractmethod
+    def get_queryset(self, **options) -> QuerySet: ...
+
+    @abstractmethod
+    def fetch(self, obj: Any) -> Any: ...
+
+    def prepare(self, obj: Any, fetched: Any) -> Any:
+        """
+        Complete the fetched data with the answers of the prompts, so no transaction is open while waiting for them.
+        """
+        return fetched
+
+    @abstractmethod
+    def process(self, obj: Any, prepared: Any) -> Iterable[models.Model]: ...
+
+    @override
+    def handle(self, *_, **options):
+        self._setup_logging()
+        logger.info(f"{options}")
+
+        chunk_size, workers, dry_run = options["chunk_size"], options["workers"], options["dry_run"]
+        self.rate_limiter = RateLimiter(options["delay"])
+
+        last_pk, failed = (None, set()) if options["restart"] else self.load_checkpoint()
+        queryset = self.get_queryset(**options).order_by("pk")
+        if last_pk is not None:
+            logger.info(f"resuming after pk={last_pk}, retrying {len(failed)} failed objects")
+            queryset = queryset.filter(Q(pk__gt=last_pk) | Q(pk__in=failed))
+
+        processed = 0
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for chunk in batched(queryset.iterator(chunk_size=chunk_size), chunk_size):
+                futures = [executor.submit(self._fetch, obj) for obj in chunk]
+                # prompts wait for a human, so they are answered before the chunk transaction takes any lock
+                prepared, unfetched = [], set()
+                for obj, future in zip(chunk, futures):
+                    if (error := future.exception()) is not None:
+                        logger.error(f"unable to fetch data for {obj.pk}: {error}")
+                        unfetched.add(obj.pk)
+                        prepared.append(None)
+                    else:
+                        fetched = future.result()
+                        prepared.append(self.prepare(obj, fetched) if fetched is not None else None)
+
+                # the positions and standings of the whole chunk are refreshed once, when it commits
+                with transaction.atomic(), deferred_refresh():
+                    to_update: dict[type[models.Model], dict[Any, models.Model]] = defaultdict(dict)
+                    for obj, data in zip(chunk, prepared):
+                        processed += 1
+                        logger.info(f"processing {processed} :: {obj.pk} - {obj}")
+                        for modified in self.process(obj, data) if data is not None else []:
+                            to_update[type(modified)][modified.pk] = modified
+                        profiling.checkpoint(f"{obj.pk} - {obj}")
+
+                    self.flush(to_update)
+                    if dry_run:
+                        logger.info("dry run, rolling back chunk changes")
+                        transaction.set_rollback(True)
+
+                if not dry_run:
+                    failed = (failed - {obj.pk for obj in chunk}) | unfetched
+                    last_pk = max(last_pk or chunk[-1].pk, chunk[-1].pk)
+                    self.save_checkpoint(last_pk, failed)
+
+        logger.info(f"processed {processed} objects")
+        if failed:
+            logger.warning(f"unable to fetch {len(failed)} objects, they will be retried by the next run: {failed}")
+        elif not dry_run and os.path.exists(self.checkpoint_path):
+            os.remove(self.checkpoint_path)
+
+    def flush(self, to_update: dict[type[models.Model], dict[Any, models.Model]]):
+        # the models' bulk updates archive the scraped payloads and refresh the derived tables themselves
+        for model, objects in to_update.items():
+            fields = self.update_fields.get(model)
+            assert fields, f"no update fields declared for {model.__name__}"
+            logger.info(f"bulk updating {len(objects)} {model.__name__}")
+            model.objects.bulk_update(list(objects.values()), fields)  # pyright: ignore
+
+    def load_checkpoint(self) -> tuple[int | None, set[Any]]:
+        """
+        Last processed pk and the pks whose fetch failed, to be retried.
+        """
+        if not os.path.exists(self.checkpoint_path):
+            return None, set()
+        with open(self.checkpoint_path) as file:
+            value = file.read().strip()
+        if not value:
+            return None, set()
+        checkpoint = json.loads(value)
+        if isinstance(checkpoint, int):
+            # checkpoints saved before failed objects were tracked
+            return checkpoint, set()
+        return checkpoint["last_pk"], set(checkpoint["failed"])
+
+    def save_checkpoint(self, pk: Any, failed: set[Any]):
+        with open(self.checkpoint_path, "w") as file:
+            json.dump({"last_pk": pk, "failed": sorted(failed)}, file)
+
+    def _fetch(self, obj: Any) -> Any:
+        with throttle(self.rate_limiter.wait):
+            return self.fetch(obj)
+
+    def _setup_logging(self):
+        file_handler = logging.FileHandler(os.path.join(settings.LOG_ROOT, f"{self.repair_name}.log"))
+        file_handler.setFormatter(logging.Formatter("%(levelname)s %(asctime)s %(message)s"))
+        for name in [__name__, self.__module__]:
+            logging.getLogger(name).addHandler(file_handler)
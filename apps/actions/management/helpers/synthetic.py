@@ -0,0 +1,203 @@
+import logging
+import random
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from itertools import product
+
+from apps.entities.models import Entity, EntityLineage, League
+from apps.participants.models import Participant
+from apps.races.models import Flag, Race, Trophy
+from apps.utils import lemmas
+from apps.utils.choices import (
+    CATEGORY_ABSOLUT,
+    ENTITY_CLUB,
+    GENDER_FEMALE,
+    GENDER_MALE,
+    RACE_CONVENTIONAL,
+    RACE_TIME_TRIAL,
+    RACE_TRAINERA,
+)
+from apps.utils.laps import centiseconds_to_time
+from pyutils.strings import int_to_roman
+
+logger = logging.getLogger(__name__)
+
+TOWNS = [
+    "ORIO", "ZUMAIA", "GETARIA", "HONDARRIBIA", "PASAI DONIBANE", "PASAI SAN PEDRO", "SAN JUAN", "ONDARROA", "LEKEITIO",
+    "MUNDAKA", "BERMEO", "ELANTXOBE", "MUTRIKU", "DEBA", "ZARAUTZ", "HIBAIKA", "KAIKU", "SANTURTZI", "PORTUGALETE",
+    "SESTAO", "ARKOTE", "PLENTZIA", "CASTRO URDIALES", "LAREDO", "SANTOÑA", "COLINDRES", "ASTILLERO", "PEDREÑA",
+    "CAMARGO", "SANTANDER", "SAN VICENTE", "LLANES", "RIBADESELLA", "GIJON", "LUANCO", "CANDAS", "CUDILLERO",
+    "CASTROPOL", "RIBADEO", "CARIÑO", "ARES", "MUGARDOS", "PERILLO", "MERA", "MIÑO", "A CORUÑA", "MALPICA", "MUROS",
+    "NOIA", "PUEBLA", "RIANXO", "BOIRO", "CABO DA CRUZ", "ESTEIRO", "VILAXOAN", "ARENAL", "TIRAN", "MOAÑA", "CANGAS",
+    "CHAPELA", "BUEU", "BEIRO", "MECOS", "A CABANA", "SAMERTOLAMEU", "MEIRA", "AMEGROVE", "PORTONOVO", "VILAGARCIA",
+]  # fmt: skip
+CLUB_PREFIXES = ["CLUB REMO", "CR", "SD", "CLUB DE REMO", "ARRAUN ELKARTEA", "SOCIEDAD DEPORTIVA"]
+FLAG_PREFIXES = ["BANDERA", "BANDEIRA", "IKURRIÑA", "BANDERA CONCELLO DE", "GRAN PREMIO", "BANDEIRA DEPUTACIÓN DE"]
+TROPHY_PREFIXES = ["TROFEO", "TROFEO DIPUTACIÓN DE", "REGATA", "CAMPEONATO DE"]
+SPONSORS = ["PETRONOR", "CAIXANOVA", "EL CORTE INGLES", "KAIKU", "URBASA", "HONDARRIBIA", "LAMPARA", "RIO NERVION"]
+LEAGUES = [
+    ("LIGA ACT", "ACT", GENDER_MALE),
+    ("LIGA ARC 1", "ARC1", GENDER_MALE),
+    ("LIGA ARC 2", "ARC2", GENDER_MALE),
+    ("LIGA GALEGA DE TRAIÑAS A", "LGT-A", GENDER_MALE),
+    ("LIGA GALEGA DE TRAIÑAS B", "LGT-B", GENDER_MALE),
+    ("LIGA ETE", "ETE", GENDER_FEMALE),
+    ("LIGA GALEGA DE TRAIÑAS FEMENINA", "LGT-F", GENDER_FEMALE),
+]
+
+
+@dataclass
+class SyntheticDataset:
+    """
+    Rows created by `generate`, used to build representative benchmark inputs.
+    """
+
+    leagues: list[League] = field(default_factory=list)
+    clubs: list[Entity] = field(default_factory=list)
+    flags: list[Flag] = field(default_factory=list)
+    trophies: list[Trophy] = field(default_factory=list)
+    races: list[Race] = field(default_factory=list)
+    participants: int = 0
+
+    @property
+    def counts(self) -> dict[str, int]:
+        return {
+            "leagues": len(self.leagues),
+            "clubs": len(self.clubs),
+            "flags": len(self.flags),
+            "trophies": len(self.trophies),
+            "races": len(self.races),
+            "participants": self.participants,
+        }
+
+
+def generate(scale: float = 1, seed: int = 0, participants_per_race: int = 10) -> SyntheticDataset:
+    """
+    Generate a seeded synthetic dataset of leagues, clubs, competitions, races and participants.
+
+    At scale 1 the dataset is roughly the size of the current production database, every other scale multiplies the
+    number of clubs, competitions and races.
+    """
+    rng = random.Random(seed)
+    prefix = f"SYN{seed} "
+    dataset = SyntheticDataset()
+
+    logger.info("generating leagues")
+    dataset.leagues = League.objects.bulk_create(
+        [League(name=f"{prefix}{name}", symbol=symbol, gender=gender) for name, symbol, gender in LEAGUES]
+    )
+
+    logger.info("generating clubs")
+    clubs = []
+    for name, town in _names(rng, CLUB_PREFIXES, TOWNS, int(150 * scale)):
+        short = name.replace("CLUB DE REMO ", "CR ").replace("CLUB REMO ", "CR ")
+        clubs.append(
+            Entity(
+                name=f"{prefix}{name}",
+                normalized_name=f"{prefix}{town}",
+                known_names=list(dict.fromkeys([f"{prefix}{name}", f"{prefix}{short}", f"{prefix}{town}"])),
+                type=ENTITY_CLUB,
+            )
+        )
+    dataset.clubs = Entity.objects.bulk_create(clubs)
+    EntityLineage.add(dataset.clubs)
+
+    logger.info("generating competitions")
+    dataset.flags = Flag.objects.bulk_create(
+        [
+            Flag(name=f"{prefix}{name}", tokens=lemmas.lemmatize(f"{prefix}{name}"))
+            for name, _ in _names(rng, FLAG_PREFIXES, TOWNS + SPONSORS, int(400 * scale))
+        ]
+    )
+    dataset.trophies = Trophy.objects.bulk_create(
+        [
+            Trophy(name=f"{prefix}{name}", tokens=lemmas.lemmatize(f"{prefix}{name}"))
+            for name, _ in _names(rng, TROPHY_PREFIXES, TOWNS, int(60 * scale))
+        ]
+    )
+
+    logger.info("generating races")
+    editions: dict[int, int] = defaultdict(int)
+    trophy_editions: dict[int, int] = defaultdict(int)
+    league_dates: set[tuple[int, date]] = set()
+    races = []
+    for _ in range(int(3000 * scale)):
+        flag = rng.choice(dataset.flags)
+        editions[flag.pk] += 1
+        # some flags are raced along with a trophy, so trophy matching and editions are exercised too
+        trophy = rng.choice(dataset.trophies) if dataset.trophies and rng.random() < 0.25 else None
+        if trophy:
+            trophy_editions[trophy.pk] += 1
+        race_date = date(2000, 6, 1) + timedelta(days=rng.randrange(365 * 25))
+        league = rng.choice(dataset.leagues) if rng.random() < 0.6 else None
+        if league and (league.pk, race_date) in league_dates:
+            league = None
+        if league:
+            league_dates.add((league.pk, race_date))
+
+        races.append(
+            Race(
+                laps=4,
+                lanes=4,
+                type=RACE_TIME_TRIAL if rng.random() < 0.1 else RACE_CONVENTIONAL,
+                date=race_date,
+                day=1,
+                race_names=[f"{int_to_roman(editions[flag.pk])} {flag.name}"],
+                sponsor=rng.choice(SPONSORS) if rng.random() < 0.3 else None,
+                trophy=trophy,
+                trophy_edition=trophy_editions[trophy.pk] if trophy else None,
+                flag=flag,
+                flag_edition=editions[flag.pk],
+                league=league,
+                gender=league.gender if league else rng.choice([GENDER_MALE, GENDER_FEMALE]),
+                category=CATEGORY_ABSOLUT,
+                modality=RACE_TRAINERA,
+            )
+        )
+    dataset.races = Race.objects.bulk_create(races)
+    Race.refresh_search_documents(Race.objects.filter(pk__in=[r.pk for r in dataset.races]))
+
+    logger.info("generating participants")
+    participants = []
+    for race in dataset.races:
+        for lane, club in enumerate(rng.sample(dataset.clubs, min(participants_per_race, len(dataset.clubs)))):
+            # ~5:30 per lap with some noise, laps are cumulative
+            laps_cs = []
+            for _ in range(race.laps or 4):
+                laps_cs.append((laps_cs[-1] if laps_cs else 0) + rng.randint(30_000, 36_000))
+            participants.append(
+                Participant(
+                    club_names=[club.known_names[0]],
+                    club=club,
+                    race=race,
+                    distance=5556,
+                    laps=[centiseconds_to_time(lap) for lap in laps_cs],
+                    lane=lane % 4 + 1,
+                    series=lane // 4 + 1,
+                    gender=race.gender,
+                    category=CATEGORY_ABSOLUT,
+                )
+            )
+    # ranks the races and refreshes their standings and speeds
+    Participant.objects.bulk_create(participants, batch_size=5000)
+    dataset.participants = len(participants)
+
+    logger.info(f"generated {dataset.counts}")
+    return dataset
+
+
+def _names(rng: random.Random, prefixes: list[str], suffixes: list[str], count: int) -> list[tuple[str, str]]:
+    """
+    Unique (name, suffix) combinations, numbered once every combination has been used.
+    """
+    combinations = list(product(prefixes, suffixes))
+    rng.shuffle(combinations)
+
+    names = []
+    for idx in range(count):
+        prefix, suffix = combinations[idx % len(combinations)]
+        lap = idx // len(combinations)
+        name = f"{prefix} {suffix}" if lap == 0 else f"{prefix} {suffix} {lap + 1}"
+        names.append((name, suffix))
+    return names
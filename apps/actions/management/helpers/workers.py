@@ -0,0 +1,99 @@
+import logging
+import multiprocessing
+import queue
+import traceback
+from collections.abc import Callable
+from multiprocessing.queues import Queue
+from typing import Any
+
+from django.db import connections
+
+from apps.utils.lazy import lazy_import
+
+inquirer = lazy_import("inquirer")
+logger = logging.getLogger(__name__)
+
+_PROMPTS = ["confirm", "text", "list_input"]
+
+
+def run_sharded[T, R](function: Callable[[T], R], shards: list[T]) -> list[R]:
+    """
+    Run 'function' for every shard in its own forked process and return the results in the order of the shards.
+
+    Every process opens its own database connection. Workers have no terminal, so their prompts are relayed to this
+    process and answered one at a time, prefixed with the shard they come from.
+    """
+    context = multiprocessing.get_context("fork")
+    prompts, results = context.Queue(), context.Queue()
+    answers = [context.Queue() for _ in shards]
+
+    # forked processes can't share the connections (nor the connection pool) of the parent
+    connections.close_all()
+    for connection in connections.all():
+        connection.close_pool()  # pyright: ignore
+    workers = [
+        context.Process(target=_work, args=(idx, function, shard, prompts, answers[idx], results), daemon=True)
+        for idx, shard in enumerate(shards)
+    ]
+    for worker in workers:
+        worker.start()
+    logger.info(f"started {len(workers)} workers")
+
+    outcomes: dict[int, tuple[bool, Any]] = {}
+    while len(outcomes) < len(workers):
+        finished = [idx for idx, worker in enumerate(workers) if not worker.is_alive()]
+
+        try:
+            idx, name, args, kwargs = prompts.get(timeout=0.1)
+            message, *args = args
+            answers[idx].put(getattr(inquirer, name)(f"[{shards[idx]}] {message}", *args, **kwargs))
+        except queue.Empty:
+            pass
+
+        while True:
+            try:
+                idx, ok, value = results.get_nowait()
+                outcomes[idx] = (ok, value)
+            except queue.Empty:
+                break
+
+        for idx in finished:
+            if idx not in outcomes:
+                outcomes[idx] = (False, f"worker exited with code {workers[idx].exitcode}")
+
+    for worker in workers:
+        worker.join()
+
+    failed = {idx: value for idx, (ok, value) in outcomes.items() if not ok}
+    for idx, error in failed.items():
+        logger.error(f"worker for {shards[idx]} failed:\n{error}")
+    if failed:
+        raise RuntimeError(f"{len(failed)} of {len(workers)} workers failed")
+
+    return [outcomes[idx][1] for idx in range(len(workers))]
+
+
+def _work(
+    idx: int,
+    function: Callable[[Any], Any],
+    shard: Any,
+    prompts: Queue,
+    answers: Queue,
+    results: Queue,
+):
+    def relayed(name: str) -> Callable[..., Any]:
+        def prompt(*args, **kwargs):
+            prompts.put((idx, name, args, kwargs))
+            return answers.get()
+
+        return prompt
+
+    for name in _PROMPTS:
+        setattr(inquirer, name, relayed(name))
+
+    try:
+        results.put((idx, True, function(shard)))
+    except Exception:
+        results.put((idx, False, traceback.format_exc()))
+    finally:
+        connections.close_all()
@@ -1,13 +1,17 @@
-from rscraping.clients import Client
+from typing import TYPE_CHECKING
+
 from rscraping.data.models import Datasource
 
 from ._ingester import Ingester as Ingester
 from ._protocol import IngesterProtocol as IngesterProtocol
 from .traineras import TrainerasIngester as TrainerasIngester
 
+if TYPE_CHECKING:
+    from rscraping.clients import Client
+
 
 def build_ingester(
-    client: Client | None = None,
+    client: "Client | None" = None,
     ignored_races: list[str] = [],
 ) -> IngesterProtocol:
     assert client
@@ -2,20 +2,22 @@ import logging
 import time
 from collections.abc import Generator
 from datetime import date, datetime
-from typing import override
+from typing import TYPE_CHECKING, override
 
 from apps.entities.models import Entity
 from apps.races.services import MetadataService
-from rscraping.clients import ClientProtocol
 from rscraping.data.models import Race as RSRace
 
 from ._protocol import IngesterProtocol
 
+if TYPE_CHECKING:
+    from rscraping.clients import ClientProtocol
+
 logger = logging.getLogger(__name__)
 
 
 class Ingester(IngesterProtocol):
-    def __init__(self, client: ClientProtocol, ignored_races: list[str]):
+    def __init__(self, client: "ClientProtocol", ignored_races: list[str]):
         self.client = client
         self._ignored_races = ignored_races
 
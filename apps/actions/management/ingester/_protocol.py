@@ -1,13 +1,15 @@
 from collections.abc import Generator
-from typing import Protocol
+from typing import TYPE_CHECKING, Protocol
 
 from apps.entities.models import Entity
-from rscraping.clients import ClientProtocol
 from rscraping.data.models import Race as RSRace
 
+if TYPE_CHECKING:
+    from rscraping.clients import ClientProtocol
+
 
 class IngesterProtocol(Protocol):
-    client: ClientProtocol
+    client: "ClientProtocol"
 
     def fetch(self, **kwargs) -> Generator[RSRace]:
         """
@@ -3,16 +3,20 @@ import time
 from collections.abc import Generator
 from typing import override
 
+import requests
+
 from apps.races.services import MetadataService
-from rscraping.clients import TrainerasClient
-from rscraping.data.constants import GENDER_ALL
+from apps.utils.lazy import lazy_import
+from rscraping.data.constants import GENDER_ALL, HTTP_HEADERS
 from rscraping.data.models import Datasource
 from rscraping.data.models import Participant as RSParticipant
 from rscraping.data.models import Race as RSRace
-from rscraping.parsers.html import MultiRaceException
 
 from ._ingester import Ingester
 
+clients = lazy_import("rscraping.clients")
+html = lazy_import("rscraping.parsers.html")
+parsel = lazy_import("parsel")
 logger = logging.getLogger(__name__)
 
 
@@ -98,7 +102,7 @@ class TrainerasIngester(Ingester):
         only_new: bool = False,
         **kwargs,
     ) -> Generator[RSRace]:
-        assert isinstance(self.client, TrainerasClient)
+        assert isinstance(self.client, clients.TrainerasClient)
 
         # when searching for new races we want to start from the most recent ones
         race_ids = (
@@ -129,19 +133,34 @@ class TrainerasIngester(Ingester):
 
         try:
             time.sleep(1)
-            race = self.client.get_race_by_id(race_id)
-            if race:
-                yield race
-        except MultiRaceException:
-            table = 1
-            while True:
-                time.sleep(1)
-                race = self.client.get_race_by_id(race_id, table=table)
-                if not race:
-                    break
-                logger.debug(f"found multi race for {race_id=}:\n\t{race}")
-                table += 1
-                yield race
+            races = self._retrieve_tables(race_id)
         except ValueError as e:
             logger.error(e)
-        return
+            return
+
+        yield from races
+
+    def _retrieve_tables(self, race_id: str) -> list[RSRace]:
+        """
+        Retrieve all the races of a page, multi-race pages are downloaded and parsed once and every table is read from
+        the same parsed document.
+        """
+        assert isinstance(self.client, clients.TrainerasClient)
+
+        url = self.client.get_race_details_url(race_id)
+        selector = parsel.Selector(requests.get(url=url, headers=HTTP_HEADERS()).content.decode("utf-8"))
+        parser = self.client._html_parser
+
+        try:
+            race = parser.parse_race(selector, race_id=race_id)
+            races = [race] if race else []
+        except html.MultiRaceException:
+            races, table = [], 1
+            while race := parser.parse_race(selector, race_id=race_id, table=table):
+                logger.debug(f"found multi race for {race_id=}:\n\t{race}")
+                races.append(race)
+                table += 1
+
+        for race in races:
+            race.url = url
+        return races
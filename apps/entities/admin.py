@@ -7,7 +7,15 @@ from djutils.admin import TraceableModelAdmin
 @admin.register(Entity)
 class EntityAdmin(TraceableModelAdmin):
     list_filter = ("type",)
+    search_fields = ("name", "normalized_name")
 
 
-admin.site.register(EntityPartnership, admin.ModelAdmin)
-admin.site.register(League, TraceableModelAdmin)
+@admin.register(EntityPartnership)
+class EntityPartnershipAdmin(admin.ModelAdmin):
+    list_select_related = ("part", "target")
+    autocomplete_fields = ("part", "target")
+
+
+@admin.register(League)
+class LeagueAdmin(TraceableModelAdmin):
+    search_fields = ("name", "symbol")
@@ -0,0 +1,79 @@
+# Generated by Django 6.0.7 on 2026-10-19 15:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+BUILD_SQL = """
+    WITH RECURSIVE edges AS (
+        SELECT parent_id AS ancestor_id, id AS descendant_id, FALSE AS is_partnership
+        FROM entity
+        WHERE parent_id IS NOT NULL
+        UNION ALL
+        SELECT target_id, part_id, TRUE
+        FROM entity_partnership
+        WHERE is_active
+    ), lineage AS (
+        SELECT id AS ancestor_id, id AS descendant_id, 0 AS depth, FALSE AS is_partnership, ARRAY[id] AS path
+        FROM entity
+        UNION ALL
+        SELECT
+            l.ancestor_id,
+            e.descendant_id,
+            l.depth + 1,
+            l.is_partnership OR e.is_partnership,
+            l.path || e.descendant_id
+        FROM lineage l JOIN edges e ON e.ancestor_id = l.descendant_id
+        WHERE NOT e.descendant_id = ANY(l.path)
+    )
+    INSERT INTO entity_lineage (ancestor_id, descendant_id, depth, is_partnership)
+    SELECT DISTINCT ON (ancestor_id, descendant_id) ancestor_id, descendant_id, depth, is_partnership
+    FROM lineage
+    ORDER BY ancestor_id, descendant_id, depth, is_partnership;
+"""
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("entities", "0010_entity_town"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="EntityLineage",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("depth", models.PositiveSmallIntegerField(default=0)),
+                ("is_partnership", models.BooleanField(default=False)),
+                (
+                    "ancestor",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="descendant_links",
+                        related_query_name="descendant_link",
+                        to="entities.entity",
+                    ),
+                ),
+                (
+                    "descendant",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="ancestor_links",
+                        related_query_name="ancestor_link",
+                        to="entities.entity",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Linaje de entidad",
+                "verbose_name_plural": "Linajes de entidades",
+                "db_table": "entity_lineage",
+                "indexes": [
+                    models.Index(fields=["descendant", "ancestor"], name="entity_lineage_descendant_idx"),
+                ],
+                "constraints": [
+                    models.UniqueConstraint(fields=("ancestor", "descendant"), name="unique_entity_lineage"),
+                ],
+            },
+        ),
+        migrations.RunSQL(BUILD_SQL, reverse_sql=migrations.RunSQL.noop),
+    ]
@@ -1,12 +1,44 @@
 from django.contrib.postgres.fields import ArrayField
-from django.db import models
+from django.db import connection, models
 from django.db.models import F, Func, JSONField, QuerySet, Value
 
 from apps.schemas import ENTITY_METADATA_SCHEMA, default_metadata
+from apps.utils import cache
 from apps.utils.choices import CATEGORY_CHOICES, ENTITY_TYPE_CHOICES, GENDER_CHOICES, GENDER_FEMALE, GENDER_MALE
+from apps.utils.locks import advisory_lock
 from djutils.models import TraceableModel
 from djutils.validators import JSONSchemaValidator
 
+# entities reachable from each entity through fused/subsidiary entities ('parent') and active partnership components,
+# keeping the shortest path and guarding against cycles
+_LINEAGE_SQL = """
+    WITH RECURSIVE edges AS (
+        SELECT parent_id AS ancestor_id, id AS descendant_id, FALSE AS is_partnership
+        FROM entity
+        WHERE parent_id IS NOT NULL
+        UNION ALL
+        SELECT target_id, part_id, TRUE
+        FROM entity_partnership
+        WHERE is_active
+    ), lineage AS (
+        SELECT id AS ancestor_id, id AS descendant_id, 0 AS depth, FALSE AS is_partnership, ARRAY[id] AS path
+        FROM entity
+        UNION ALL
+        SELECT
+            l.ancestor_id,
+            e.descendant_id,
+            l.depth + 1,
+            l.is_partnership OR e.is_partnership,
+            l.path || e.descendant_id
+        FROM lineage l JOIN edges e ON e.ancestor_id = l.descendant_id
+        WHERE NOT e.descendant_id = ANY(l.path)
+    )
+    INSERT INTO entity_lineage (ancestor_id, descendant_id, depth, is_partnership)
+    SELECT DISTINCT ON (ancestor_id, descendant_id) ancestor_id, descendant_id, depth, is_partnership
+    FROM lineage
+    ORDER BY ancestor_id, descendant_id, depth, is_partnership
+"""
+
 
 class League(TraceableModel):
     name = models.CharField(unique=True, max_length=150)
@@ -93,8 +125,19 @@ class Entity(TraceableModel):
         )
 
     def save(self, *args, **kwargs):
+        """
+        Keeps the lineage in sync: a new entity without parent only links to itself, the whole closure is rebuilt when
+        a parent is set or changed. Bulk writes ('QuerySet.update(parent=...)', 'bulk_create') skip this, so they have
+        to call `EntityLineage.add` or `EntityLineage.refresh` themselves.
+        """
         self.full_clean()
+        adding = self._state.adding
+        previous = None if adding else Entity.all_objects.filter(pk=self.pk).values_list("parent_id", flat=True).first()
         super().save(*args, **kwargs)
+        if adding and not self.parent_id:  # pyright: ignore
+            EntityLineage.add([self])
+        elif previous != self.parent_id:  # pyright: ignore
+            EntityLineage.refresh()
 
     class Meta(TraceableModel.Meta):
         db_table = "entity"
@@ -122,7 +165,79 @@ class EntityPartnership(models.Model):
     def __str__(self):
         return f"{self.part} ({self.target})"
 
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        EntityLineage.refresh()
+
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        EntityLineage.refresh()
+        return result
+
     class Meta:
         db_table = "entity_partnership"
         verbose_name = "Fusión"
         verbose_name_plural = "Fusiones"
+
+
+class EntityLineage(models.Model):
+    """
+    Closure table of the entity graph: a row for every entity reachable from 'ancestor' through fused or subsidiary
+    entities and active partnership components, the entity itself included at depth 0.
+
+    Rebuilt by `refresh` whenever a parent or a partnership changes, and extended by `add` for new entities without
+    parent, so expanding a club to its whole lineage is a single indexed join.
+    """
+
+    ancestor = models.ForeignKey(
+        to=Entity,
+        on_delete=models.CASCADE,
+        related_name="descendant_links",
+        related_query_name="descendant_link",
+    )
+    descendant = models.ForeignKey(
+        to=Entity,
+        on_delete=models.CASCADE,
+        related_name="ancestor_links",
+        related_query_name="ancestor_link",
+    )
+    depth = models.PositiveSmallIntegerField(default=0)
+    # whether the shortest path goes through a partnership
+    is_partnership = models.BooleanField(default=False)
+
+    def __str__(self):
+        return f"{self.ancestor_id} -> {self.descendant_id} ({self.depth})"  # pyright: ignore
+
+    @classmethod
+    def add(cls, entities: list[Entity]):
+        """
+        Link new entities without parent to themselves, nothing else can reach them until a parent or a partnership is
+        set.
+        """
+        cls.objects.bulk_create(
+            [cls(ancestor=e, descendant=e, depth=0, is_partnership=False) for e in entities],
+            ignore_conflicts=True,
+        )
+
+    @classmethod
+    def refresh(cls):
+        """
+        Rebuild the whole closure, the graph is small enough for it to be cheaper than patching paths.
+        """
+        with advisory_lock(cls._meta.db_table):
+            with connection.cursor() as cursor:
+                cursor.execute(f"DELETE FROM {cls._meta.db_table}")
+                cursor.execute(_LINEAGE_SQL)
+        # speeds filtered by a club lineage may have changed
+        cache.bump(cache.SPEEDS)
+
+    class Meta:
+        db_table = "entity_lineage"
+        verbose_name = "Linaje de entidad"
+        verbose_name_plural = "Linajes de entidades"
+        constraints = [
+            models.UniqueConstraint(fields=["ancestor", "descendant"], name="unique_entity_lineage"),
+        ]
+        indexes = [
+            models.Index(fields=["descendant", "ancestor"], name="entity_lineage_descendant_idx"),
+        ]
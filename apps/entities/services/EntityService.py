@@ -1,7 +1,7 @@
 import operator
 from functools import reduce
 
-from django.db.models import Q
+from django.db.models import Q, QuerySet
 
 from apps.entities.models import Entity
 from apps.utils.choices import ENTITY_CLUB, ENTITY_TYPES
@@ -16,6 +16,20 @@ def get_entity_or_none(entity_id: int) -> Entity | None:
         return None
 
 
+def get_lineage(entity: Entity) -> QuerySet[Entity]:
+    """
+    :return: the entity, its fused or subsidiary entities and its active partnership components
+    """
+    return Entity.all_objects.filter(ancestor_link__ancestor=entity)
+
+
+def get_ancestors(entity: Entity) -> QuerySet[Entity]:
+    """
+    :return: the entity and every entity whose lineage includes it
+    """
+    return Entity.all_objects.filter(descendant_link__descendant=entity)
+
+
 def get_closest_club_by_name(name: str, include_deleted: bool | None = None) -> Entity | None:
     """
     :return: closest found club in the database
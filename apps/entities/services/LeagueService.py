@@ -1,4 +1,7 @@
+from django.db.models import QuerySet
+
 from apps.entities.models import League
+from apps.participants.models import Standing
 from rscraping.data.normalization.leagues import normalize_league_name
 
 
@@ -9,3 +12,17 @@ def get_by_name(name: str) -> League:
     name = normalize_league_name(name)
 
     return League.objects.get(name=name)
+
+
+def get_standings(
+    league: League, season: int, gender: str | None = None, category: str | None = None
+) -> QuerySet[Standing]:
+    """
+    :return: stored standings of the league season ordered by gender, category and position
+    """
+    standings = Standing.objects.filter(league=league, season=season)
+    if gender:
+        standings = standings.filter(gender=gender)
+    if category:
+        standings = standings.filter(category=category)
+    return standings.select_related("club").order_by("gender", "category", "position")
@@ -1,6 +1,7 @@
 from django.contrib import admin
 
 from apps.participants.models import Participant, Penalty
+from apps.utils.admin import EstimatedCountPaginator
 
 
 class PenaltyInline(admin.TabularInline):
@@ -10,7 +11,16 @@ class PenaltyInline(admin.TabularInline):
 @admin.register(Participant)
 class ParticipantAdmin(admin.ModelAdmin):
     inlines = [PenaltyInline]
-    list_filter = ('club', 'race__league')
+    list_display = ("__str__", "race")
+    list_filter = ("race__league", "gender", "category")
+    list_select_related = ("club", "race", "race__trophy", "race__flag", "race__league")
+    search_fields = ("club__name", "club_names")
+    autocomplete_fields = ("club", "race")
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
 
-admin.site.register(Penalty, admin.ModelAdmin)
+@admin.register(Penalty)
+class PenaltyAdmin(admin.ModelAdmin):
+    list_select_related = ("participant", "participant__club")
+    autocomplete_fields = ("participant",)
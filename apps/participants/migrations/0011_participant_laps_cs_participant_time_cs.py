@@ -0,0 +1,42 @@
+# Generated by Django 6.0.7 on 2026-10-19 12:05
+
+import django.contrib.postgres.fields
+from django.db import migrations, models
+
+BACKFILL_SQL = """
+    UPDATE participant
+    SET
+        laps_cs = ARRAY(
+            SELECT round(extract(EPOCH FROM lap) * 100)::INTEGER
+            FROM unnest(laps) WITH ORDINALITY AS t(lap, idx)
+            ORDER BY idx
+        ),
+        time_cs = round(extract(EPOCH FROM laps[cardinality(laps)]) * 100)::INTEGER
+    WHERE laps <> '{}';
+"""
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("participants", "0010_participant_metadata"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="participant",
+            name="laps_cs",
+            field=django.contrib.postgres.fields.ArrayField(
+                base_field=models.PositiveIntegerField(),
+                blank=True,
+                default=list,
+                editable=False,
+                size=None,
+            ),
+        ),
+        migrations.AddField(
+            model_name="participant",
+            name="time_cs",
+            field=models.PositiveIntegerField(blank=True, db_index=True, default=None, editable=False, null=True),
+        ),
+        migrations.RunSQL(BACKFILL_SQL, reverse_sql=migrations.RunSQL.noop),
+    ]
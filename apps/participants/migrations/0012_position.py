@@ -0,0 +1,103 @@
+# Generated by Django 6.0.7 on 2026-10-19 14:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+BACKFILL_SQL = """
+    WITH ranked AS (
+        SELECT
+            p.id,
+            RANK() OVER classification AS position,
+            CASE
+                WHEN r.type = 'TIME_TRIAL' THEN NULL
+                ELSE RANK() OVER (PARTITION BY p.race_id, p.gender, p.category, p.series ORDER BY p.time_cs)
+            END AS series_position,
+            p.time_cs - MIN(p.time_cs) OVER (PARTITION BY p.race_id, p.gender, p.category) AS gap_cs,
+            p.time_cs - LAG(p.time_cs) OVER classification AS previous_gap_cs
+        FROM participant p JOIN race r ON r.id = p.race_id
+        WHERE
+            p.time_cs > 0
+            AND NOT p.absent
+            AND NOT p.retired
+            AND NOT p.guest
+            AND NOT EXISTS(SELECT 1 FROM penalty WHERE participant_id = p.id AND disqualification)
+        WINDOW classification AS (PARTITION BY p.race_id, p.gender, p.category ORDER BY p.time_cs)
+    )
+    INSERT INTO participant_position (
+        participant_id, race_id, club_id, gender, category, position, series_position, gap_cs, previous_gap_cs
+    )
+    SELECT p.id, p.race_id, p.club_id, p.gender, p.category, r.position, r.series_position, r.gap_cs, r.previous_gap_cs
+    FROM participant p LEFT JOIN ranked r ON r.id = p.id;
+"""
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("entities", "0010_entity_town"),
+        ("participants", "0011_participant_laps_cs_participant_time_cs"),
+        ("races", "0023_scrapedpayload"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Position",
+            fields=[
+                (
+                    "participant",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="position",
+                        serialize=False,
+                        to="participants.participant",
+                    ),
+                ),
+                (
+                    "gender",
+                    models.CharField(
+                        choices=[("MALE", "Male"), ("FEMALE", "Female"), ("MIX", "Mixto")],
+                        max_length=10,
+                    ),
+                ),
+                (
+                    "category",
+                    models.CharField(
+                        choices=[("ABSOLUT", "Absoluto"), ("VETERAN", "Veterano"), ("SCHOOL", "Escuela")],
+                        max_length=10,
+                    ),
+                ),
+                ("position", models.PositiveSmallIntegerField(blank=True, default=None, null=True)),
+                ("series_position", models.PositiveSmallIntegerField(blank=True, default=None, null=True)),
+                ("gap_cs", models.PositiveIntegerField(blank=True, default=None, null=True)),
+                ("previous_gap_cs", models.PositiveIntegerField(blank=True, default=None, null=True)),
+                (
+                    "club",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="positions",
+                        related_query_name="position",
+                        to="entities.entity",
+                    ),
+                ),
+                (
+                    "race",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="positions",
+                        related_query_name="position",
+                        to="races.race",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Posición",
+                "verbose_name_plural": "Posiciones",
+                "db_table": "participant_position",
+                "indexes": [
+                    models.Index(fields=["race", "gender", "category", "position"], name="position_race_idx"),
+                    models.Index(fields=["club", "position"], name="position_club_idx"),
+                ],
+            },
+        ),
+        migrations.RunSQL(BACKFILL_SQL, reverse_sql=migrations.RunSQL.noop),
+    ]
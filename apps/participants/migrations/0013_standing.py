@@ -0,0 +1,116 @@
+# Generated by Django 6.0.7 on 2026-10-19 15:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+BACKFILL_SQL = """
+    WITH scored AS (
+        SELECT
+            r.league_id,
+            EXTRACT(YEAR FROM r.date)::INTEGER AS season,
+            pos.race_id,
+            p.club_id,
+            p.branch,
+            pos.gender,
+            pos.category,
+            pos.position,
+            COALESCE(
+                COUNT(pos.position) OVER (PARTITION BY pos.race_id, pos.gender, pos.category) - pos.position + 1, 0
+            ) AS points
+        FROM participant_position pos
+            JOIN participant p ON p.id = pos.participant_id
+            JOIN race r ON r.id = pos.race_id
+        WHERE
+            r.league_id IS NOT NULL
+            AND NOT r.cancelled
+            AND r.same_as_id IS NULL
+            AND NOT p.guest
+            AND NOT p.absent
+    ), totals AS (
+        SELECT
+            league_id, season, club_id, branch, gender, category,
+            SUM(points) AS points, COUNT(DISTINCT race_id) AS races, MIN(position) AS best_position
+        FROM scored
+        GROUP BY league_id, season, club_id, branch, gender, category
+    )
+    INSERT INTO league_standing (
+        league_id, season, club_id, branch, gender, category, points, races, best_position, position
+    )
+    SELECT
+        league_id, season, club_id, branch, gender, category, points, races, best_position,
+        RANK() OVER (PARTITION BY league_id, season, gender, category ORDER BY points DESC, best_position NULLS LAST)
+    FROM totals;
+"""
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("entities", "0010_entity_town"),
+        ("participants", "0012_position"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Standing",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("season", models.PositiveSmallIntegerField()),
+                ("branch", models.CharField(blank=True, default=None, max_length=1, null=True)),
+                (
+                    "gender",
+                    models.CharField(
+                        choices=[("MALE", "Male"), ("FEMALE", "Female"), ("MIX", "Mixto")],
+                        max_length=10,
+                    ),
+                ),
+                (
+                    "category",
+                    models.CharField(
+                        choices=[("ABSOLUT", "Absoluto"), ("VETERAN", "Veterano"), ("SCHOOL", "Escuela")],
+                        max_length=10,
+                    ),
+                ),
+                ("points", models.PositiveIntegerField(default=0)),
+                ("races", models.PositiveSmallIntegerField(default=0)),
+                ("best_position", models.PositiveSmallIntegerField(blank=True, default=None, null=True)),
+                ("position", models.PositiveSmallIntegerField()),
+                (
+                    "club",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="standings",
+                        related_query_name="standing",
+                        to="entities.entity",
+                    ),
+                ),
+                (
+                    "league",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="standings",
+                        related_query_name="standing",
+                        to="entities.league",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Clasificación de liga",
+                "verbose_name_plural": "Clasificaciones de liga",
+                "db_table": "league_standing",
+                "ordering": ["league", "season", "gender", "category", "position"],
+                "indexes": [
+                    models.Index(
+                        fields=["league", "season", "gender", "category", "position"], name="standing_league_idx"
+                    )
+                ],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("league", "season", "club", "branch", "gender", "category"),
+                        name="unique_league_standing",
+                        nulls_distinct=False,
+                    )
+                ],
+            },
+        ),
+        migrations.RunSQL(BACKFILL_SQL, reverse_sql=migrations.RunSQL.noop),
+    ]
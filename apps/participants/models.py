@@ -1,10 +1,20 @@
+import threading
+from collections.abc import Generator, Iterable
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from datetime import time
+from functools import partial
 from typing import TYPE_CHECKING, Any, Self
 
+from django.contrib.contenttypes.fields import GenericRelation
 from django.contrib.postgres.fields import ArrayField
-from django.db import IntegrityError, models
+from django.db import IntegrityError, connection, models, transaction
 from django.db.models import JSONField
 
+from apps.races.models import Race, ScrapedPayload
 from apps.schemas import PARTICIPANT_METADATA_SCHEMA, default_metadata
+from apps.utils import cache
 from apps.utils.choices import (
     CATEGORY_ABSOLUT,
     ENTITY_CLUB,
@@ -12,10 +22,134 @@ from apps.utils.choices import (
     GENDER_MALE,
     PARTICIPANT_CATEGORIES_CHOICES,
     PENALTY_CHOICES,
+    RACE_TIME_TRIAL,
 )
+from apps.utils.laps import time_to_centiseconds
+from apps.utils.locks import advisory_lock
 from djutils.validators import JSONSchemaValidator
 from rscraping.data.models import Datasource
 
+# also clears the races participants were moved from, returning them so they are ranked again without them
+_POSITIONS_DELETE_SQL = """
+    DELETE FROM participant_position
+    WHERE race_id = ANY(%(races)s) OR race_id IN (
+        SELECT race_id FROM participant_position
+        WHERE participant_id IN (SELECT id FROM participant WHERE race_id = ANY(%(races)s))
+    )
+    RETURNING race_id
+"""
+_POSITIONS_SQL = """
+    WITH ranked AS (
+        SELECT
+            p.id,
+            RANK() OVER classification AS position,
+            CASE
+                WHEN r.type = %(time_trial)s THEN NULL
+                ELSE RANK() OVER (PARTITION BY p.race_id, p.gender, p.category, p.series ORDER BY p.time_cs)
+            END AS series_position,
+            p.time_cs - MIN(p.time_cs) OVER (PARTITION BY p.race_id, p.gender, p.category) AS gap_cs,
+            p.time_cs - LAG(p.time_cs) OVER classification AS previous_gap_cs
+        FROM participant p JOIN race r ON r.id = p.race_id
+        WHERE
+            p.race_id = ANY(%(races)s)
+            AND p.time_cs > 0
+            AND NOT p.absent
+            AND NOT p.retired
+            AND NOT p.guest
+            AND NOT EXISTS(SELECT 1 FROM penalty WHERE participant_id = p.id AND disqualification)
+        WINDOW classification AS (PARTITION BY p.race_id, p.gender, p.category ORDER BY p.time_cs)
+    )
+    INSERT INTO participant_position (
+        participant_id, race_id, club_id, gender, category, position, series_position, gap_cs, previous_gap_cs
+    )
+    SELECT p.id, p.race_id, p.club_id, p.gender, p.category, r.position, r.series_position, r.gap_cs, r.previous_gap_cs
+    FROM participant p LEFT JOIN ranked r ON r.id = p.id
+    WHERE p.race_id = ANY(%(races)s)
+"""
+
+
+# every classified participant scores one point per participant classified behind it plus one, so the last one scores 1
+_STANDINGS_DELETE_SQL = "DELETE FROM league_standing WHERE league_id = %(league)s AND season = %(season)s"
+_STANDINGS_SQL = """
+    WITH scored AS (
+        SELECT
+            pos.race_id,
+            p.club_id,
+            p.branch,
+            pos.gender,
+            pos.category,
+            pos.position,
+            COALESCE(
+                COUNT(pos.position) OVER (PARTITION BY pos.race_id, pos.gender, pos.category) - pos.position + 1, 0
+            ) AS points
+        FROM participant_position pos
+            JOIN participant p ON p.id = pos.participant_id
+            JOIN race r ON r.id = pos.race_id
+        WHERE
+            r.league_id = %(league)s
+            AND r.date >= make_date(%(season)s, 1, 1) AND r.date < make_date(%(season)s + 1, 1, 1)
+            AND NOT r.cancelled
+            AND r.same_as_id IS NULL
+            AND NOT p.guest
+            AND NOT p.absent
+    ), totals AS (
+        SELECT
+            club_id, branch, gender, category,
+            SUM(points) AS points, COUNT(DISTINCT race_id) AS races, MIN(position) AS best_position
+        FROM scored
+        GROUP BY club_id, branch, gender, category
+    )
+    INSERT INTO league_standing (
+        league_id, season, club_id, branch, gender, category, points, races, best_position, position
+    )
+    SELECT
+        %(league)s, %(season)s, club_id, branch, gender, category, points, races, best_position,
+        RANK() OVER (PARTITION BY gender, category ORDER BY points DESC, best_position NULLS LAST)
+    FROM totals
+"""
+
+
+class ParticipantQuerySet(models.QuerySet["Participant"]):
+    """
+    Bulk writes skipping 'save' keep the scraped payloads and the derived tables in sync through the same hooks.
+    """
+
+    def update(self, **kwargs) -> int:
+        if "laps" in kwargs:
+            assert isinstance(kwargs["laps"], list), "laps can only be updated to a list, its centiseconds are derived"
+            kwargs["laps_cs"], kwargs["time_cs"] = _centiseconds(kwargs["laps"])
+        if not _affects_rankings(kwargs):
+            return super().update(**kwargs)
+        participants = list(self.values_list("pk", flat=True))
+        races = set(self.values_list("race_id", flat=True))
+        rows = super().update(**kwargs)
+        if "race" in kwargs or "race_id" in kwargs:
+            # the races participants were moved to
+            races |= _races_of(participants)
+        refresh_derived(races)
+        return rows
+
+    def bulk_update(self, objs: Iterable["Participant"], fields: Iterable[str], batch_size: int | None = None) -> int:
+        objs, fields = list(objs), list(fields)
+        if "laps" in fields:
+            for participant in objs:
+                participant.laps_cs, participant.time_cs = _centiseconds(participant.laps)
+            fields = [*fields, "laps_cs", "time_cs"]
+        if "metadata" in fields:
+            ScrapedPayload.archive(objs)
+        rows = super().bulk_update(objs, fields, batch_size=batch_size)
+        if _affects_rankings(fields):
+            refresh_derived({p.race_id for p in objs})  # pyright: ignore
+        return rows
+
+    def bulk_create(self, objs: Iterable["Participant"], *args, **kwargs) -> list["Participant"]:
+        objs = list(objs)
+        for participant in objs:
+            participant.laps_cs, participant.time_cs = _centiseconds(participant.laps)
+        created = super().bulk_create(objs, *args, **kwargs)
+        refresh_derived({p.race_id for p in created})  # pyright: ignore
+        return created
+
 
 class Participant(models.Model):
     club_names = ArrayField(blank=True, default=list, base_field=models.CharField(max_length=150))
@@ -38,6 +172,9 @@ class Participant(models.Model):
 
     distance = models.PositiveIntegerField(null=True, blank=True, default=None)
     laps = ArrayField(blank=True, default=list, base_field=models.TimeField(null=False))
+    # integer centiseconds mirrors of 'laps' and its last lap, maintained on save and by the queryset bulk writes
+    laps_cs = ArrayField(blank=True, default=list, editable=False, base_field=models.PositiveIntegerField(null=False))
+    time_cs = models.PositiveIntegerField(null=True, blank=True, default=None, editable=False, db_index=True)
     lane = models.PositiveSmallIntegerField(null=True, blank=True, default=None)
     series = models.PositiveSmallIntegerField(null=True, blank=True, default=None)
     handicap = models.TimeField(null=True, blank=True, default=None)
@@ -57,6 +194,9 @@ class Participant(models.Model):
         default=default_metadata,
         validators=[JSONSchemaValidator(schema=PARTICIPANT_METADATA_SCHEMA)],
     )
+    payloads = GenericRelation(ScrapedPayload, related_query_name="participant")
+
+    objects = ParticipantQuerySet.as_manager()
 
     if TYPE_CHECKING:
         # Annotate reverse ForeignKey relationships in TYPE_CHECKING block
@@ -87,13 +227,33 @@ class Participant(models.Model):
         if self.pk is None:
             self.validate_unique()
 
+        self.laps_cs, self.time_cs = _centiseconds(self.laps)
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and "laps" in update_fields:
+            kwargs["update_fields"] = {*update_fields, "laps_cs", "time_cs"}
+
+        payloads = ScrapedPayload.extract(self.metadata)
         super().save(*args, **kwargs)
+        ScrapedPayload.store(self, payloads)
+        if _affects_rankings(kwargs.get("update_fields")):
+            refresh_derived([self.race_id])  # pyright: ignore
+
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        refresh_derived([self.race_id])  # pyright: ignore
+        return result
 
     def get_datasources(self, datasource: Datasource) -> list[dict[str, Any]]:
         datasource_str = datasource.value.lower()
         datasources = self.metadata["datasource"]
         return [d for d in datasources if d["datasource_name"] == datasource_str]
 
+    def get_scraped_data(self, datasource: Datasource) -> dict[str, Any] | None:
+        """
+        Lazily load the raw payload scraped from the datasource, archived out of the metadata on save.
+        """
+        return ScrapedPayload.load(self, datasource.value)
+
     def add_metadata(self, new: dict[str, Any]) -> Self:
         datasource = Datasource(new["datasource_name"])
         assert self.get_datasources(datasource) == [], "datasource already exists"
@@ -108,6 +268,36 @@ class Participant(models.Model):
         ordering = ["race", "club"]
 
 
+class PenaltyQuerySet(models.QuerySet["Penalty"]):
+    """
+    Bulk writes skipping 'save' keep the derived tables in sync through the same hooks.
+    """
+
+    def update(self, **kwargs) -> int:
+        if not _affects_rankings(kwargs):
+            return super().update(**kwargs)
+        penalties = list(self.values_list("pk", flat=True))
+        races = _races_of(self.values_list("participant_id", flat=True))
+        rows = super().update(**kwargs)
+        if "participant" in kwargs or "participant_id" in kwargs:
+            # the races penalties were moved to
+            races |= _races_of(Penalty.objects.filter(pk__in=penalties).values_list("participant_id", flat=True))
+        refresh_derived(races)
+        return rows
+
+    def bulk_update(self, objs: Iterable["Penalty"], fields: Iterable[str], batch_size: int | None = None) -> int:
+        objs, fields = list(objs), list(fields)
+        rows = super().bulk_update(objs, fields, batch_size=batch_size)
+        if _affects_rankings(fields):
+            refresh_derived(_races_of(p.participant_id for p in objs))  # pyright: ignore
+        return rows
+
+    def bulk_create(self, objs: Iterable["Penalty"], *args, **kwargs) -> list["Penalty"]:
+        created = super().bulk_create(objs, *args, **kwargs)
+        refresh_derived(_races_of(p.participant_id for p in created))  # pyright: ignore
+        return created
+
+
 class Penalty(models.Model):
     penalty = models.PositiveIntegerField(blank=True, default=0)
     disqualification = models.BooleanField(default=False)
@@ -121,13 +311,277 @@ class Penalty(models.Model):
     )
     notes = ArrayField(blank=True, default=list, base_field=models.TextField())
 
+    objects = PenaltyQuerySet.as_manager()
+
     def __str__(self):
         if self.disqualification:
             return f"Disqualified: {self.participant}"
         return f"Penalty ({self.reason}: {self.penalty}) -> {self.participant}"
 
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        if _affects_rankings(kwargs.get("update_fields")):
+            refresh_derived([self.participant.race_id])  # pyright: ignore
+
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        refresh_derived([self.participant.race_id])  # pyright: ignore
+        return result
+
     class Meta:
         db_table = "penalty"
         verbose_name = "Penalización"
         verbose_name_plural = "Penalizaciones"
         ordering = ["participant"]
+
+
+class Position(models.Model):
+    """
+    Finishing position of a participant in its race classification (gender and category), maintained from the
+    participants and penalties of the race.
+
+    Absent, retired, guest and disqualified participants are kept without position. Series positions are not computed
+    for time trials.
+    """
+
+    participant = models.OneToOneField(
+        primary_key=True,
+        to=Participant,
+        on_delete=models.CASCADE,
+        related_name="position",
+    )
+    race = models.ForeignKey(
+        to="races.Race",
+        on_delete=models.CASCADE,
+        related_name="positions",
+        related_query_name="position",
+    )
+    club = models.ForeignKey(
+        to="entities.Entity",
+        on_delete=models.CASCADE,
+        related_name="positions",
+        related_query_name="position",
+    )
+    gender = models.CharField(max_length=10, choices=GENDER_CHOICES)
+    category = models.CharField(max_length=10, choices=PARTICIPANT_CATEGORIES_CHOICES)
+
+    position = models.PositiveSmallIntegerField(null=True, blank=True, default=None)
+    series_position = models.PositiveSmallIntegerField(null=True, blank=True, default=None)
+    # centiseconds to the winner of the classification and to the previous participant
+    gap_cs = models.PositiveIntegerField(null=True, blank=True, default=None)
+    previous_gap_cs = models.PositiveIntegerField(null=True, blank=True, default=None)
+
+    def __str__(self):
+        return f"{self.position or '-'} :: {self.participant_id}"  # pyright: ignore
+
+    @classmethod
+    def refresh(cls, race_ids: Iterable[int]) -> set[int]:
+        """
+        Recompute the positions of every participant of the given races.
+
+        :return: the refreshed races, including the ones participants were moved from
+        """
+        races = set(race_ids)
+        with connection.cursor() as cursor:
+            cursor.execute(_POSITIONS_DELETE_SQL, {"races": list(races)})
+            races |= {row[0] for row in cursor.fetchall()}
+            cursor.execute(_POSITIONS_SQL, {"races": list(races), "time_trial": RACE_TIME_TRIAL})
+        return races
+
+    class Meta:
+        db_table = "participant_position"
+        verbose_name = "Posición"
+        verbose_name_plural = "Posiciones"
+        indexes = [
+            models.Index(fields=["race", "gender", "category", "position"], name="position_race_idx"),
+            models.Index(fields=["club", "position"], name="position_club_idx"),
+        ]
+
+
+class Standing(models.Model):
+    """
+    Points of a club (or one of its branch teams) in a league season, maintained from the positions of the league races
+    by `refresh` so current standings are a single indexed read.
+
+    Cancelled and duplicated ('same_as') races don't score, guests and absent participants are left out and
+    disqualified or retired participants score 0 points.
+    """
+
+    league = models.ForeignKey(
+        to="entities.League",
+        on_delete=models.CASCADE,
+        related_name="standings",
+        related_query_name="standing",
+    )
+    season = models.PositiveSmallIntegerField()
+    club = models.ForeignKey(
+        to="entities.Entity",
+        on_delete=models.CASCADE,
+        related_name="standings",
+        related_query_name="standing",
+    )
+    branch = models.CharField(null=True, blank=True, default=None, max_length=1)
+    gender = models.CharField(max_length=10, choices=GENDER_CHOICES)
+    category = models.CharField(max_length=10, choices=PARTICIPANT_CATEGORIES_CHOICES)
+
+    points = models.PositiveIntegerField(default=0)
+    races = models.PositiveSmallIntegerField(default=0)
+    best_position = models.PositiveSmallIntegerField(null=True, blank=True, default=None)
+    position = models.PositiveSmallIntegerField()
+
+    def __str__(self):
+        branch = f" {self.branch}" if self.branch else ""
+        return f"{self.season} :: {self.position} - {self.club_id}{branch} ({self.points})"  # pyright: ignore
+
+    @classmethod
+    def refresh(cls, league_id: int, season: int):
+        """
+        Recompute the standings of a league season.
+        """
+        params = {"league": league_id, "season": season}
+        with advisory_lock(cls._meta.db_table, league_id, season):
+            with connection.cursor() as cursor:
+                cursor.execute(_STANDINGS_DELETE_SQL, params)
+                cursor.execute(_STANDINGS_SQL, params)
+
+    @classmethod
+    def refresh_for_races(cls, race_ids: Iterable[int]):
+        """
+        Recompute the standings of the league seasons the given races belong to.
+        """
+        for league_id, season in sorted(cls.get_seasons(race_ids)):
+            cls.refresh(league_id, season)
+
+    @staticmethod
+    def get_seasons(race_ids: Iterable[int]) -> set[tuple[int, int]]:
+        """
+        (league, season) of the given league races.
+        """
+        races = list(race_ids)
+        if not races:
+            return set()
+        return set(
+            Race.objects.filter(pk__in=races, league__isnull=False).values_list("league_id", "date__year").distinct()
+        )
+
+    class Meta:
+        db_table = "league_standing"
+        verbose_name = "Clasificación de liga"
+        verbose_name_plural = "Clasificaciones de liga"
+        ordering = ["league", "season", "gender", "category", "position"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["league", "season", "club", "branch", "gender", "category"],
+                name="unique_league_standing",
+                nulls_distinct=False,
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["league", "season", "gender", "category", "position"], name="standing_league_idx"),
+        ]
+
+
+# fields no position, standing or speed is computed from, saving only them refreshes nothing
+_UNRANKED_FIELDS = {"metadata", "notes"}
+
+
+def _affects_rankings(update_fields: Iterable[str] | None) -> bool:
+    return update_fields is None or not set(update_fields) <= _UNRANKED_FIELDS
+
+
+def _centiseconds(laps: Iterable[time]) -> tuple[list[int], int | None]:
+    """
+    Integer centiseconds mirrors of the laps and of the last one.
+    """
+    laps_cs = [time_to_centiseconds(lap) for lap in laps]
+    return laps_cs, laps_cs[-1] if laps_cs else None
+
+
+def _races_of(participant_ids: Iterable[int]) -> set[int]:
+    return set(Participant.objects.filter(pk__in=list(participant_ids)).values_list("race_id", flat=True))
+
+
+@dataclass
+class _Pending:
+    races: set[int] = field(default_factory=set)
+    # (league, season) standings to refresh besides the ones of the races, e.g. the season a race was moved from
+    seasons: set[tuple[int, int]] = field(default_factory=set)
+    # speed years to invalidate besides the ones of the races, e.g. the year a race was moved from
+    years: set[int] = field(default_factory=set)
+
+
+# refreshes waiting for the end of a `deferred_refresh` context or for the commit of the transaction
+_deferred: ContextVar[_Pending | None] = ContextVar("deferred_refresh", default=None)
+_committing = threading.local()
+
+
+@contextmanager
+def deferred_refresh() -> Generator[None]:
+    """
+    Refresh the positions and the league standings of the races saved inside the context once, when it exits, instead
+    of after each race, participant or penalty save.
+    """
+    if _deferred.get() is not None:
+        yield
+        return
+
+    pending = _Pending()
+    token = _deferred.set(pending)
+    try:
+        yield
+    finally:
+        _deferred.reset(token)
+        # inside a transaction this waits for the commit, so a rollback discards the refresh with the changes
+        refresh_derived(pending.races, pending.seasons, pending.years)
+
+
+def refresh_derived(race_ids: Iterable[int], seasons: Iterable[tuple[int, int]] = (), years: Iterable[int] = ()):
+    """
+    Refresh the positions, standings and cached speeds of the given races, and the standings of the given (league,
+    season) and the speeds of the given years, at the end of the `deferred_refresh` context, once the current
+    transaction commits or right away, deduplicating the ones saved meanwhile.
+    """
+    pending = _deferred.get()
+    if pending is None and connection.in_atomic_block:
+        pending = _transaction_pending()
+
+    if pending is None:
+        _refresh(_Pending(set(race_ids), set(seasons), set(years)))
+    else:
+        pending.races.update(race_ids)
+        pending.seasons.update(seasons)
+        pending.years.update(years)
+
+
+def _transaction_pending() -> _Pending:
+    """
+    Refreshes waiting for the commit of the current transaction. A rollback (of the transaction or of the savepoint
+    they were registered in) drops the commit callback, and with it the refreshes of the rolled back changes.
+    """
+    callback = getattr(_committing, "callback", None)
+    if callback is None or not any(func is callback for _, func, _ in connection.run_on_commit):
+        callback = _committing.callback = partial(_refresh_committed, _Pending())
+        transaction.on_commit(callback)
+    return callback.args[0]
+
+
+def _refresh_committed(pending: _Pending):
+    _committing.callback = None
+    _refresh(pending)
+
+
+def _refresh(pending: _Pending):
+    # races participants were moved from are refreshed too, their league season may change
+    races = Position.refresh(pending.races) if pending.races else set()
+    # years and seasons of the races in a single query, so saves don't need to load their race
+    rows = Race.objects.filter(pk__in=races).values_list("league_id", "date__year") if races else []
+    seasons, years = set(pending.seasons), set(pending.years)
+    for league_id, year in rows:
+        years.add(year)
+        if league_id:
+            seasons.add((league_id, year))
+
+    for league_id, season in sorted(seasons):
+        Standing.refresh(league_id, season)
+    for year in sorted(years):
+        cache.bump(cache.SPEEDS, year)
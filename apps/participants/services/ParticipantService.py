@@ -1,18 +1,25 @@
 import logging
+import statistics
+from collections import defaultdict
+from collections.abc import Iterable
 
-from django.db import connection
-from django.db.models import QuerySet
+from django.db import connections
+from django.db.models import OuterRef, Q, QuerySet, Subquery
 
 from apps.entities.models import Entity, League
 from apps.entities.services import EntityService
-from apps.participants.models import Participant, Penalty
+from apps.participants.models import Participant, Penalty, Position
 from apps.races.models import Flag, Race
+from apps.utils import cache, db
+from apps.utils.laps import parse_lap
 from rscraping.data.checks import is_branch_club
 from rscraping.data.constants import CATEGORY_ALL, GENDER_ALL
 from rscraping.data.models import Participant as RSParticipant
 
 logger = logging.getLogger(__name__)
 
+BRANCH_LETTERS = ["B", "C", "D"]
+
 
 def get_by_race(race: Race) -> QuerySet[Participant]:
     return Participant.objects.filter(race=race)
@@ -40,6 +47,51 @@ def get_by_race_and_filter_by(
         return None
 
 
+def get_race_snapshot(race: Race) -> dict[tuple[int, str, str, str | None], list[Participant]]:
+    """
+    Load all the participants of a race in a single query, with their penalties prefetched.
+
+    Returns: dict: The participants indexed by (club_id, gender, category, branch).
+    """
+    snapshot: dict[tuple[int, str, str, str | None], list[Participant]] = defaultdict(list)
+    if not race.pk:
+        return snapshot
+
+    for participant in get_by_race(race).select_related("club").prefetch_related("penalties"):
+        add_to_snapshot(snapshot, participant)
+    return snapshot
+
+
+def get_from_snapshot_and_filter_by(
+    snapshot: dict[tuple[int, str, str, str | None], list[Participant]],
+    race: Race,
+    club: Entity,
+    gender: str,
+    category: str,
+    branch: str | None = None,
+    raw_club_name: str | None = None,
+) -> Participant | None:
+    """
+    In-memory equivalent of `get_by_race_and_filter_by` using a snapshot built with `get_race_snapshot`.
+    """
+    matches = snapshot.get((club.pk, gender, category, branch), [])
+    if len(matches) > 1 and raw_club_name and race.league is None:
+        matches = [p for p in matches if p.branch == _get_branch_filter(raw_club_name, p.branch)]
+
+    if len(matches) > 1:
+        raise Participant.MultipleObjectsReturned(f"multiple participants found for {club=} in {race=}")
+    return matches[0] if matches else None
+
+
+def add_to_snapshot(
+    snapshot: dict[tuple[int, str, str, str | None], list[Participant]],
+    participant: Participant,
+) -> None:
+    key = (participant.club_id, participant.gender, participant.category, participant.branch)
+    if participant not in snapshot[key]:
+        snapshot[key].append(participant)
+
+
 def get_penalties(participant: Participant) -> QuerySet:
     return Penalty.objects.filter(participant=participant)
 
@@ -51,15 +103,94 @@ def is_same_participant(p1: Participant, p2: RSParticipant, club: Entity | None
     p2_club = club if club else EntityService.get_closest_club_by_name(p2.participant)
     assert p2_club, f"club {p2.participant} not found"
 
-    if p1.branch == "B":
-        return p1.club == p2_club and is_branch_club(p2.participant, letter="B")
-    if p1.branch == "C":
-        return p1.club == p2_club and is_branch_club(p2.participant, letter="C")
-    if p1.branch == "D":
-        return p1.club == p2_club and is_branch_club(p2.participant, letter="D")
+    if p1.branch in BRANCH_LETTERS:
+        return p1.club == p2_club and is_branch_club(p2.participant, letter=p1.branch)
     return p1.club == p2_club
 
 
+def get_final_time_index(participants: Iterable[Participant]) -> dict[tuple[int, str], list[Participant]]:
+    """
+    Index the given participants by their final time so scraped participants can be matched in constant time.
+
+    Returns: dict: The participants with a final time indexed by (time_cs, category).
+    """
+    index: dict[tuple[int, str], list[Participant]] = defaultdict(list)
+    for participant in participants:
+        if participant.time_cs is not None:
+            index[(participant.time_cs, participant.category)].append(participant)
+    return index
+
+
+def find_by_final_time(
+    index: dict[tuple[int, str], list[Participant]],
+    participant: RSParticipant,
+    categories: Iterable[str] | None = None,
+    club: Entity | None = None,
+) -> Participant | None:
+    """
+    Find the participant of an index built with `get_final_time_index` with the same final time as the scraped one.
+
+    Categories are tried in the given order (only the scraped participant one by default). When a club is given the
+    candidates are also checked with `is_same_participant`.
+
+    Raises: Participant.MultipleObjectsReturned: If more than one participant collides in the first matching category.
+    """
+    if len(participant.laps) < 1:
+        return None
+
+    time_cs = parse_lap(participant.laps[-1])
+    for category in categories or [participant.category]:
+        matches = index.get((time_cs, category), [])
+        if club:
+            matches = [p for p in matches if is_same_participant(p, participant, club)]
+
+        if len(matches) > 1:
+            raise Participant.MultipleObjectsReturned(
+                f"multiple participants found for {participant.participant} with {participant.laps[-1]=}: {matches}"
+            )
+        if matches:
+            return matches[0]
+    return None
+
+
+def get_classification(race: Race, gender: str | None = None, category: str | None = None) -> QuerySet[Position]:
+    """
+    Classified participants of a race ordered by gender, category and position.
+    """
+    positions = Position.objects.filter(race=race, position__isnull=False)
+    if gender:
+        positions = positions.filter(gender=gender)
+    if category:
+        positions = positions.filter(category=category)
+    return positions.select_related("participant", "club").order_by("gender", "category", "position")
+
+
+def get_head_to_head(club: Entity, rival: Entity, lineage: bool = False) -> QuerySet[Position]:
+    """
+    Positions of 'club' in the classifications where 'rival' was also classified, annotated with 'rival_position' and
+    'rival_gap_cs', ordered by date.
+
+    With 'lineage' both clubs are expanded to their fused or subsidiary entities and partnership components.
+    """
+    rival_positions = Position.objects.filter(
+        _club_lookup(rival, lineage),
+        race=OuterRef("race"),
+        gender=OuterRef("gender"),
+        category=OuterRef("category"),
+        position__isnull=False,
+    ).order_by("position")
+    return (
+        Position.objects.filter(_club_lookup(club, lineage), position__isnull=False)
+        .annotate(
+            rival_position=Subquery(rival_positions.values("position")[:1]),
+            rival_gap_cs=Subquery(rival_positions.values("gap_cs")[:1]),
+        )
+        .filter(rival_position__isnull=False)
+        .select_related("race")
+        .order_by("race__date")
+    )
+
+
 def get_year_speeds_filtered_by(
     club: Entity | None,
     league: League | None,
@@ -70,7 +201,54 @@ def get_year_speeds_filtered_by(
     branch_teams: bool,
     only_league_races: bool,
     normalize: bool,
+    lineage: bool = False,
 ) -> dict[int, list[float]]:
+    """
+    Speeds of every year matching the filters.
+
+    Closed seasons and the open ones are cached apart, so a change in the current season only recomputes its own speeds.
+    Any closed season can start matching the filters (e.g. a backfill of an older one), so all of them are checked.
+    Outliers are dropped after merging both, as they depend on the speeds of every year.
+    """
+    key = _speeds_cache_key(
+        "year", club, league, flag, gender, category, day, branch_teams, only_league_races, False, lineage
+    )
+    season = cache.current_season()
+    speeds = cache.get_or_compute(
+        cache.SPEEDS,
+        f"{key}:closed:{season}",
+        lambda: _get_year_speeds_filtered_by(
+            club, league, flag, gender, category, day, branch_teams, only_league_races, lineage, until=season
+        ),
+        years=[cache.CLOSED_YEARS],
+    ) | cache.get_or_compute(
+        cache.SPEEDS,
+        f"{key}:open:{season}",
+        lambda: _get_year_speeds_filtered_by(
+            club, league, flag, gender, category, day, branch_teams, only_league_races, lineage, since=season
+        ),
+        years=[cache.OPEN_YEARS],
+    )
+    return _without_outliers(speeds) if normalize else speeds
+
+
+@db.read_only
+def _get_year_speeds_filtered_by(
+    club: Entity | None,
+    league: League | None,
+    flag: Flag | None,
+    gender: str,
+    category: str,
+    day: int,
+    branch_teams: bool,
+    only_league_races: bool,
+    lineage: bool = False,
+    since: int | None = None,
+    until: int | None = None,
+) -> dict[int, list[float]]:
+    """
+    Speeds of every year in [since, until) matching the filters.
+    """
     subquery_where_clause = _get_speed_filters(
         club=club,
         league=league,
@@ -80,20 +258,13 @@ def get_year_speeds_filtered_by(
         day=day,
         branch_teams=branch_teams,
         only_league_races=only_league_races,
+        lineage=lineage,
     )
-    speed_expression = "(p.distance / (extract(EPOCH FROM p.laps[cardinality(p.laps)]))) * 3.6"
-    where_clause = ""
-
-    if normalize:
-        where_clause = """
-            WHERE speed BETWEEN (
-                SELECT AVG(speed) - (2 * STDDEV_POP(speed))
-                FROM speeds_query
-            ) AND (
-                SELECT AVG(speed) + (2 * STDDEV_POP(speed))
-                FROM speeds_query
-            )
-        """
+    if since is not None:
+        subquery_where_clause += f" AND extract(YEAR from r.date) >= {since}"
+    if until is not None:
+        subquery_where_clause += f" AND extract(YEAR from r.date) < {until}"
+    speed_expression = "(p.distance / (p.time_cs / 100.0)) * 3.6"
 
     raw_query = f"""
         WITH speeds_query AS (
@@ -106,20 +277,33 @@ def get_year_speeds_filtered_by(
         )
         SELECT year, array_agg(speed) AS speeds
         FROM speeds_query
-        {where_clause}
         GROUP BY year
         ORDER BY year;
     """
 
     logger.debug(raw_query)
 
-    with connection.cursor() as cursor:
+    with connections[db.read_alias()].cursor() as cursor:
         cursor.execute(raw_query)
         speeds = cursor.fetchall()
 
     return {year: speed for year, speed in speeds}
 
 
+def _without_outliers(speeds: dict[int, list[float]]) -> dict[int, list[float]]:
+    """
+    Drop the speeds further than two standard deviations from the mean of every year.
+    """
+    values = [speed for year_speeds in speeds.values() for speed in year_speeds]
+    if not values:
+        return speeds
+
+    mean, deviation = statistics.fmean(values), statistics.pstdev(values)
+    low, high = mean - 2 * deviation, mean + 2 * deviation
+    filtered = {year: [s for s in year_speeds if low <= s <= high] for year, year_speeds in speeds.items()}
+    return {year: year_speeds for year, year_speeds in filtered.items() if year_speeds}
+
+
 def get_nth_speed_filtered_by(
     index: int,  # the index is one-based as postgresql does not support zero-based arrays
     club: Entity | None,
@@ -131,6 +315,47 @@ def get_nth_speed_filtered_by(
     branch_teams: bool,
     only_league_races: bool,
     normalize: bool,
+    lineage: bool = False,
+) -> list[float]:
+    """
+    Speed of the nth participant of every race of the year matching the filters, cached until the year changes.
+    """
+    key = _speeds_cache_key(
+        f"nth:{index}:{year}",
+        club,
+        league,
+        None,
+        gender,
+        category,
+        day,
+        branch_teams,
+        only_league_races,
+        normalize,
+        lineage,
+    )
+    return cache.get_or_compute(
+        cache.SPEEDS,
+        key,
+        lambda: _get_nth_speed_filtered_by(
+            index, club, league, gender, category, year, day, branch_teams, only_league_races, normalize, lineage
+        ),
+        years=[year],
+    )
+
+
+@db.read_only
+def _get_nth_speed_filtered_by(
+    index: int,
+    club: Entity | None,
+    league: League | None,
+    gender: str,
+    category: str,
+    year: int,
+    day: int,
+    branch_teams: bool,
+    only_league_races: bool,
+    normalize: bool,
+    lineage: bool = False,
 ) -> list[float]:
     subquery_where_clause = _get_speed_filters(
         club=club,
@@ -141,9 +366,10 @@ def get_nth_speed_filtered_by(
         day=day,
         branch_teams=branch_teams,
         only_league_races=only_league_races,
+        lineage=lineage,
     )
     subquery_where_clause += f" AND extract(YEAR from r.date) = {year}"
-    speed_expression = "(p.distance / (extract(EPOCH FROM p.laps[cardinality(p.laps)]))) * 3.6"
+    speed_expression = "(p.distance / (p.time_cs / 100.0)) * 3.6"
     where_clause = ""
 
     if normalize:
@@ -175,13 +401,41 @@ def get_nth_speed_filtered_by(
 
     logger.debug(raw_query)
 
-    with connection.cursor() as cursor:
+    with connections[db.read_alias()].cursor() as cursor:
         cursor.execute(raw_query)
         speeds = cursor.fetchall()
 
     return [speed for _, speed in speeds]
 
 
+def _speeds_cache_key(
+    prefix: str,
+    club: Entity | None,
+    league: League | None,
+    flag: Flag | None,
+    gender: str,
+    category: str,
+    day: int,
+    branch_teams: bool,
+    only_league_races: bool,
+    normalize: bool,
+    lineage: bool = False,
+) -> str:
+    values = [
+        club.pk if club else None,
+        league.pk if league else None,
+        flag.pk if flag else None,
+        gender.upper(),
+        category.upper(),
+        day,
+        int(branch_teams),
+        int(only_league_races),
+        int(normalize),
+        int(lineage),
+    ]
+    return f"{prefix}:{':'.join(str(v) for v in values)}"
+
+
 def _get_speed_filters(
     club: Entity | None,
     league: League | None,
@@ -191,6 +445,7 @@ def _get_speed_filters(
     day: int,
     branch_teams: bool,
     only_league_races: bool,
+    lineage: bool = False,
 ) -> str:
     gender_filter = (
         f"(p.gender = '{gender}' AND r.gender = '{gender}')"
@@ -213,16 +468,15 @@ def _get_speed_filters(
     filters = (
         "NOT r.cancelled",
         f"r.day = {day}",
-        "p.laps <> '{}'",
+        "p.time_cs > 0",  # Avoid empty laps and division by zero
         "NOT p.retired",
         "NOT p.guest",
         "NOT p.absent",
-        "(extract(EPOCH FROM p.laps[cardinality(p.laps)])) > 0",  # Avoid division by zero
         "NOT EXISTS(SELECT * FROM penalty WHERE participant_id = p.id AND disqualification)",  # Avoid disqualifications
         gender_filter,
         category_filter,
         branch_filter,
-        f"p.club_id = {club.pk}" if club else "",
+        _get_club_filter(club, lineage) if club else "",
         "r.league_id IS NOT NULL" if only_league_races else "",
         f"r.league_id = {league.pk}" if league else "",
         f"r.flag_id = {flag.pk}" if flag else "",
@@ -230,26 +484,69 @@ def _get_speed_filters(
     return " AND ".join([str(filter) for filter in filters if filter])
 
 
+def _get_club_filter(club: Entity, lineage: bool) -> str:
+    if lineage:
+        # the club, its fused or subsidiary entities and its partnership components (see EntityLineage)
+        return f"p.club_id IN (SELECT descendant_id FROM entity_lineage WHERE ancestor_id = {club.pk})"
+    return f"p.club_id = {club.pk}"
+
+
+def _club_lookup(club: Entity, lineage: bool) -> Q:
+    return Q(club__ancestor_link__ancestor=club) if lineage else Q(club=club)
+
+
 def _add_branch_filters(q: QuerySet, club_name: str | None) -> QuerySet:
     if not club_name:
         return q
 
+    branch = _get_branch_filter(club_name, default="")
+    if branch == "":
+        return q
+    return q.filter(branch__isnull=True) if branch is None else q.filter(branch=branch)
+
+
+def _get_branch_filter(club_name: str, default: str | None) -> str | None:
+    """
+    Returns: the branch a participant named 'club_name' should have, or 'default' when it can't be decided.
+    """
     if not is_branch_club(club_name) and not is_branch_club(club_name, letter="C"):
-        return q.filter(branch__isnull=True)
+        return None
 
     if is_branch_club(club_name):
-        return q.filter(branch="B")
+        return "B"
     if is_branch_club(club_name, letter="C"):
-        return q.filter(branch="C")
+        return "C"
     if is_branch_club(club_name, letter="D"):
-        return q.filter(branch="D")
+        return "D"
 
-    return q
+    return default
 
 
 def can_be_branch(participant: str, participant_names: list[str]) -> bool:
-    return (
-        (is_branch_club(participant) and any(p == participant.rstrip(" B") for p in participant_names))
-        or (is_branch_club(participant, "C") and any(p == participant.rstrip(" C") for p in participant_names))
-        or (is_branch_club(participant, "D") and any(p == participant.rstrip(" D") for p in participant_names))
-    )
+    return participant in get_possible_branches(participant_names)
+
+
+def get_branch(participant: str) -> str | None:
+    """
+    Returns: the branch letter of the given participant name or None if it's not a branch team.
+    """
+    # later letters take precedence as 'C' and 'D' teams can also look like 'B' ones
+    for letter in reversed(BRANCH_LETTERS):
+        if is_branch_club(participant, letter=letter):
+            return letter
+    return None
+
+
+def get_possible_branches(participant_names: list[str]) -> set[str]:
+    """
+    Computes in a single pass which participant names can be a branch team, this is, names with a branch letter
+    whose base club also participates in the race.
+
+    Returns: set[str]: The participant names that can be a branch team.
+    """
+    names = set(participant_names)
+    return {
+        name
+        for name in names
+        if any(is_branch_club(name, letter=letter) and name.rstrip(f" {letter}") in names for letter in BRANCH_LETTERS)
+    }
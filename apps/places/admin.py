@@ -2,5 +2,14 @@ from django.contrib import admin
 
 from apps.places.models import Place, Town
 
-admin.site.register(Town, admin.ModelAdmin)
-admin.site.register(Place, admin.ModelAdmin)
+
+@admin.register(Town)
+class TownAdmin(admin.ModelAdmin):
+    search_fields = ("name",)
+
+
+@admin.register(Place)
+class PlaceAdmin(admin.ModelAdmin):
+    list_select_related = ("town",)
+    search_fields = ("name", "town__name")
+    autocomplete_fields = ("town",)
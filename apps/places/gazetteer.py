@@ -0,0 +1,142 @@
+import re
+import time
+from collections import Counter, defaultdict
+from collections.abc import Iterable
+from dataclasses import dataclass
+
+from django.db import transaction
+
+from apps.utils import cache
+from pyutils.strings import remove_symbols, unaccent, whitespaces_clean
+
+# minimum trigram similarity (as pg_trgm computes it) for a fuzzy candidate to be accepted
+SIMILARITY_THRESHOLD = 0.5
+# seconds the shared revision is trusted before checking it again, so resolving a name needs no cache round trip
+SHARED_REVISION_TTL = 60
+
+_local_revision = 0
+_shared_revision: tuple[float, int] | None = None
+
+
+@dataclass(frozen=True, slots=True)
+class Entry:
+    place_id: int
+    name: str
+    town: str
+    province: str
+    known_names: tuple[str, ...] = ()
+
+
+def invalidate():
+    """
+    Mark every loaded gazetteer as stale, in this process and, through the cache, in the others.
+
+    Called by the saves and deletes of places and towns, bulk writes ('QuerySet.update', 'bulk_create') skip them so
+    they have to call it themselves.
+    """
+    _bump_local_revision()
+    # another thread could reload it before the commit, without the changes, so it is marked as stale again once they
+    # are visible
+    transaction.on_commit(_bump_local_revision)
+    cache.bump(cache.PLACES)
+
+
+def _bump_local_revision():
+    global _local_revision
+    _local_revision += 1
+
+
+def revision() -> tuple[int, int]:
+    """
+    Current revision of the places, a gazetteer built at another revision must be reloaded.
+
+    Changes made by this process are seen right away, the ones made by other processes once the shared revision is
+    checked again (every SHARED_REVISION_TTL seconds). The shared revision lives in the cache, so it requires a backend
+    shared by every process (see `apps.utils.cache`).
+    """
+    global _shared_revision
+    now = time.monotonic()
+    if _shared_revision is None or now - _shared_revision[0] >= SHARED_REVISION_TTL:
+        _shared_revision = (now, cache.generations(cache.PLACES, ())[None])
+    return _local_revision, _shared_revision[1]
+
+
+def normalize(name: str) -> str:
+    return whitespaces_clean(remove_symbols(unaccent(name).upper()))
+
+
+def trigrams(key: str) -> set[str]:
+    """
+    Trigrams of each word padded as pg_trgm does, two blanks before and one after.
+    """
+    return {f"  {word} "[i : i + 3] for word in key.split() for i in range(len(word) + 1)}
+
+
+class Gazetteer:
+    """
+    In-memory index of places by their normalized name, the name of their town and the known names of both.
+
+    Names are resolved with an exact lookup and, failing that, with the trigram candidates of the name. A province
+    given between parenthesis or after a comma ('BUEU (PONTEVEDRA)', 'BUEU, PONTEVEDRA') disambiguates between equally
+    good candidates.
+    """
+
+    def __init__(self, entries: Iterable[Entry], revision: tuple[int, int]):
+        self.revision = revision
+        self._by_key: dict[str, list[Entry]] = defaultdict(list)
+        for entry in entries:
+            keys = {normalize(name) for name in [entry.name, entry.town, *entry.known_names]} - {""}
+            for key in keys:
+                self._by_key[key].append(entry)
+        # a town name resolves first to the place named after it
+        for candidates in self._by_key.values():
+            candidates.sort(key=lambda e: (e.name != e.town, e.place_id))
+
+        self._keys_by_trigram: dict[str, list[str]] = defaultdict(list)
+        self._trigram_counts: dict[str, int] = {}
+        for key in self._by_key:
+            key_trigrams = trigrams(key)
+            self._trigram_counts[key] = len(key_trigrams)
+            for trigram in key_trigrams:
+                self._keys_by_trigram[trigram].append(key)
+
+    def __len__(self) -> int:
+        return len(self._by_key)
+
+    def resolve(self, name: str) -> Entry | None:
+        """
+        :return: the place best matching the name, None when nothing is similar enough
+        """
+        name, province = self._split_province(name)
+        key = normalize(name)
+        if not key:
+            return None
+
+        candidates = self._by_key.get(key) or self._fuzzy_candidates(key)
+        if province:
+            candidates = [c for c in candidates if normalize(c.province) == province] or candidates
+        return candidates[0] if candidates else None
+
+    def _fuzzy_candidates(self, key: str) -> list[Entry]:
+        key_trigrams = trigrams(key)
+        shared = Counter(k for trigram in key_trigrams for k in self._keys_by_trigram.get(trigram, ()))
+        if not shared:
+            return []
+
+        def similarity(k: str) -> float:
+            return shared[k] / (len(key_trigrams) + self._trigram_counts[k] - shared[k])
+
+        best = max(similarity(k) for k in shared)
+        if best < SIMILARITY_THRESHOLD:
+            return []
+        candidates = [entry for k in shared if similarity(k) == best for entry in self._by_key[k]]
+        return sorted(candidates, key=lambda e: (e.name != e.town, e.place_id))
+
+    @staticmethod
+    def _split_province(name: str) -> tuple[str, str | None]:
+        if match := re.fullmatch(r"\s*(.+?)\s*\((.+)\)\s*", name):
+            return match.group(1), normalize(match.group(2))
+        if "," in name:
+            name, province = name.rsplit(",", 1)
+            return name, normalize(province) or None
+        return name, None
@@ -1,5 +1,6 @@
 from django.db import models
 
+from apps.places import gazetteer
 from djutils.models import SearchableModel
 
 
@@ -10,6 +11,15 @@ class Town(SearchableModel):
     def __str__(self):
         return f"{self.name} ({self.province})"
 
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        gazetteer.invalidate()
+
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        gazetteer.invalidate()
+        return result
+
     class Meta(SearchableModel.Meta):
         db_table = "town"
         verbose_name = "Municipio"
@@ -25,6 +35,15 @@ class Place(SearchableModel):
     def __str__(self):
         return f"{self.name} - {self.town}" if self.name != self.town.name else f"{self.town}"
 
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        gazetteer.invalidate()
+
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        gazetteer.invalidate()
+        return result
+
     class Meta(SearchableModel.Meta):
         db_table = "place"
         verbose_name = "Lugar"
@@ -1,7 +1,12 @@
 from django.core.exceptions import ObjectDoesNotExist
 
+from apps.places import gazetteer
+from apps.places.gazetteer import Entry, Gazetteer
 from apps.places.models import Place
 
+_gazetteer: Gazetteer | None = None
+_places: dict[int, Place] = {}
+
 
 def get_closest_by_name_or_none(name: str) -> Place | None:
     try:
@@ -21,3 +26,31 @@ def get_closest_by_name(name: str) -> Place | None:
         return Place.searchable_objects.closest_by_name(name)
     except ObjectDoesNotExist:
         raise Place.DoesNotExist
+
+
+def resolve(name: str) -> Place | None:
+    """
+    Resolve a place (or town) name against the in-memory gazetteer, loaded once and reloaded only after places or towns
+    change.
+
+    :return: matching place, None when nothing is similar enough
+    """
+    if not name:
+        return None
+    entry = _get_gazetteer().resolve(name)
+    return _places[entry.place_id] if entry else None
+
+
+def _get_gazetteer() -> Gazetteer:
+    global _gazetteer, _places
+    revision = gazetteer.revision()
+    if _gazetteer is None or _gazetteer.revision != revision:
+        _places = {p.pk: p for p in Place.objects.select_related("town")}
+        _gazetteer = Gazetteer(
+            [
+                Entry(p.pk, p.name, p.town.name, p.town.province, (*p.known_names, *p.town.known_names))
+                for p in _places.values()
+            ],
+            revision=revision,
+        )
+    return _gazetteer
@@ -2,6 +2,7 @@ from django.contrib import admin
 
 from apps.participants.models import Participant
 from apps.races.models import Flag, Race, Trophy
+from apps.utils.admin import CappedInlineFormSet, EstimatedCountPaginator, changelist_link
 from djutils.admin import ReadOnlyTabularInline, StampedModelAdmin, YearFilter
 
 
@@ -13,23 +14,63 @@ class RaceYearFilter(YearFilter):
 
 class RaceInline(ReadOnlyTabularInline):
     model = Race
+    formset = CappedInlineFormSet
+    fields = ("date", "day", "trophy", "trophy_edition", "flag", "flag_edition", "league", "gender", "category")
+    ordering = ("-date",)
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related("trophy", "flag", "league")
 
 
 class ParticipantInline(ReadOnlyTabularInline):
     model = Participant
+    formset = CappedInlineFormSet
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related("club")
 
-@admin.register(Trophy)
-class TrophyAdmin(StampedModelAdmin):
+
+class CompetitionAdmin(StampedModelAdmin):
     inlines = [RaceInline]
+    search_fields = ("name",)
+
+    def get_readonly_fields(self, request, obj=None):
+        return [*super().get_readonly_fields(request, obj), "all_races"]
+
+    @admin.display(description="Regatas")
+    def all_races(self, obj: Trophy | Flag) -> str:
+        if not obj.pk:
+            return "-"
+        field = obj._meta.model_name
+        count = Race.objects.filter(**{field: obj}).count()
+        return changelist_link(Race, f"Ver todas ({count})", **{f"{field}__id__exact": obj.pk})
+
+
+@admin.register(Trophy)
+class TrophyAdmin(CompetitionAdmin):
+    pass
 
 
 @admin.register(Flag)
-class FlagTrophyAdmin(StampedModelAdmin):
-    inlines = [RaceInline]
+class FlagTrophyAdmin(CompetitionAdmin):
+    pass
 
 
 @admin.register(Race)
 class RaceAdmin(StampedModelAdmin):
     inlines = [ParticipantInline]
     list_filter = ("league", RaceYearFilter)
+    list_select_related = ("trophy", "flag", "league")
+    search_fields = ("trophy__name", "flag__name", "sponsor")
+    autocomplete_fields = ("trophy", "flag", "league", "organizer", "place", "associated", "same_as")
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_readonly_fields(self, request, obj=None):
+        return [*super().get_readonly_fields(request, obj), "all_participants"]
+
+    @admin.display(description="Participantes")
+    def all_participants(self, obj: Race) -> str:
+        if not obj.pk:
+            return "-"
+        return changelist_link(Participant, f"Ver todos ({obj.participants.count()})", race__id__exact=obj.pk)
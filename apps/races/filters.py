@@ -1,8 +1,9 @@
 from typing import Self
 
-from django.db.models import Q, QuerySet
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db.models import F, QuerySet
 
-from apps.races.models import Race
+from apps.races.models import SEARCH_CONFIG, Race
 from pyutils.strings import remove_conjunctions, remove_symbols, whitespaces_clean
 
 
@@ -27,6 +28,7 @@ class RaceFilters:
 
     def __init__(self, queryset: QuerySet[Race]):
         self.sorting = self._DEFAULT_SORTING
+        self.sorted = False
         self.keywords = None
         self.filters = {}
         self.queryset = queryset
@@ -49,24 +51,35 @@ class RaceFilters:
     def set_sorting(self, sort_by: str | None) -> Self:
         if not sort_by or sort_by.replace("-", "") not in self._SORTING_MAP.keys():
             self.sorting = self._DEFAULT_SORTING
+            self.sorted = False
             return self
 
         desc, sort_by = "-" in sort_by, sort_by.replace("-", "")
+        self.sorted = True
         self.sorting = [f"-{e}" for e in self._SORTING_MAP[sort_by]] if desc else self._SORTING_MAP[sort_by]
         return self
 
     # noinspection DuplicatedCode
     def build_query(self) -> QuerySet[Race]:
         queryset = self.queryset.filter(**self.filters)
+        sorting = self.sorting
         if self.keywords:
-            queryset = queryset.filter(
-                Q(trophy__isnull=False, trophy__name__icontains=self.keywords)
-                | Q(flag__isnull=False, flag__name__icontains=self.keywords)
-                | Q(league__isnull=False, league__name__icontains=self.keywords)
-                | Q(sponsor__isnull=False, sponsor__icontains=self.keywords)
-                | Q(town__isnull=False, town__icontains=self.keywords)
+            # prefix match every keyword so partially typed words keep matching, quoted so tsquery operators in the
+            # keywords are searched as text
+            query = SearchQuery(
+                " & ".join(f"{self._quote(keyword)}:*" for keyword in self.keywords.split()),
+                config=SEARCH_CONFIG,
+                search_type="raw",
             )
+            queryset = queryset.filter(search_document=query).annotate(rank=SearchRank(F("search_document"), query))
+            # most relevant races first unless an explicit sorting was requested
+            sorting = sorting if self.sorted else ["-rank", *sorting]
 
-        queryset = queryset.order_by(*self.sorting)
+        queryset = queryset.order_by(*sorting)
 
         return queryset
+
+    @staticmethod
+    def _quote(keyword: str) -> str:
+        escaped = keyword.replace("\\", "\\\\").replace("'", "''")
+        return f"'{escaped}'"
@@ -0,0 +1,54 @@
+# Generated by Django 6.0.7 on 2026-10-19 10:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("races", "0020_weird_speeds"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RaceNameHint",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("datasource", models.CharField(max_length=50)),
+                ("name", models.CharField(max_length=200)),
+                ("hits", models.PositiveIntegerField(default=0)),
+                ("last_used", models.DateTimeField(auto_now=True)),
+                (
+                    "flag",
+                    models.ForeignKey(
+                        blank=True,
+                        default=None,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="hints",
+                        related_query_name="hint",
+                        to="races.flag",
+                    ),
+                ),
+                (
+                    "trophy",
+                    models.ForeignKey(
+                        blank=True,
+                        default=None,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="hints",
+                        related_query_name="hint",
+                        to="races.trophy",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Pista de regata",
+                "verbose_name_plural": "Pistas de regatas",
+                "db_table": "race_name_hint",
+                "ordering": ["datasource", "name"],
+                "unique_together": {("datasource", "name")},
+            },
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 6.0.7 on 2026-10-19 13:40
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.contrib.postgres.operations import UnaccentExtension
+from django.db import migrations
+
+CREATE_SEARCH_CONFIG_SQL = """
+    CREATE TEXT SEARCH CONFIGURATION race_search (COPY = simple);
+    ALTER TEXT SEARCH CONFIGURATION race_search ALTER MAPPING FOR hword, hword_part, word WITH unaccent, simple;
+"""
+DROP_SEARCH_CONFIG_SQL = "DROP TEXT SEARCH CONFIGURATION IF EXISTS race_search;"
+
+BACKFILL_SQL = """
+    UPDATE race SET search_document = d.document
+    FROM (
+        SELECT
+            r.id,
+            setweight(to_tsvector('race_search', concat_ws(' ', t.name, f.name)), 'A')
+            || setweight(to_tsvector('race_search', concat_ws(' ', array_to_string(r.race_names, ' '), l.name)), 'B')
+            || setweight(to_tsvector('race_search', concat_ws(' ', r.sponsor, p.name, tw.name)), 'C') AS document
+        FROM race r
+            LEFT JOIN trophy t ON t.id = r.trophy_id
+            LEFT JOIN flag f ON f.id = r.flag_id
+            LEFT JOIN league l ON l.id = r.league_id
+            LEFT JOIN place p ON p.id = r.place_id
+            LEFT JOIN town tw ON tw.id = p.town_id
+    ) AS d
+    WHERE race.id = d.id;
+"""
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("races", "0021_racenamehint"),
+    ]
+
+    operations = [
+        UnaccentExtension(),
+        migrations.RunSQL(CREATE_SEARCH_CONFIG_SQL, reverse_sql=DROP_SEARCH_CONFIG_SQL),
+        migrations.AddField(
+            model_name="race",
+            name="search_document",
+            field=django.contrib.postgres.search.SearchVectorField(blank=True, default=None, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name="race",
+            index=django.contrib.postgres.indexes.GinIndex(fields=["search_document"], name="race_search_document_idx"),
+        ),
+        migrations.RunSQL(BACKFILL_SQL, reverse_sql=migrations.RunSQL.noop),
+    ]
@@ -0,0 +1,80 @@
+# Generated by Django 6.0.7 on 2026-10-19 13:05
+
+import json
+import zlib
+from datetime import datetime
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def archive_scraped_data(apps, _):
+    ContentType = apps.get_model("contenttypes", "ContentType")
+    ScrapedPayload = apps.get_model("races", "ScrapedPayload")
+
+    for app_label, model_name in [("races", "Race"), ("participants", "Participant")]:
+        model = apps.get_model(app_label, model_name)
+        content_type, _ = ContentType.objects.get_or_create(app_label=app_label, model=model_name.lower())
+
+        payloads, modified = [], []
+        for item in model.objects.only("pk", "metadata").iterator(chunk_size=2000):
+            datasources = [d for d in item.metadata["datasource"] if "data" in d]
+            for datasource in datasources:
+                data = datasource.pop("data")
+                payloads.append(
+                    ScrapedPayload(
+                        content_type=content_type,
+                        object_id=item.pk,
+                        datasource=datasource["datasource_name"],
+                        ref_id=datasource.get("ref_id", ""),
+                        date=datasource.get("date") or datetime.now().date().isoformat(),
+                        payload=zlib.compress(json.dumps(data, ensure_ascii=False).encode()),
+                    )
+                )
+            if datasources:
+                modified.append(item)
+
+            if len(modified) >= 2000:
+                ScrapedPayload.objects.bulk_create(payloads, ignore_conflicts=True)
+                model.objects.bulk_update(modified, ["metadata"])
+                payloads, modified = [], []
+
+        ScrapedPayload.objects.bulk_create(payloads, ignore_conflicts=True)
+        model.objects.bulk_update(modified, ["metadata"])
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("contenttypes", "0002_remove_content_type_name"),
+        ("participants", "0011_participant_laps_cs_participant_time_cs"),
+        ("races", "0022_race_search_document"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ScrapedPayload",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("object_id", models.PositiveIntegerField()),
+                ("datasource", models.CharField(max_length=50)),
+                ("ref_id", models.CharField(blank=True, default="", max_length=50)),
+                ("date", models.DateField()),
+                ("payload", models.BinaryField()),
+                (
+                    "content_type",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="contenttypes.contenttype",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Datos scrapeados",
+                "verbose_name_plural": "Datos scrapeados",
+                "db_table": "scraped_payload",
+                "unique_together": {("content_type", "object_id", "datasource", "ref_id")},
+            },
+        ),
+        migrations.RunPython(archive_scraped_data, reverse_code=migrations.RunPython.noop),
+    ]
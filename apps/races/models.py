@@ -1,11 +1,20 @@
+import json
 import logging
+import zlib
+from collections.abc import Iterable
+from datetime import datetime
 from typing import TYPE_CHECKING, Any, Self
 
+from django.contrib.contenttypes.fields import GenericForeignKey, GenericRelation
+from django.contrib.contenttypes.models import ContentType
 from django.contrib.postgres.fields import ArrayField
-from django.db import IntegrityError, models
-from django.db.models import JSONField, Q
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
+from django.db import IntegrityError, connection, models
+from django.db.models import JSONField, Q, QuerySet
 
 from apps.schemas import FLAG_METADATA_SCHEMA, RACE_METADATA_SCHEMA, default_metadata
+from apps.utils import lemmas
 from apps.utils.choices import (
     RACE_CATEGORY_CHOICES,
     RACE_CONVENTIONAL,
@@ -14,15 +23,38 @@ from apps.utils.choices import (
     RACE_TRAINERA,
     RACE_TYPE_CHOICES,
 )
+from apps.utils.lazy import lazy_import
 from djutils.models import CreationStampModel
 from djutils.validators import JSONSchemaValidator
 from pyutils.shortcuts import all_or_none
 from pyutils.strings import int_to_roman, whitespaces_clean
 from rscraping.data.models import Datasource
-from rscraping.data.normalization import lemmatize
 
+# participants depend on the races, so they are imported on first use
+participant_models = lazy_import("apps.participants.models")
 logger = logging.getLogger(__name__)
 
+# unaccented 'simple' configuration (see races.0022) as stemming mangles basque and galician names
+SEARCH_CONFIG = "race_search"
+_SEARCH_DOCUMENT_SQL = """
+    UPDATE race SET search_document = d.document
+    FROM (
+        SELECT
+            r.id,
+            setweight(to_tsvector('race_search', concat_ws(' ', t.name, f.name)), 'A')
+            || setweight(to_tsvector('race_search', concat_ws(' ', array_to_string(r.race_names, ' '), l.name)), 'B')
+            || setweight(to_tsvector('race_search', concat_ws(' ', r.sponsor, p.name, tw.name)), 'C') AS document
+        FROM race r
+            LEFT JOIN trophy t ON t.id = r.trophy_id
+            LEFT JOIN flag f ON f.id = r.flag_id
+            LEFT JOIN league l ON l.id = r.league_id
+            LEFT JOIN place p ON p.id = r.place_id
+            LEFT JOIN town tw ON tw.id = p.town_id
+        WHERE r.id IN ({races})
+    ) AS d
+    WHERE race.id = d.id;
+"""
+
 
 class Trophy(CreationStampModel):
     name = models.CharField(max_length=150, unique=True)
@@ -35,9 +67,15 @@ class Trophy(CreationStampModel):
         return self.name
 
     def save(self, *args, **kwargs):
-        if not self.pk:
-            self.tokens = lemmatize(self.name)
+        is_new = not self.pk
+        if is_new:
+            self.tokens = lemmas.lemmatize(self.name)
+        else:
+            # hints pointing to a renamed trophy are no longer reliable
+            RaceNameHint.objects.filter(trophy=self).exclude(trophy__name=self.name).delete()
         super().save(*args, **kwargs)
+        if not is_new:
+            Race.refresh_search_documents(Race.objects.filter(trophy=self))
 
     class Meta(CreationStampModel.Meta):
         db_table = "trophy"
@@ -64,9 +102,15 @@ class Flag(CreationStampModel):
         return self.name
 
     def save(self, *args, **kwargs):
-        if not self.pk:
-            self.tokens = lemmatize(self.name)
+        is_new = not self.pk
+        if is_new:
+            self.tokens = lemmas.lemmatize(self.name)
+        else:
+            # hints pointing to a renamed flag are no longer reliable
+            RaceNameHint.objects.filter(flag=self).exclude(flag__name=self.name).delete()
         super().save(*args, **kwargs)
+        if not is_new:
+            Race.refresh_search_documents(Race.objects.filter(flag=self))
 
     def get_datasources(self, datasource: Datasource, ref_id: str) -> list[dict[str, Any]]:
         datasource_str = datasource.value.lower()
@@ -88,6 +132,59 @@ class Flag(CreationStampModel):
 
 
 # TODO: enum of cancellation reasons
+# fields no position, standing or speed is computed from, writing only them refreshes nothing
+_UNRANKED_FIELDS = {"metadata", "associated", "organizer", "cancellation_reasons"}
+# fields the search document is built from
+_SEARCHABLE_FIELDS = ["race_names", "sponsor", "trophy", "flag", "league", "place"]
+
+
+class RaceQuerySet(models.QuerySet["Race"]):
+    """
+    Bulk writes skipping 'save' keep the scraped payloads, search documents and derived tables in sync through the same
+    hooks.
+    """
+
+    def update(self, **kwargs) -> int:
+        ranked, searchable = not set(kwargs) <= _UNRANKED_FIELDS, _is_searchable(kwargs)
+        if not ranked and not searchable:
+            return super().update(**kwargs)
+        previous = list(self.values_list("pk", "league_id", "date__year"))
+        rows = super().update(**kwargs)
+        _refresh_derived(previous, ranked=ranked, searchable=searchable)
+        return rows
+
+    def bulk_update(self, objs: Iterable["Race"], fields: Iterable[str], batch_size: int | None = None) -> int:
+        objs, fields = list(objs), list(fields)
+        if "metadata" in fields:
+            ScrapedPayload.archive(objs)
+        ranked, searchable = not set(fields) <= _UNRANKED_FIELDS, _is_searchable(fields)
+        if not ranked and not searchable:
+            return super().bulk_update(objs, fields, batch_size=batch_size)
+        previous = list(Race.objects.filter(pk__in=[r.pk for r in objs]).values_list("pk", "league_id", "date__year"))
+        rows = super().bulk_update(objs, fields, batch_size=batch_size)
+        _refresh_derived(previous, ranked=ranked, searchable=searchable)
+        return rows
+
+
+def _is_searchable(fields: Iterable[str]) -> bool:
+    return any(f.removesuffix("_id") in _SEARCHABLE_FIELDS for f in fields)
+
+
+def _refresh_derived(previous: list[tuple[int, int | None, int]], ranked: bool = True, searchable: bool = True):
+    """
+    Refresh the search documents and derived tables of updated races, the league seasons and years they were moved from
+    included.
+    """
+    if searchable:
+        Race.refresh_search_documents(Race.objects.filter(pk__in=[pk for pk, _, _ in previous]))
+    if ranked:
+        participant_models.refresh_derived(
+            [pk for pk, _, _ in previous],
+            [(league_id, year) for _, league_id, year in previous if league_id],
+            [year for _, _, year in previous],
+        )
+
+
 class Race(CreationStampModel):
     laps = models.PositiveSmallIntegerField(null=True, blank=True, default=None)
     lanes = models.PositiveSmallIntegerField(null=True, blank=True, default=None)
@@ -176,6 +273,11 @@ class Race(CreationStampModel):
         default=default_metadata,
         validators=[JSONSchemaValidator(schema=RACE_METADATA_SCHEMA)],
     )
+    # full-text document of the race names, competitions, sponsor and place, maintained on save
+    search_document = SearchVectorField(null=True, blank=True, default=None, editable=False)
+    payloads = GenericRelation("races.ScrapedPayload", related_query_name="race")
+
+    objects = RaceQuerySet.as_manager()
 
     if TYPE_CHECKING:
         # Annotate reverse ForeignKey relationships in TYPE_CHECKING block
@@ -219,13 +321,52 @@ class Race(CreationStampModel):
         self.validate_editions()
         self.validate_associated()
         self.full_clean()
+        update_fields = kwargs.get("update_fields")
+        previous = (
+            Race.objects.filter(pk=self.pk).values_list("league_id", "date__year", *_SEARCHABLE_FIELDS).first()
+            if self.pk
+            else None
+        )
+        payloads = ScrapedPayload.extract(self.metadata)
         super().save(*args, **kwargs)
+        ScrapedPayload.store(self, payloads)
+
+        # the league, cancellation, duplication or type of the race change its positions, standings and speeds, the
+        # ones of the league season and year it was moved from included
+        previous_league_id, previous_year, *previous_searchable = previous or (None, self.date.year)
+        _refresh_derived(
+            [(self.pk, previous_league_id, previous_year)],
+            ranked=update_fields is None or not set(update_fields) <= _UNRANKED_FIELDS,
+            searchable=not previous or previous_searchable != [self.serializable_value(f) for f in _SEARCHABLE_FIELDS],
+        )
+
+    def delete(self, *args, **kwargs):
+        league_id = self.league_id  # pyright: ignore
+        result = super().delete(*args, **kwargs)
+        participant_models.refresh_derived([], [(league_id, self.date.year)] if league_id else [], [self.date.year])
+        return result
+
+    @classmethod
+    def refresh_search_documents(cls, queryset: QuerySet["Race"] | None = None):
+        """
+        Recompute the full-text search document of the given races, all of them by default.
+        """
+        queryset = queryset if queryset is not None else cls.objects.all()
+        races, params = queryset.order_by().values("pk").query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(_SEARCH_DOCUMENT_SQL.format(races=races), params)
 
     def get_datasources(self, datasource: Datasource, ref_id: str) -> list[dict[str, Any]]:
         datasource_str = datasource.value.lower()
         datasources = self.metadata["datasource"]
         return [d for d in datasources if d["datasource_name"] == datasource_str and str(d["ref_id"]) == str(ref_id)]
 
+    def get_scraped_data(self, datasource: Datasource, ref_id: str) -> dict[str, Any] | None:
+        """
+        Lazily load the raw payload scraped from the datasource, archived out of the metadata on save.
+        """
+        return ScrapedPayload.load(self, datasource.value, str(ref_id))
+
     def add_metadata(self, new: dict[str, Any]) -> Self:
         datasource = Datasource(new["datasource_name"])
         assert self.get_datasources(datasource, new["ref_id"]) == [], "datasource already exists"
@@ -246,4 +387,135 @@ class Race(CreationStampModel):
                 fields=["league", "date"], name="unique_race_league_date", condition=Q(same_as__isnull=True)
             ),
         ]
+        indexes = [GinIndex(fields=["search_document"], name="race_search_document_idx")]
         ordering = ["date", "league"]
+
+
+class RaceNameHint(models.Model):
+    """
+    Persisted (Flag, Trophy) resolved for a raw race name of a datasource, used to skip name matching in later runs.
+    """
+
+    datasource = models.CharField(max_length=50)
+    name = models.CharField(max_length=200)
+    flag = models.ForeignKey(
+        null=True,
+        blank=True,
+        default=None,
+        to=Flag,
+        on_delete=models.CASCADE,
+        related_name="hints",
+        related_query_name="hint",
+    )
+    trophy = models.ForeignKey(
+        null=True,
+        blank=True,
+        default=None,
+        to=Trophy,
+        on_delete=models.CASCADE,
+        related_name="hints",
+        related_query_name="hint",
+    )
+
+    hits = models.PositiveIntegerField(default=0)
+    last_used = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.datasource} :: {self.name}"
+
+    class Meta:
+        db_table = "race_name_hint"
+        verbose_name = "Pista de regata"
+        verbose_name_plural = "Pistas de regatas"
+        unique_together = [["datasource", "name"]]
+        ordering = ["datasource", "name"]
+
+
+class ScrapedPayload(models.Model):
+    """
+    Raw payload scraped from a datasource for a Race or Participant, zlib compressed and kept out of their metadata so
+    the hot rows (and the JSONB scans over 'metadata') only carry identifiers and values.
+    """
+
+    content_type = models.ForeignKey(to=ContentType, on_delete=models.CASCADE, related_name="+")
+    object_id = models.PositiveIntegerField()
+    content_object = GenericForeignKey("content_type", "object_id")
+
+    datasource = models.CharField(max_length=50)
+    ref_id = models.CharField(blank=True, default="", max_length=50)
+    date = models.DateField()
+    payload = models.BinaryField()
+
+    def __str__(self):
+        return f"{self.content_type.model}:{self.object_id} :: {self.datasource} {self.ref_id}".strip()
+
+    @property
+    def data(self) -> dict[str, Any]:
+        return json.loads(zlib.decompress(bytes(self.payload)))
+
+    @data.setter
+    def data(self, value: dict[str, Any]):
+        self.payload = zlib.compress(json.dumps(value, ensure_ascii=False).encode())
+
+    @classmethod
+    def load(cls, instance: models.Model, datasource: str, ref_id: str = "") -> dict[str, Any] | None:
+        """
+        Load the archived payload of an instance for the given datasource, None when nothing was archived.
+        """
+        item = cls.objects.filter(
+            content_type=ContentType.objects.get_for_model(instance),
+            object_id=instance.pk,
+            datasource=datasource,
+            ref_id=ref_id,
+        ).first()
+        return item.data if item else None
+
+    @classmethod
+    def extract(cls, metadata: dict[str, Any]) -> list["ScrapedPayload"]:
+        """
+        Pop the scraped 'data' of every datasource in the metadata, returning the (unsaved) payloads to archive.
+        """
+        payloads = []
+        for datasource in metadata["datasource"]:
+            data = datasource.pop("data", None)
+            if data is None:
+                continue
+            payload = cls(
+                datasource=datasource["datasource_name"],
+                ref_id=datasource.get("ref_id", ""),
+                date=datasource.get("date") or datetime.now().date().isoformat(),
+            )
+            payload.data = data
+            payloads.append(payload)
+        return payloads
+
+    @classmethod
+    def store(cls, instance: models.Model, payloads: list["ScrapedPayload"]):
+        """
+        Archive the payloads extracted from an already saved instance, replacing the ones previously stored.
+        """
+        if not payloads:
+            return
+        content_type = ContentType.objects.get_for_model(instance)
+        for payload in payloads:
+            payload.content_type, payload.object_id = content_type, instance.pk
+        cls.objects.bulk_create(
+            payloads,
+            update_conflicts=True,
+            unique_fields=["content_type", "object_id", "datasource", "ref_id"],
+            update_fields=["date", "payload"],
+        )
+
+    @classmethod
+    def archive(cls, instances: Iterable[models.Model]):
+        """
+        Extract and store the scraped 'data' of saved instances, used when they are updated without calling 'save'.
+        """
+        for instance in instances:
+            cls.store(instance, cls.extract(instance.metadata))  # pyright: ignore
+
+    class Meta:
+        db_table = "scraped_payload"
+        verbose_name = "Datos scrapeados"
+        verbose_name_plural = "Datos scrapeados"
+        unique_together = [["content_type", "object_id", "datasource", "ref_id"]]
@@ -5,6 +5,8 @@ from functools import reduce
 from django.db.models import Q
 
 from apps.races.models import Flag, Race, Trophy
+from apps.utils import lemmas
+from apps.utils.locks import advisory_lock
 from pyutils.strings import (
     closest_result,
     expand_lemmas,
@@ -15,7 +17,6 @@ from pyutils.strings import (
 )
 from rscraping.data.checks import is_memorial
 from rscraping.data.constants import SYNONYMS
-from rscraping.data.normalization import lemmatize
 
 logger = logging.getLogger(__name__)
 
@@ -62,12 +63,19 @@ def get_closest_by_name_or_create[T: (Trophy, Flag)](_model: type[T], name: str)
     Returns: closest found Flag|Trophy in the database or a newly created one
     """
     try:
-        item = get_closest_by_name(_model, name)
+        return get_closest_by_name(_model, name)
     except _model.DoesNotExist:
-        item = _model(name=name.upper())
-        item.save()
+        pass
+
+    # creations are serialized and the search repeated, as a concurrent scrape could have created it in the meantime
+    with advisory_lock(_model._meta.db_table, "create"):
+        try:
+            return get_closest_by_name(_model, name)
+        except _model.DoesNotExist:
+            item = _model(name=name.upper())
+            item.save()
 
-        logger.info(f"created:: {item}")
+    logger.info(f"created:: {item}")
     return item
 
 
@@ -81,11 +89,9 @@ def get_competition_or_none(names: list[str]) -> tuple[Trophy | None, Flag | Non
     Returns: tuple[Trophy, Flag]: A tuple containing the closest Trophy and Flag.
     """
     trophy, flag = None, None
+    names = [n for n in names if len(names) == 1 or not is_memorial(n)]
 
     for name in names:
-        if len(names) > 1 and is_memorial(name):
-            continue
-
         if not trophy:
             trophy = get_closest_by_name_or_none(Trophy, name)
         if not flag:
@@ -94,6 +100,14 @@ def get_competition_or_none(names: list[str]) -> tuple[Trophy | None, Flag | Non
     return trophy, flag
 
 
+def normalize_name(name: str) -> str:
+    """
+    Normalize a competition name before it is lemmatized to search by tokens.
+    """
+    name = remove_parenthesis(name, preserve_content=True)
+    return whitespaces_clean(normalize_synonyms(name, SYNONYMS))
+
+
 def infer_edition[T: (Trophy, Flag)](item: T, gender: str, category: str, year: int) -> int | None:
     """
     Returns: inferred edition for the Flag|Trophy given.
@@ -123,9 +137,9 @@ def _get_closest_by_name_with_tokens[T: (Trophy, Flag)](_model: type[T], name: s
     """
 
     # try search by tokens without expansion
-    name = remove_parenthesis(name, preserve_content=True)
-    name = whitespaces_clean(normalize_synonyms(name, SYNONYMS))
-    tokens = [lemmatize(name)]
+    name = normalize_name(name)
+    lemmatized = lemmas.lemmatize(name)
+    tokens = [lemmatized]
     unaccented_tokens = [[unaccent(name) for name in sublist] for sublist in tokens]
 
     items = _model.objects.filter(reduce(operator.or_, [Q(tokens__contains=sublist) for sublist in unaccented_tokens]))
@@ -133,7 +147,7 @@ def _get_closest_by_name_with_tokens[T: (Trophy, Flag)](_model: type[T], name: s
         return items.first()
 
     # try search by tokens with expansion
-    tokens = expand_lemmas(lemmatize(name), TOKEN_EXPANSIONS)
+    tokens = expand_lemmas(lemmatized, TOKEN_EXPANSIONS)
     unaccented_tokens = [[unaccent(name) for name in sublist] for sublist in tokens]
 
     items = _model.objects.filter(reduce(operator.or_, [Q(tokens__contains=sublist) for sublist in unaccented_tokens]))
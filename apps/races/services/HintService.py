@@ -0,0 +1,48 @@
+import logging
+
+from django.db.models import F
+from django.utils import timezone
+
+from apps.races.models import Flag, RaceNameHint, Trophy
+from rscraping.data.models import Datasource
+
+logger = logging.getLogger(__name__)
+
+
+def get_hint_or_none(datasource: Datasource, name: str) -> tuple[Flag, Trophy] | None:
+    """
+    Retrieve the persisted (Flag, Trophy) hint for a raw race name, updating its usage stats.
+
+    Args:
+        datasource (Datasource): The datasource the race name comes from.
+        name (str): The raw race name as scraped.
+
+    Returns: tuple[Flag, Trophy] | None: The stored hint or None if the name was never resolved.
+    """
+    hint = RaceNameHint.objects.select_related("flag", "trophy").filter(datasource=datasource.value, name=name).first()
+    if not hint:
+        return None
+
+    RaceNameHint.objects.filter(pk=hint.pk).update(hits=F("hits") + 1, last_used=timezone.now())
+    logger.debug(f"found {hint=} for {name=}")
+    return hint.flag, hint.trophy  # pyright: ignore
+
+
+def save_hint(datasource: Datasource, name: str, flag: Flag | None, trophy: Trophy | None) -> RaceNameHint | None:
+    """
+    Persist the (Flag, Trophy) a raw race name resolved to so next runs can skip the name matching, replacing the
+    previous hint of the name.
+
+    Returns: RaceNameHint | None: The stored hint or None if there is no competition to store, in which case the
+        previous hint is deleted.
+    """
+    if not flag and not trophy:
+        RaceNameHint.objects.filter(datasource=datasource.value, name=name).delete()
+        return None
+
+    hint, _ = RaceNameHint.objects.update_or_create(
+        datasource=datasource.value,
+        name=name,
+        defaults={"flag": flag, "trophy": trophy},
+    )
+    return hint
@@ -1,10 +1,13 @@
 import logging
+from dataclasses import dataclass, field
 from datetime import date
 
-from django.db.models import Q, QuerySet
+from django.contrib.postgres.aggregates import ArrayAgg
+from django.db.models import Count, Q, QuerySet
 
-from apps.entities.models import League
+from apps.entities.models import Entity, League
 from apps.entities.services import LeagueService
+from apps.places.models import Place
 from apps.races.filters import RaceFilters
 from apps.races.models import Flag, Race, Trophy
 from apps.races.services import CompetitionService
@@ -46,6 +49,40 @@ def get_races_by_competition(trophy: Trophy | None, flag: Flag | None, league: L
     return Race.objects.filter(*filters)
 
 
+@dataclass
+class CompetitionProfile:
+    """
+    Aggregated information of all the races of a competition (trophy, flag, league).
+    """
+
+    editions: int = 0
+    place_ids: list[int] = field(default_factory=list)
+    organizer_ids: list[int] = field(default_factory=list)
+    place: Place | None = None
+    organizer: Entity | None = None
+
+
+def get_competition_profile(trophy: Trophy | None, flag: Flag | None, league: League | None) -> CompetitionProfile:
+    """
+    Computes, with a single aggregate query, the number of races and the distinct places and organizers of a
+    competition. When there is only one place or organizer it's also loaded.
+
+    Returns: CompetitionProfile: The aggregated competition information.
+    """
+    values = get_races_by_competition(trophy, flag, league).aggregate(
+        editions=Count("id"),
+        place_ids=ArrayAgg("place_id", distinct=True, filter=Q(place__isnull=False), default=[]),
+        organizer_ids=ArrayAgg("organizer_id", distinct=True, filter=Q(organizer__isnull=False), default=[]),
+    )
+
+    profile = CompetitionProfile(**values)
+    if len(profile.place_ids) == 1:
+        profile.place = Place.objects.filter(id=profile.place_ids[0]).first()
+    if len(profile.organizer_ids) == 1:
+        profile.organizer = Entity.all_objects.filter(id=profile.organizer_ids[0]).first()
+    return profile
+
+
 def filter(
     queryset: QuerySet[Race],
     filters: dict,
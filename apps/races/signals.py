@@ -0,0 +1,25 @@
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from apps.entities.models import League
+from apps.places.models import Place, Town
+from apps.races.models import Race
+
+
+# the search documents include the names of the leagues, places and towns, renaming one refreshes its races
+@receiver(post_save, sender=League)
+def refresh_league_races(instance: League, created: bool, update_fields=None, **_):
+    if not created and (update_fields is None or "name" in update_fields):
+        Race.refresh_search_documents(Race.objects.filter(league=instance))
+
+
+@receiver(post_save, sender=Place)
+def refresh_place_races(instance: Place, created: bool, update_fields=None, **_):
+    if not created and (update_fields is None or "name" in update_fields):
+        Race.refresh_search_documents(Race.objects.filter(place=instance))
+
+
+@receiver(post_save, sender=Town)
+def refresh_town_races(instance: Town, created: bool, update_fields=None, **_):
+    if not created and (update_fields is None or "name" in update_fields):
+        Race.refresh_search_documents(Race.objects.filter(place__town=instance))
@@ -1,14 +1,23 @@
-from rscraping.clients import Client
+from typing import TYPE_CHECKING
+
 from rscraping.data.constants import GENDER_FEMALE, GENDER_MALE
 from rscraping.data.models import Datasource
 
+from .lazy import lazy_import
+
+if TYPE_CHECKING:
+    from rscraping.clients import Client
+
+# the clients pull every parser (and their OCR, spreadsheet and dataframe dependencies), only scrapes need them
+_clients = lazy_import("rscraping.clients")
+
 
 def build_client(
     source: Datasource | None,
     gender: str | None = None,
     category: str | None = None,
-) -> Client:
+) -> "Client":
     assert source is not None, "invalid source"
     if gender is None:
         gender = GENDER_FEMALE if source in {Datasource.ETE} else GENDER_MALE
-    return Client(source=source, gender=gender, category=category)
+    return _clients.Client(source=source, gender=gender, category=category)
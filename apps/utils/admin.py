@@ -0,0 +1,51 @@
+from functools import cached_property
+
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Model
+from django.forms.models import BaseInlineFormSet
+from django.urls import reverse
+from django.utils.html import format_html
+
+# below this number of rows the estimation is not worth it
+_ESTIMATION_THRESHOLD = 10_000
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator using the planner estimation of the table size for unfiltered changelists of big tables.
+    """
+
+    @cached_property
+    def count(self) -> int:
+        queryset = self.object_list
+        if queryset.query.where:
+            return super().count
+
+        with connections[queryset.db].cursor() as cursor:
+            cursor.execute("SELECT reltuples::BIGINT FROM pg_class WHERE relname = %s", [queryset.model._meta.db_table])
+            row = cursor.fetchone()
+        estimate = row[0] if row else -1
+        return estimate if estimate > _ESTIMATION_THRESHOLD else super().count
+
+
+class CappedInlineFormSet(BaseInlineFormSet):
+    """
+    Inline formset rendering only the first 'max_shown' related objects, use with `changelist_link` to reach the rest.
+    """
+
+    max_shown = 50
+
+    def get_queryset(self):
+        if not hasattr(self, "_capped_queryset"):
+            self._capped_queryset = super().get_queryset()[: self.max_shown]
+        return self._capped_queryset
+
+
+def changelist_link(model: type[Model], label: str, **filters) -> str:
+    """
+    Link to the admin changelist of 'model' filtered by the given lookups.
+    """
+    url = reverse(f"admin:{model._meta.app_label}_{model._meta.model_name}_changelist")
+    query = "&".join(f"{key}={value}" for key, value in filters.items())
+    return format_html('<a href="{}?{}">{}</a>', url, query, label)
@@ -0,0 +1,101 @@
+import time
+from collections.abc import Callable, Iterable
+from datetime import date
+from functools import partial
+
+from django.core.cache import cache
+from django.db import transaction
+
+from apps.utils import db
+
+SPEEDS = "speeds"
+PLACES = "places"
+
+# generations bumped along with every year before the current one and with the current and later ones, for the results
+# covering any closed season or any open one
+CLOSED_YEARS = "closed"
+OPEN_YEARS = "open"
+
+_ENTRY_TIMEOUT = 60 * 60 * 24 * 7
+
+
+def bump(namespace: str, year: int | None = None):
+    """
+    Invalidate, in O(1), every cached result of the namespace covering 'year', or all of them when no year is given.
+
+    Inside a transaction the bump waits for the commit, so no reader caches uncommitted data under the new generation.
+    """
+    keys = (
+        [_generation_key(namespace, None)]
+        if year is None
+        else [_generation_key(namespace, y) for y in (year, CLOSED_YEARS if year < current_season() else OPEN_YEARS)]
+    )
+    transaction.on_commit(partial(_incr, keys))
+
+
+def current_season() -> int:
+    """
+    First year still open to changes, results covering only the previous ones are kept across current season edits.
+    """
+    return date.today().year
+
+
+def generations(namespace: str, years: Iterable[int | str | None]) -> dict[int | str | None, int]:
+    """
+    Current generation of the namespace (None key) and of each of the given years.
+    """
+    keys = {_generation_key(namespace, year): year for year in {None, *years}}
+    found = cache.get_many(keys.keys())
+    missing = [key for key in keys if key not in found]
+    if missing:
+        for key in missing:
+            cache.add(key, time.time_ns(), timeout=None)
+        found |= cache.get_many(missing)
+    return {year: found.get(key, 0) for key, year in keys.items()}
+
+
+def get_or_compute[T](
+    namespace: str,
+    key: str,
+    compute: Callable[[], T],
+    years: Iterable[int | str] = (),
+    result_years: Callable[[T], Iterable[int]] | None = None,
+) -> T:
+    """
+    Return the cached result of 'compute' unless the namespace or any of the years it covers was bumped after it was
+    stored, computing and storing it otherwise.
+
+    'years' are the years known to be covered before computing (`CLOSED_YEARS`/`OPEN_YEARS` for results covering any
+    closed/open season),
+    'result_years' extracts the ones only known from the result.
+    """
+    cache_key = f"{namespace}:{key}"
+    entry = cache.get(cache_key)
+    if entry is not None:
+        stamp, value = entry
+        if generations(namespace, stamp.keys()) == stamp:
+            return value
+
+    # stamp before computing so writes made while computing invalidate the stored value
+    stamp = generations(namespace, years)
+    # a lagging replica could miss the writes that bumped the generation, pinning stale data until the next bump
+    with db.read_primary():
+        value = compute()
+    if result_years:
+        stamp |= generations(namespace, [y for y in result_years(value) if y not in stamp])
+
+    cache.set(cache_key, (stamp, value), timeout=_ENTRY_TIMEOUT)
+    return value
+
+
+def _incr(keys: list[str]):
+    for key in keys:
+        try:
+            cache.incr(key)
+        except ValueError:
+            # start from the current time so a generation evicted by the backend never matches an older stamp
+            cache.set(key, time.time_ns(), timeout=None)
+
+
+def _generation_key(namespace: str, year: int | str | None) -> str:
+    return f"{namespace}:generation" if year is None else f"{namespace}:generation:{year}"
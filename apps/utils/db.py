@@ -0,0 +1,90 @@
+import time
+from collections.abc import Callable, Generator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+REPLICA = "replica"
+
+_replica_reads: ContextVar[bool] = ContextVar("replica_reads", default=False)
+_primary_reads: ContextVar[bool] = ContextVar("primary_reads", default=False)
+_last_write: ContextVar[float | None] = ContextVar("last_write", default=None)
+
+
+@contextmanager
+def read_replica() -> Generator[None]:
+    """
+    Send the reads made inside the context to the replica, when one is configured and it can't miss our own writes.
+    """
+    token = _replica_reads.set(True)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+@contextmanager
+def read_primary() -> Generator[None]:
+    """
+    Keep the reads made inside the context on the primary, even the ones of read-only code.
+    """
+    token = _primary_reads.set(True)
+    try:
+        yield
+    finally:
+        _primary_reads.reset(token)
+
+
+def read_only[**P, R](function: Callable[P, R]) -> Callable[P, R]:
+    """
+    Mark a service function as read-only so its queries can be served by the replica.
+    """
+
+    @wraps(function)
+    def wrapper(*args: P.args, **kwargs: P.kwargs) -> R:
+        with read_replica():
+            return function(*args, **kwargs)
+
+    return wrapper
+
+
+def read_alias() -> str:
+    """
+    Database alias the reads should use right now, 'default' unless:
+        - the caller is read-only (see `read_replica`) and not forced to the primary (see `read_primary`).
+        - a replica is configured.
+        - we are not inside a transaction of the primary and didn't write in the last DATABASE_REPLICA_LAG seconds, so
+            the replica can't be missing our own writes.
+    """
+    if not _replica_reads.get() or _primary_reads.get() or REPLICA not in settings.DATABASES:
+        return DEFAULT_DB_ALIAS
+    if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+        return DEFAULT_DB_ALIAS
+
+    last_write = _last_write.get()
+    if last_write is not None and time.monotonic() - last_write < settings.DATABASE_REPLICA_LAG:
+        return DEFAULT_DB_ALIAS
+    return REPLICA
+
+
+class ReplicaRouter:
+    """
+    Route the reads of read-only code to the 'replica' alias and everything else to 'default'.
+    """
+
+    def db_for_read(self, model, **hints) -> str:
+        return read_alias()
+
+    def db_for_write(self, model, **hints) -> str:
+        _last_write.set(time.monotonic())
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints) -> bool:
+        # both aliases hold the same data
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints) -> bool:
+        return db == DEFAULT_DB_ALIAS
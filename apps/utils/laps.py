@@ -0,0 +1,45 @@
+from collections.abc import Iterable
+from datetime import time
+
+
+def parse_lap_time(lap: str) -> time:
+    """
+    Parse a scraped lap time string ('MM:SS.ffffff', optionally prefixed by hours) keeping its microseconds.
+
+    Equivalent to `datetime.strptime(lap, "%M:%S.%f").time()` but working directly with the string parts.
+    """
+    *parts, seconds = lap.strip().split(":")
+    seconds, _, fraction = seconds.partition(".")
+
+    minutes = 0
+    for part in parts:
+        minutes = minutes * 60 + int(part)
+    hours, minutes = divmod(minutes, 60)
+    microseconds = int(fraction.ljust(6, "0")[:6]) if fraction else 0
+
+    return time(hour=hours, minute=minutes, second=int(seconds), microsecond=microseconds)
+
+
+def parse_laps(laps: Iterable[str]) -> list[time]:
+    return [parse_lap_time(lap) for lap in laps]
+
+
+def parse_lap(lap: str) -> int:
+    """
+    Parse a scraped lap time string into centiseconds.
+    """
+    return time_to_centiseconds(parse_lap_time(lap))
+
+
+def time_to_centiseconds(value: time | str) -> int:
+    if isinstance(value, str):
+        return parse_lap(value)
+    seconds = (value.hour * 60 + value.minute) * 60 + value.second
+    return seconds * 100 + round(value.microsecond / 10_000)
+
+
+def centiseconds_to_time(value: int) -> time:
+    seconds, centiseconds = divmod(value, 100)
+    minutes, seconds = divmod(seconds, 60)
+    hours, minutes = divmod(minutes, 60)
+    return time(hour=hours, minute=minutes, second=seconds, microsecond=centiseconds * 10_000)
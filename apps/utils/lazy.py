@@ -0,0 +1,27 @@
+import importlib
+from types import ModuleType
+from typing import Any
+
+
+class _LazyModule(ModuleType):
+    """
+    Stand-in of a module that imports it on first use, getting and setting attributes on the real module so patches
+    made through any stand-in are seen by everyone.
+    """
+
+    def __getattr__(self, attr: str) -> Any:
+        return getattr(importlib.import_module(self.__name__), attr)
+
+    def __setattr__(self, attr: str, value: Any):
+        setattr(importlib.import_module(self.__name__), attr, value)
+
+    def __delattr__(self, attr: str):
+        delattr(importlib.import_module(self.__name__), attr)
+
+
+def lazy_import(name: str) -> ModuleType:
+    """
+    Import a module (and its parent packages) only when one of its attributes is first used, so heavy dependencies are
+    only loaded by the commands and datasources that actually need them.
+    """
+    return _LazyModule(name)
@@ -0,0 +1,83 @@
+import json
+import logging
+import os
+from collections.abc import Iterable
+from functools import lru_cache
+from importlib.metadata import PackageNotFoundError, version
+
+from django.conf import settings
+
+from pyutils.strings import whitespaces_clean
+from rscraping.data.normalization import lemmatize as _lemmatize
+
+logger = logging.getLogger(__name__)
+
+_precomputed: dict[str, tuple[str, ...]] | None = None
+
+
+def lemmatize(name: str) -> list[str]:
+    """
+    Memoized `rscraping.data.normalization.lemmatize`, served from the precomputed on-disk lemmas for known names.
+    """
+    return list(_lemmatize_normalized(whitespaces_clean(name)))
+
+
+def precompute(names: Iterable[str], path: str | None = None) -> int:
+    """
+    Store the lemmas of the given names in the on-disk cache, replacing the previous one.
+
+    :return: number of distinct names stored
+    """
+    path = path or settings.LEMMAS_PATH
+    lemmas = {key: list(_lemmatize(key)) for key in sorted({whitespaces_clean(name) for name in names} - {""})}
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as file:
+        json.dump({"version": _version(), "lemmas": lemmas}, file, ensure_ascii=False)
+
+    forget()
+    return len(lemmas)
+
+
+def forget():
+    """
+    Drop the in-memory lemmas so the on-disk cache is loaded again.
+    """
+    global _precomputed
+    _precomputed = None
+    _lemmatize_normalized.cache_clear()
+
+
+@lru_cache(maxsize=4096)
+def _lemmatize_normalized(key: str) -> tuple[str, ...]:
+    precomputed = _load_precomputed()
+    if key in precomputed:
+        return precomputed[key]
+    return tuple(_lemmatize(key))
+
+
+def _load_precomputed() -> dict[str, tuple[str, ...]]:
+    global _precomputed
+    if _precomputed is not None:
+        return _precomputed
+
+    _precomputed = {}
+    if not os.path.exists(settings.LEMMAS_PATH):
+        return _precomputed
+
+    with open(settings.LEMMAS_PATH) as file:
+        content = json.load(file)
+    # lemmas computed by another version of the lemmatizer could differ from the stored tokens
+    if content.get("version") != _version():
+        logger.warning(f"ignoring lemmas computed with lemmatizer {content.get('version')}, current is {_version()}")
+        return _precomputed
+
+    _precomputed = {key: tuple(lemmas) for key, lemmas in content["lemmas"].items()}
+    return _precomputed
+
+
+def _version() -> str | None:
+    try:
+        return version("rscraping")
+    except PackageNotFoundError:
+        return None
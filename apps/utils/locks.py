@@ -0,0 +1,20 @@
+from collections.abc import Generator
+from contextlib import contextmanager
+from typing import Any
+
+from django.db import connection, transaction
+
+
+@contextmanager
+def advisory_lock(*keys: Any) -> Generator[None]:
+    """
+    Serialize the code inside the context across processes using a PostgreSQL transaction level advisory lock.
+
+    The lock is held until the surrounding transaction ends, so rows created inside the context are visible to the
+    next process acquiring the same keys.
+    """
+    key = ":".join(str(k) for k in keys)
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_advisory_xact_lock(hashtext(%s))", [key])
+        yield
@@ -2,6 +2,7 @@ import os
 from pathlib import Path
 
 from corsheaders.defaults import default_methods
+from psycopg_pool import ConnectionPool
 
 from config import version
 from config.common import load_env
@@ -24,6 +25,9 @@ STATIC_ROOT = os.path.join(BASE_DIR, "static")
 TEMPLATES_ROOT = os.path.join(BASE_DIR, "templates")
 LOG_ROOT = os.path.join(BASE_DIR, "logs")
 MEDIA_ROOT = os.path.join(BASE_DIR, "media")
+CACHE_ROOT = os.path.join(BASE_DIR, "cache")
+# precomputed lemmas of the known competition names, see `apps.utils.lemmas`
+LEMMAS_PATH = os.path.join(CACHE_ROOT, "lemmas.json")
 
 MEDIA_URL = "/media/"
 STATIC_URL = "/static/"
@@ -41,10 +45,32 @@ DATABASES = {
         "PASSWORD": env.str("DATABASE_PASSWORD"),
         "HOST": env.str("DATABASE_HOST"),
         "PORT": "5432",
+        "OPTIONS": {
+            "client_encoding": "UTF8",
+            # psycopg 3 pool: web workers return the connection after each request while management commands keep
+            # theirs for the whole run. Connections are checked before being handed out.
+            "pool": {
+                "min_size": env.int("DATABASE_POOL_MIN_SIZE", 2),
+                "max_size": env.int("DATABASE_POOL_MAX_SIZE", 10),
+                "timeout": 10,
+                "check": ConnectionPool.check_connection,
+            },
+        },
     },
-    "OPTIONS": {"client_encoding": "UTF8", "timezone": "UTC"},
 }
 
+# optional read replica for the read-only code (speed analytics, exports), reads made less than
+# DATABASE_REPLICA_LAG seconds after our own writes keep going to the primary
+if env.str("DATABASE_REPLICA_HOST", None):
+    DATABASES["replica"] = {
+        **DATABASES["default"],
+        "HOST": env.str("DATABASE_REPLICA_HOST"),
+        "PORT": env.str("DATABASE_REPLICA_PORT", "5432"),
+        "TEST": {"MIRROR": "default"},
+    }
+DATABASE_ROUTERS = ["apps.utils.db.ReplicaRouter"]
+DATABASE_REPLICA_LAG = env.float("DATABASE_REPLICA_LAG", 5)
+
 PASSWORD_HASHERS = [
     "django.contrib.auth.hashers.Argon2PasswordHasher",
     "django.contrib.auth.hashers.PBKDF2PasswordHasher",
@@ -224,6 +250,15 @@ else:
     SECURE_HSTS_PRELOAD = True
     SECURE_HSTS_INCLUDE_SUBDOMAINS = True
 
+    # cached results are invalidated through generation counters (see `apps.utils.cache`), every process (web workers
+    # and management commands) must share the same cache for them to see each other bumps
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.memcached.PyMemcacheCache",
+            "LOCATION": env.str("CACHE_LOCATION", "127.0.0.1:11211"),
+        }
+    }
+
 EMAIL_USE_TLS = True
 EMAIL_HOST = "smtp.gmail.com"
 EMAIL_PORT = 587
@@ -0,0 +1,26 @@
+"""
+Lean settings for management commands (scrapes, rechecks, exports, ...): same database, cache and logging as
+'config.settings' without the admin, the REST API and the rest of the web stack, so commands start faster.
+
+`manage.py` uses it by default for the commands in its `CLI_COMMANDS`, set DJANGO_SETTINGS_MODULE to override it.
+"""
+
+from config.settings import *  # noqa: F403
+from config.settings import INSTALLED_APPS
+
+_WEB_APPS = {
+    "django.contrib.admin",
+    "django.contrib.sessions",
+    "django.contrib.messages",
+    "django.contrib.staticfiles",
+    "corsheaders",
+    "stdimage",
+    "prettyjson",
+    "rest_framework",
+    "drf_spectacular",
+    "django_extensions",
+}
+
+INSTALLED_APPS = [app for app in INSTALLED_APPS if app not in _WEB_APPS]
+MIDDLEWARE = []
+ROOT_URLCONF = "config.urls_cli"
@@ -0,0 +1,2 @@
+# management commands don't serve requests, see 'config.settings_cli'
+urlpatterns = []
@@ -6,9 +6,13 @@ import sys
 
 from config.common import load_env
 
+# commands that don't need the web stack, run with the lean 'config.settings_cli'
+CLI_COMMANDS = {"scrape", "recheck", "export", "lemmas", "benchmark"}
+
 
 def main():
-    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+    is_cli_command = len(sys.argv) > 1 and sys.argv[1] in CLI_COMMANDS
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings_cli" if is_cli_command else "config.settings")
 
     try:
         from django.core.management import execute_from_command_line
@@ -0,0 +1,74 @@
+import os.path
+
+from apps.participants.models import Participant
+from apps.participants.services import ParticipantService
+from apps.utils import cache
+from apps.utils.choices import CATEGORY_ABSOLUT, GENDER_MALE
+from django.conf import settings
+from django.core.cache import cache as default_cache
+from django.test import TestCase, override_settings
+
+
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
+class CacheTest(TestCase):
+    fixtures = [os.path.join(settings.BASE_DIR, "fixtures", "test-db.yaml")]
+
+    def setUp(self):
+        default_cache.clear()
+        self.calls = 0
+
+    def compute(self) -> dict[int, int]:
+        self.calls += 1
+        return {2020: self.calls, 2021: self.calls}
+
+    def test_get_or_compute(self):
+        def get():
+            return cache.get_or_compute("test", "key", self.compute, result_years=lambda value: value.keys())
+
+        self.assertEqual(get(), {2020: 1, 2021: 1})
+        self.assertEqual(get(), {2020: 1, 2021: 1})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            cache.bump("test", 2019)
+        self.assertEqual(get(), {2020: 1, 2021: 1})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            cache.bump("test", 2021)
+        self.assertEqual(get(), {2020: 2, 2021: 2})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            cache.bump("test")
+        self.assertEqual(get(), {2020: 3, 2021: 3})
+        self.assertEqual(self.calls, 3)
+
+    def test_bump_waits_for_commit(self):
+        def get():
+            return cache.get_or_compute("test", "key", self.compute, years=[cache.CLOSED_YEARS])
+
+        self.assertEqual(get(), {2020: 1, 2021: 1})
+        with self.captureOnCommitCallbacks(execute=True):
+            cache.bump("test", 1990)
+            self.assertEqual(get(), {2020: 1, 2021: 1})
+        self.assertEqual(get(), {2020: 2, 2021: 2})
+
+    def test_current_season_bump_keeps_closed_seasons(self):
+        def get():
+            return cache.get_or_compute("test", "key", self.compute, years=[cache.CLOSED_YEARS])
+
+        self.assertEqual(get(), {2020: 1, 2021: 1})
+        with self.captureOnCommitCallbacks(execute=True):
+            cache.bump("test", cache.current_season())
+        self.assertEqual(get(), {2020: 1, 2021: 1})
+
+    def test_participant_save_invalidates_speeds(self):
+        participant = Participant.objects.get(pk=1)
+        args = (participant.club, None, None, GENDER_MALE, CATEGORY_ABSOLUT, 1, False, False, False)
+
+        speeds = ParticipantService.get_year_speeds_filtered_by(*args)
+        with self.assertNumQueries(0):
+            self.assertEqual(ParticipantService.get_year_speeds_filtered_by(*args), speeds)
+
+        participant.distance = participant.distance * 2
+        with self.captureOnCommitCallbacks(execute=True):
+            participant.save()
+        self.assertNotEqual(ParticipantService.get_year_speeds_filtered_by(*args), speeds)
@@ -0,0 +1,26 @@
+from apps.actions.management.commands.benchmark import run_benchmark
+from apps.actions.management.helpers import synthetic
+from apps.participants.models import Participant
+from apps.races.models import Race
+from django.test import TestCase
+
+
+class BenchmarkCommandTest(TestCase):
+    def test_generate(self):
+        dataset = synthetic.generate(scale=0.1, seed=1)
+
+        self.assertEqual(dataset.counts["clubs"], 15)
+        self.assertEqual(dataset.counts["flags"], 40)
+        self.assertEqual(dataset.counts["races"], 300)
+        self.assertEqual(Participant.objects.filter(race__in=dataset.races).count(), dataset.participants)
+        races = Race.objects.filter(pk__in=[r.pk for r in dataset.races])
+        self.assertFalse(races.filter(search_document__isnull=True).exists())
+        self.assertTrue(races.filter(trophy__isnull=False, trophy_edition__isnull=False).exists())
+        self.assertFalse(Participant.objects.filter(race__in=dataset.races, time_cs__isnull=True).exists())
+
+    def test_run_benchmark(self):
+        result = run_benchmark(lambda pk: Race.objects.filter(pk=pk).exists(), [(1,), (2,)], repeat=2)
+
+        self.assertEqual(result["calls"], 4)
+        self.assertEqual(result["queries"], 4)
+        self.assertEqual(result["errors"], 0)
@@ -0,0 +1,53 @@
+import os
+import tempfile
+import time
+
+import inquirer
+import requests
+import responses
+from apps.actions.management.helpers.cassettes import load_cassette, record, replay
+from django.test import TestCase
+
+
+class CassettesTest(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.cassette = os.path.join(self.directory.name, "cassette.json.gz")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_record_and_replay(self):
+        with responses.RequestsMock() as server:
+            server.add(responses.GET, "https://example.com/race?id=1", body="<html>race 1</html>")
+            server.add(responses.GET, "https://example.com/race?id=2", body="<html>race 2</html>")
+            with record(self.cassette):
+                requests.get("https://example.com/race", params={"id": 1})
+                requests.get("https://example.com/race", params={"id": 2})
+
+        self.assertEqual(len(load_cassette(self.cassette)["interactions"]), 2)
+
+        with replay(self.cassette):
+            started = time.perf_counter()
+            time.sleep(10)
+            self.assertLess(time.perf_counter() - started, 1)
+
+            self.assertEqual(requests.get("https://example.com/race", params={"id": 2}).text, "<html>race 2</html>")
+            self.assertEqual(requests.get("https://example.com/race", params={"id": 1}).text, "<html>race 1</html>")
+            with self.assertRaises(requests.ConnectionError):
+                requests.get("https://example.com/race", params={"id": 3})
+
+    def test_replay_answers(self):
+        with record(self.cassette):
+            pass
+
+        answers = os.path.join(self.directory.name, "answers.json")
+        with open(answers, "w") as file:
+            file.write('[true, "42"]')
+
+        with replay(self.cassette, answers_path=answers):
+            self.assertTrue(inquirer.confirm("merge?", default=False))
+            self.assertEqual(inquirer.text("race ID", default=None), "42")
+            self.assertFalse(inquirer.confirm("save?", default=False))
+            with self.assertRaises(RuntimeError):
+                inquirer.list_input("participant", choices=["A", "B"])
@@ -0,0 +1,32 @@
+import requests
+import responses
+from apps.actions.management.helpers.downloads import reuse_downloads, throttle
+from django.test import SimpleTestCase
+
+
+class DownloadsTest(SimpleTestCase):
+    def test_reuse_successful_downloads(self):
+        with responses.RequestsMock() as server:
+            server.add(responses.GET, "https://example.com/race?id=1", status=503)
+            server.add(responses.GET, "https://example.com/race?id=1", body="<html>race 1</html>")
+
+            with reuse_downloads():
+                self.assertEqual(requests.get("https://example.com/race", params={"id": 1}).status_code, 503)
+                self.assertEqual(requests.get("https://example.com/race?id=1").text, "<html>race 1</html>")
+                with requests.Session() as session:
+                    self.assertEqual(session.get("https://example.com/race?id=1").text, "<html>race 1</html>")
+
+            self.assertEqual(len(server.calls), 2)
+
+    def test_throttle_every_sent_request(self):
+        waits = []
+        with responses.RequestsMock() as server:
+            server.add(responses.GET, "https://example.com/race?id=1", body="<html>race 1</html>")
+            server.add(responses.GET, "https://example.com/race?id=2", body="<html>race 2</html>")
+
+            with throttle(lambda: waits.append(1)), reuse_downloads():
+                requests.get("https://example.com/race?id=1")
+                requests.get("https://example.com/race?id=1")
+                requests.get("https://example.com/race?id=2")
+
+        self.assertEqual(len(waits), 2)
@@ -0,0 +1,26 @@
+import os
+import tempfile
+
+import pyarrow.parquet as pq
+from django.conf import settings
+from django.core.management import call_command
+from django.test import TestCase
+
+
+class ExportCommandTest(TestCase):
+    fixtures = [os.path.join(settings.BASE_DIR, "fixtures", "test-db.yaml")]
+
+    def test_export(self):
+        with tempfile.TemporaryDirectory() as output:
+            call_command("export", output, chunk_size=2)
+
+            races = pq.read_table(os.path.join(output, "races"))
+            participants = pq.read_table(os.path.join(output, "participants")).to_pylist()
+
+        self.assertEqual(races.num_rows, 4)
+        self.assertEqual(len(participants), 1)
+        self.assertEqual(participants[0]["year"], 2022)
+        self.assertEqual(participants[0]["gender"], "MALE")
+        self.assertEqual(participants[0]["club_name"], "CLUB REMO RIANXO")
+        self.assertEqual(participants[0]["time_cs"], 136769)
+        self.assertAlmostEqual(participants[0]["speed"], 5556 / 1367.69 * 3.6)
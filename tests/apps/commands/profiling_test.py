@@ -0,0 +1,37 @@
+import os
+import tempfile
+
+from apps.actions.management.helpers.profiling import PROFILE_BOTH, PROFILE_CPU, checkpoint, profile
+from django.test import TestCase
+
+
+class ProfilingTest(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "scrape")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_profile_cpu(self):
+        with profile(self.path, PROFILE_CPU):
+            checkpoint("ignored")
+            sorted(range(1000), reverse=True)
+
+        self.assertTrue(os.path.exists(f"{self.path}.prof"))
+        self.assertTrue(os.path.exists(f"{self.path}.cpu.txt"))
+        self.assertFalse(os.path.exists(f"{self.path}.mem.txt"))
+
+    def test_profile_both(self):
+        with profile(self.path, PROFILE_BOTH, top=5):
+            _ = [str(i) for i in range(1000)]
+            checkpoint("race 1")
+            _ = [str(i) for i in range(1000)]
+            checkpoint("race 2")
+
+        self.assertTrue(os.path.exists(f"{self.path}.prof"))
+        with open(f"{self.path}.mem.txt") as file:
+            report = file.read()
+        self.assertIn("===== race 1", report)
+        self.assertIn("===== race 2", report)
+        self.assertIn("===== TOTAL", report)
@@ -0,0 +1,42 @@
+import json
+import os
+import tempfile
+
+from apps.actions.management.helpers.repair import RepairCommand
+from apps.races.models import Flag
+from django.conf import settings
+from django.test import TestCase, override_settings
+
+
+class FlagRepair(RepairCommand):
+    failing: set[int] = set()
+
+    def get_queryset(self, **_):
+        return Flag.objects.all()
+
+    def fetch(self, flag: Flag):
+        if flag.pk in self.failing:
+            raise ConnectionError("unreachable")
+        return flag.name
+
+    def process(self, flag: Flag, name: str):
+        return []
+
+
+class RepairCommandTest(TestCase):
+    fixtures = [os.path.join(settings.BASE_DIR, "fixtures", "test-db.yaml")]
+
+    def test_failed_fetches_are_retried(self):
+        first, *_, last = Flag.objects.order_by("pk").values_list("pk", flat=True)
+        options = {"chunk_size": 2, "workers": 1, "delay": 0, "dry_run": False, "restart": False}
+
+        with tempfile.TemporaryDirectory() as logs, override_settings(LOG_ROOT=logs):
+            command = FlagRepair()
+            command.failing = {first}
+            command.handle(**options)
+            with open(command.checkpoint_path) as file:
+                self.assertEqual(json.load(file), {"last_pk": last, "failed": [first]})
+
+            command.failing = set()
+            command.handle(**options)
+            self.assertFalse(os.path.exists(command.checkpoint_path))
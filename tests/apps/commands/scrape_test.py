@@ -87,3 +87,12 @@ class ScrapeConfigTests(TestCase):
         options["entity"] = "1"
         config = ScrapeConfig.from_args(**options)
         self.assertEqual(config.entity, Entity.objects.get(pk=1))
+
+    def test_workers_require_all_years(self):
+        options = self.valid_options.copy()
+        options["workers"] = 4
+        with self.assertRaises(AssertionError):
+            ScrapeConfig.from_args(**options)
+        options["year"] = "all"
+        config = ScrapeConfig.from_args(**options)
+        self.assertEqual(config.workers, 4)
@@ -0,0 +1,53 @@
+import os
+import subprocess
+import sys
+
+from django.conf import settings
+from django.test import SimpleTestCase
+
+# modules only some datasources or the web stack need, a command must not pay for them just by starting
+HEAVY_MODULES = [
+    "pandas",
+    "numpy",
+    "cv2",
+    "pytesseract",
+    "openpyxl",
+    "inquirer",
+    "rest_framework",
+    "drf_spectacular",
+    "stdimage",
+    "rscraping.clients",
+    "rscraping.parsers",
+]
+
+
+def import_times(code: str, settings_module: str = "config.settings_cli") -> dict[str, int]:
+    """
+    Run 'code' in a fresh interpreter with `-X importtime` and return the cumulative import time (us) of each module.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import django; django.setup(); {code}"],
+        cwd=settings.BASE_DIR,
+        env=os.environ | {"DJANGO_SETTINGS_MODULE": settings_module},
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, module = line.removeprefix("import time:").split("|")
+        times[module.strip()] = int(cumulative)
+    return times
+
+
+class StartupTest(SimpleTestCase):
+    def test_setup_skips_heavy_modules(self):
+        times = import_times("pass")
+        self.assertFalse(set(HEAVY_MODULES) & times.keys())
+
+    def test_scrape_skips_heavy_modules(self):
+        times = import_times("import apps.actions.management.commands.scrape")
+        self.assertIn("apps.actions.management.commands.scrape", times)
+        self.assertFalse(set(HEAVY_MODULES) & times.keys())
@@ -0,0 +1,34 @@
+from apps.utils.db import REPLICA, ReplicaRouter, read_alias, read_only, read_primary, read_replica
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+from django.test import SimpleTestCase, override_settings
+
+DATABASES_WITH_REPLICA = {**settings.DATABASES, REPLICA: {**settings.DATABASES[DEFAULT_DB_ALIAS]}}
+
+
+class ReplicaRouterTest(SimpleTestCase):
+    def test_without_replica(self):
+        with read_replica():
+            self.assertEqual(read_alias(), DEFAULT_DB_ALIAS)
+
+    @override_settings(DATABASES=DATABASES_WITH_REPLICA, DATABASE_REPLICA_LAG=0)
+    def test_read_only_reads_use_the_replica(self):
+        self.assertEqual(read_alias(), DEFAULT_DB_ALIAS)
+        self.assertEqual(read_only(read_alias)(), REPLICA)
+        with read_replica():
+            self.assertEqual(ReplicaRouter().db_for_read(None), REPLICA)
+
+    @override_settings(DATABASES=DATABASES_WITH_REPLICA, DATABASE_REPLICA_LAG=60)
+    def test_reads_after_writes_use_the_primary(self):
+        router = ReplicaRouter()
+        self.assertEqual(router.db_for_write(None), DEFAULT_DB_ALIAS)
+        with read_replica():
+            self.assertEqual(router.db_for_read(None), DEFAULT_DB_ALIAS)
+
+        with override_settings(DATABASE_REPLICA_LAG=0), read_replica():
+            self.assertEqual(router.db_for_read(None), REPLICA)
+
+    @override_settings(DATABASES=DATABASES_WITH_REPLICA, DATABASE_REPLICA_LAG=0)
+    def test_read_primary_overrides_read_only(self):
+        with read_primary():
+            self.assertEqual(read_only(read_alias)(), DEFAULT_DB_ALIAS)
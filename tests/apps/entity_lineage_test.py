@@ -0,0 +1,63 @@
+import os.path
+
+from apps.entities.models import Entity, EntityLineage, EntityPartnership
+from apps.entities.services import EntityService
+from apps.participants.services import ParticipantService
+from apps.utils.choices import CATEGORY_ABSOLUT, GENDER_MALE
+from django.conf import settings
+from django.test import TestCase, override_settings
+
+
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
+class EntityLineageTest(TestCase):
+    fixtures = [os.path.join(settings.BASE_DIR, "fixtures", "test-db.yaml")]
+
+    def setUp(self):
+        self.club = Entity.objects.get(pk=26)
+        self.parent, self.part = Entity.objects.exclude(pk=self.club.pk)[:2]
+
+    def test_parent_and_partnership(self):
+        self.club.parent = self.parent
+        self.club.save()
+        EntityPartnership.objects.create(target=self.parent, part=self.part)
+
+        self.assertEqual(
+            set(EntityService.get_lineage(self.parent).values_list("pk", flat=True)),
+            {self.parent.pk, self.club.pk, self.part.pk},
+        )
+        self.assertEqual(
+            set(EntityService.get_ancestors(self.club).values_list("pk", flat=True)), {self.club.pk, self.parent.pk}
+        )
+        link = EntityLineage.objects.get(ancestor=self.parent, descendant=self.part)
+        self.assertEqual((link.depth, link.is_partnership), (1, True))
+
+        self.club.parent = None
+        self.club.save()
+        self.assertFalse(EntityLineage.objects.filter(ancestor=self.parent, descendant=self.club).exists())
+
+    def test_new_entity(self):
+        entity = Entity(name="NEW CLUB", normalized_name="NEW CLUB", type=self.club.type)
+        entity.save()
+
+        self.assertEqual(
+            list(EntityLineage.objects.filter(descendant=entity).values_list("ancestor_id", "depth")), [(entity.pk, 0)]
+        )
+
+        entity.parent = self.parent
+        entity.save()
+        self.assertEqual(
+            set(EntityService.get_ancestors(entity).values_list("pk", flat=True)), {entity.pk, self.parent.pk}
+        )
+
+    def test_speeds_expand_lineage(self):
+        def speeds(club: Entity, lineage: bool) -> dict[int, list[float]]:
+            return ParticipantService.get_year_speeds_filtered_by(
+                club, None, None, GENDER_MALE, CATEGORY_ABSOLUT, 1, False, False, False, lineage=lineage
+            )
+
+        self.club.parent = self.parent
+        self.club.save()
+
+        self.assertTrue(speeds(self.club, lineage=False))
+        self.assertEqual(speeds(self.parent, lineage=True), speeds(self.club, lineage=False))
+        self.assertNotEqual(speeds(self.parent, lineage=False), speeds(self.club, lineage=False))
@@ -0,0 +1,54 @@
+import os.path
+from datetime import datetime
+
+from apps.entities.models import Entity
+from apps.participants.models import Participant
+from apps.races.models import Race
+from apps.utils.laps import centiseconds_to_time, parse_lap, parse_laps
+from django.conf import settings
+from django.test import TestCase
+
+
+class LapsTest(TestCase):
+    fixtures = [os.path.join(settings.BASE_DIR, "fixtures", "test-db.yaml")]
+
+    def test_parse_laps(self):
+        laps = ["05:49.00", "11:23.5", "22:47.695", "1:02:03.25"]
+        expected = [datetime.strptime(lap, "%M:%S.%f").time() for lap in laps[:3]]
+
+        self.assertEqual(parse_laps(laps[:3]), expected)
+        self.assertEqual(parse_lap(laps[2]), 136770)
+        self.assertEqual(parse_lap(laps[3]), 372325)
+        self.assertEqual(centiseconds_to_time(136769), datetime.strptime("22:47.69", "%M:%S.%f").time())
+
+    def test_participant_centiseconds_on_save(self):
+        participant = Participant(
+            club=Entity.objects.get(pk=25),
+            race=Race.objects.get(pk=2),
+            distance=5556,
+            laps=[datetime.strptime(lap, "%M:%S.%f").time() for lap in ["05:49.00", "21:30.21"]],
+        )
+        participant.save()
+        participant.refresh_from_db()
+
+        self.assertEqual(participant.laps_cs, [34900, 129021])
+        self.assertEqual(participant.time_cs, 129021)
+
+        participant.laps = []
+        participant.save(update_fields=["laps"])
+        participant.refresh_from_db()
+
+        self.assertEqual(participant.laps_cs, [])
+        self.assertIsNone(participant.time_cs)
+
+    def test_participant_centiseconds_on_bulk_writes(self):
+        participant = Participant.objects.get(pk=1)
+
+        participant.laps = parse_laps(["05:49.00", "21:30.21"])
+        Participant.objects.bulk_update([participant], ["laps"])
+        participant.refresh_from_db()
+        self.assertEqual((participant.laps_cs, participant.time_cs), ([34900, 129021], 129021))
+
+        Participant.objects.filter(pk=participant.pk).update(laps=parse_laps(["21:00.00"]))
+        participant.refresh_from_db()
+        self.assertEqual((participant.laps_cs, participant.time_cs), ([126000], 126000))
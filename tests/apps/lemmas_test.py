@@ -0,0 +1,34 @@
+import os.path
+import tempfile
+from unittest import mock
+
+from apps.utils import lemmas
+from django.test import SimpleTestCase, override_settings
+
+
+class LemmasTest(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "lemmas.json")
+        self.settings = override_settings(LEMMAS_PATH=self.path)
+        self.settings.enable()
+        lemmas.forget()
+
+    def tearDown(self):
+        self.settings.disable()
+        self.directory.cleanup()
+        lemmas.forget()
+
+    def test_memoized(self):
+        with mock.patch.object(lemmas, "_lemmatize", wraps=lemmas._lemmatize) as lemmatizer:
+            tokens = lemmas.lemmatize("BANDEIRA  CONCELLO DE RIANXO")
+            self.assertEqual(lemmas.lemmatize("BANDEIRA CONCELLO DE RIANXO"), tokens)
+            self.assertEqual(lemmas.lemmatize("TROFEO TERESA HERRERA"), lemmas.lemmatize("TROFEO TERESA HERRERA"))
+            self.assertEqual(lemmatizer.call_count, 2)
+
+    def test_precomputed(self):
+        self.assertEqual(lemmas.precompute(["BANDEIRA CONCELLO DE RIANXO", "BANDEIRA  CONCELLO DE RIANXO"]), 1)
+
+        with mock.patch.object(lemmas, "_lemmatize", wraps=lemmas._lemmatize) as lemmatizer:
+            self.assertTrue(lemmas.lemmatize("BANDEIRA CONCELLO DE RIANXO"))
+            lemmatizer.assert_not_called()
@@ -0,0 +1,69 @@
+import os.path
+from datetime import time
+from unittest import mock
+
+from apps.entities.models import Entity
+from apps.participants.models import Participant, Penalty, Position, deferred_refresh
+from apps.participants.services import ParticipantService
+from django.conf import settings
+from django.db import transaction
+from django.test import TestCase
+
+
+class PositionTest(TestCase):
+    fixtures = [os.path.join(settings.BASE_DIR, "fixtures", "test-db.yaml")]
+
+    def test_positions_follow_saves(self):
+        leader = Participant.objects.get(pk=1)
+        Position.refresh([leader.race_id])
+        self.assertEqual(Position.objects.get(pk=leader.pk).position, 1)
+        self.assertEqual(Position.objects.get(pk=leader.pk).gap_cs, 0)
+
+        follower = Participant.objects.get(pk=1)
+        follower.pk = None
+        follower.club = Entity.objects.exclude(pk=leader.club_id).first()
+        follower.laps = [time(0, 23, 0)]
+        with self.captureOnCommitCallbacks(execute=True):
+            follower.save()
+
+        classification = list(ParticipantService.get_classification(leader.race))
+        self.assertEqual([p.participant_id for p in classification], [leader.pk, follower.pk])
+        self.assertEqual(classification[1].position, 2)
+        self.assertEqual(classification[1].gap_cs, follower.time_cs - leader.time_cs)  # pyright: ignore
+        self.assertEqual(classification[1].previous_gap_cs, classification[1].gap_cs)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Penalty.objects.create(participant=leader, disqualification=True)
+        self.assertIsNone(Position.objects.get(pk=leader.pk).position)
+        self.assertEqual(Position.objects.get(pk=follower.pk).position, 1)
+
+    def test_deferred_refresh(self):
+        leader = Participant.objects.get(pk=1)
+        Position.refresh([leader.race_id])
+
+        with self.captureOnCommitCallbacks(execute=True), deferred_refresh():
+            Penalty.objects.create(participant=leader, disqualification=True)
+            self.assertEqual(Position.objects.get(pk=leader.pk).position, 1)
+        self.assertIsNone(Position.objects.get(pk=leader.pk).position)
+
+    def test_bulk_update_refreshes_positions(self):
+        leader = Participant.objects.get(pk=1)
+        Position.refresh([leader.race_id])
+
+        leader.absent = True
+        with self.captureOnCommitCallbacks(execute=True):
+            Participant.objects.bulk_update([leader], ["absent"])
+        self.assertIsNone(Position.objects.get(pk=leader.pk).position)
+
+    def test_rolled_back_refresh_is_dropped(self):
+        leader = Participant.objects.get(pk=1)
+        other = Participant.objects.exclude(race_id=leader.race_id).first()
+        assert other
+
+        with mock.patch.object(Position, "refresh", wraps=Position.refresh) as refresh:
+            with self.captureOnCommitCallbacks(execute=True):
+                with self.assertRaises(ValueError), transaction.atomic():
+                    Penalty.objects.create(participant=leader, disqualification=True)
+                    raise ValueError
+                other.save()
+        refresh.assert_called_once_with({other.race_id})
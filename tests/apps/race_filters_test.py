@@ -0,0 +1,55 @@
+import os.path
+from unittest import mock
+
+from apps.entities.models import League
+from apps.races.filters import RaceFilters
+from apps.races.models import Flag, Race
+from django.conf import settings
+from django.test import TestCase
+
+
+class RaceFiltersTest(TestCase):
+    fixtures = [os.path.join(settings.BASE_DIR, "fixtures", "test-db.yaml")]
+
+    def setUp(self):
+        # fixtures are loaded without calling 'save'
+        Race.refresh_search_documents()
+
+    def test_keywords(self):
+        races = list(RaceFilters(Race.objects.all()).set_keywords("petro liga").build_query())
+
+        self.assertEqual([race.pk for race in races], [1])
+
+    def test_unaccented_keywords(self):
+        races = list(RaceFilters(Race.objects.all()).set_keywords("ria ason").build_query())
+
+        self.assertGreater(len(races), 0)
+        self.assertTrue(all(race.flag and race.flag.name == "BANDERA RÍA DEL ASÓN" for race in races))
+
+    def test_keywords_after_rename(self):
+        flag = Flag.objects.get(pk=85)
+        flag.name = "BANDERA TEST"
+        flag.save()
+
+        self.assertTrue(RaceFilters(Race.objects.all()).set_keywords("test").build_query().filter(pk=1).exists())
+
+    def test_keywords_after_league_rename(self):
+        league = League.objects.get(pk=2)
+        league.name = "LIGA RENOMBRADA"
+        league.save()
+
+        self.assertTrue(RaceFilters(Race.objects.all()).set_keywords("renombrada").build_query().filter(pk=1).exists())
+
+    def test_save_refreshes_document_on_searchable_changes(self):
+        race = Race.objects.get(pk=1)
+        with mock.patch.object(Race, "refresh_search_documents") as refresh:
+            race.save()
+            refresh.assert_not_called()
+
+            race.sponsor = "NUEVO PATROCINADOR"
+            race.save()
+            refresh.assert_called_once()
+
+    def test_keywords_with_query_operators(self):
+        for keywords in ["petro's", "petro | liga", "(petro) & !liga", "petro:* \\ liga"]:
+            list(RaceFilters(Race.objects.all()).set_keywords(keywords).build_query())
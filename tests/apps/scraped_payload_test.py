@@ -0,0 +1,31 @@
+import os.path
+
+from apps.participants.models import Participant
+from apps.races.models import ScrapedPayload
+from apps.schemas import MetadataBuilder
+from django.conf import settings
+from django.test import TestCase
+
+from rscraping.data.models import Datasource
+
+
+class ScrapedPayloadTest(TestCase):
+    fixtures = [os.path.join(settings.BASE_DIR, "fixtures", "test-db.yaml")]
+
+    def test_payload_is_archived_on_save(self):
+        participant = Participant.objects.get(pk=1)
+        participant.metadata = {"datasource": []}
+        participant.add_metadata(
+            MetadataBuilder().datasource_name(Datasource.TRAINERAS).data({"participant": "CR RIANXO"}).build()
+        )
+        participant.save()
+
+        participant = Participant.objects.get(pk=1)
+        self.assertNotIn("data", participant.metadata["datasource"][0])
+        self.assertEqual(participant.get_scraped_data(Datasource.TRAINERAS), {"participant": "CR RIANXO"})
+        self.assertIsNone(participant.get_scraped_data(Datasource.ACT))
+
+        participant.metadata["datasource"][0]["data"] = {"participant": "RIANXO"}
+        ScrapedPayload.archive([participant])
+        self.assertEqual(participant.get_scraped_data(Datasource.TRAINERAS), {"participant": "RIANXO"})
+        self.assertEqual(participant.payloads.count(), 1)
@@ -57,3 +57,9 @@ class CompetitionServiceTest(TestCase):
         flag = Flag.objects.get(pk=4)
         query = "BANDERA DE ELANTXOBEKO"  # Will return "ELANTXOBEKO ESTROPADA"
         self.assertEqual(flag, FlagService.get_closest_by_name(query))
+
+    def test_get_closest_by_name_or_create(self):
+        flag = FlagService.get_closest_by_name_or_create("XYZZY QWERTY")
+        self.assertIsNotNone(flag.pk)
+        self.assertEqual(flag, FlagService.get_closest_by_name_or_create("XYZZY QWERTY"))
+        self.assertEqual(Flag.objects.filter(name="XYZZY QWERTY").count(), 1)
@@ -0,0 +1,45 @@
+import os.path
+
+from apps.races.models import Flag, RaceNameHint, Trophy
+from apps.races.services import HintService
+from django.conf import settings
+from django.test import TestCase
+
+from rscraping.data.models import Datasource
+
+
+class HintServiceTest(TestCase):
+    fixtures = [os.path.join(settings.BASE_DIR, "fixtures", "test-db.yaml")]
+
+    def test_save_and_get_hint(self):
+        flag, trophy = Flag.objects.get(pk=39), Trophy.objects.get(pk=25)
+        name = "ELIMINATORIA TROFEO TERESA HERRERA"
+
+        self.assertIsNone(HintService.get_hint_or_none(Datasource.TRAINERAS, name))
+        HintService.save_hint(Datasource.TRAINERAS, name, flag, trophy)
+
+        self.assertEqual(HintService.get_hint_or_none(Datasource.TRAINERAS, name), (flag, trophy))
+        self.assertIsNone(HintService.get_hint_or_none(Datasource.ACT, name))
+        self.assertEqual(RaceNameHint.objects.get(name=name).hits, 1)
+
+    def test_renamed_competition_invalidates_hint(self):
+        flag = Flag.objects.get(pk=39)
+        HintService.save_hint(Datasource.TRAINERAS, "BANDERA TERESA HERRERA", flag, None)
+
+        flag.save()
+        self.assertIsNotNone(HintService.get_hint_or_none(Datasource.TRAINERAS, "BANDERA TERESA HERRERA"))
+
+        flag.name = f"{flag.name} (RENAMED)"
+        flag.save()
+        self.assertIsNone(HintService.get_hint_or_none(Datasource.TRAINERAS, "BANDERA TERESA HERRERA"))
+
+    def test_replace_hint(self):
+        flag, trophy = Flag.objects.get(pk=39), Trophy.objects.get(pk=25)
+        name = "ELIMINATORIA TROFEO TERESA HERRERA"
+        HintService.save_hint(Datasource.TRAINERAS, name, flag, trophy)
+
+        HintService.save_hint(Datasource.TRAINERAS, name, None, trophy)
+        self.assertEqual(HintService.get_hint_or_none(Datasource.TRAINERAS, name), (None, trophy))
+
+        HintService.save_hint(Datasource.TRAINERAS, name, None, None)
+        self.assertIsNone(HintService.get_hint_or_none(Datasource.TRAINERAS, name))
@@ -8,7 +8,7 @@ from apps.races.models import Race
 from django.conf import settings
 from django.test import TestCase
 
-from rscraping.data.constants import CATEGORY_ABSOLUT, GENDER_MALE, RACE_CONVENTIONAL, RACE_TRAINERA
+from rscraping.data.constants import CATEGORY_ABSOLUT, CATEGORY_SCHOOL, GENDER_MALE, RACE_CONVENTIONAL, RACE_TRAINERA
 from rscraping.data.models import Participant as RSParticipant
 from rscraping.data.models import Race as RSRace
 
@@ -241,3 +241,95 @@ class ParticipantServiceTest(TestCase):
         )
 
         self.assertTrue(ParticipantService.is_same_participant(db_participant, participant))
+
+    def test_get_from_race_snapshot(self):
+        race = Race.objects.get(pk=4)
+        club = Entity.objects.get(pk=25)
+        Participant(club=club, race=race, gender=GENDER_MALE, category=CATEGORY_ABSOLUT).save()
+        branch = Participant(club=club, race=race, gender=GENDER_MALE, category=CATEGORY_ABSOLUT, branch="B")
+        branch.save()
+
+        with self.assertNumQueries(2):  # participants + prefetched penalties
+            snapshot = ParticipantService.get_race_snapshot(race)
+
+        for branch_letter in [None, "B"]:
+            expected = ParticipantService.get_by_race_and_filter_by(
+                race, club=club, gender=GENDER_MALE, category=CATEGORY_ABSOLUT, branch=branch_letter
+            )
+            with self.assertNumQueries(0):
+                participant = ParticipantService.get_from_snapshot_and_filter_by(
+                    snapshot, race, club=club, gender=GENDER_MALE, category=CATEGORY_ABSOLUT, branch=branch_letter
+                )
+            self.assertIsNotNone(participant)
+            self.assertEqual(expected, participant)
+
+    def test_get_possible_branches(self):
+        names = ["ORIO", "ORIO B", "ORIO C", "HONDARRIBIA B", "ZUMAIA", "ZUMAIA D"]
+
+        self.assertEqual(ParticipantService.get_possible_branches(names), {"ORIO B", "ORIO C", "ZUMAIA D"})
+        self.assertEqual(ParticipantService.get_branch("ORIO C"), "C")
+        self.assertIsNone(ParticipantService.get_branch("ORIO"))
+        for name in names:
+            self.assertEqual(ParticipantService.can_be_branch(name, names), name in {"ORIO B", "ORIO C", "ZUMAIA D"})
+
+    def test_find_by_final_time(self):
+        race = Race.objects.get(pk=4)
+        club = Entity.objects.get(pk=25)
+        laps = [datetime.strptime(lap, "%M:%S.%f").time() for lap in ["10:01.10", "20:42.36"]]
+        absolut = Participant(club=club, race=race, laps=laps, gender=GENDER_MALE, category=CATEGORY_ABSOLUT)
+        absolut.save()
+        school = Participant(club=club, race=race, laps=laps, gender=GENDER_MALE, category=CATEGORY_SCHOOL, branch="B")
+        school.save()
+
+        index = ParticipantService.get_final_time_index(ParticipantService.get_by_race(race))
+        participant = RSParticipant(
+            club_name=club.name,
+            participant=club.name,
+            gender=GENDER_MALE,
+            category=CATEGORY_ABSOLUT,
+            lane=1,
+            series=1,
+            handicap=None,
+            laps=["10:01.10", "20:42.36"],
+            distance=5556,
+            retired=False,
+            absent=False,
+            guest=False,
+            race=RSRace(
+                name="XV BANDEIRA CONCELLO DE A POBRA",
+                date="22/08/2020",
+                day=1,
+                modality=RACE_TRAINERA,
+                type=RACE_CONVENTIONAL,
+                league=None,
+                town="A POBRA DO CARAMIÑAL",
+                organizer="CLUB REMO PUEBLA",
+                sponsor=None,
+                normalized_names=[("BANDEIRA CONCELLO DE A POBRA", 15)],
+                race_ids=["11"],
+                url="test",
+                datasource="traineras",
+                gender=GENDER_MALE,
+                category=CATEGORY_ABSOLUT,
+                participants=[],
+                race_laps=6,
+                race_lanes=4,
+                cancelled=False,
+            ),
+        )
+
+        self.assertEqual(ParticipantService.find_by_final_time(index, participant), absolut)
+        self.assertEqual(ParticipantService.find_by_final_time(index, participant, club=club), absolut)
+        self.assertEqual(
+            ParticipantService.find_by_final_time(index, participant, categories=[CATEGORY_SCHOOL, CATEGORY_ABSOLUT]),
+            school,
+        )
+
+        participant.laps = ["20:42.37"]
+        self.assertIsNone(ParticipantService.find_by_final_time(index, participant))
+
+        Participant(club=club, race=race, laps=laps, gender=GENDER_MALE, category=CATEGORY_ABSOLUT, branch="C").save()
+        index = ParticipantService.get_final_time_index(ParticipantService.get_by_race(race))
+        participant.laps = ["20:42.36"]
+        with self.assertRaises(Participant.MultipleObjectsReturned):
+            ParticipantService.find_by_final_time(index, participant)
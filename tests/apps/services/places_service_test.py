@@ -0,0 +1,59 @@
+import os.path
+from unittest import mock
+
+from apps.places import gazetteer
+from apps.places.models import Place, Town
+from apps.places.services import PlacesService
+from apps.utils import cache
+from django.conf import settings
+from django.test import TestCase
+
+
+class PlacesServiceTest(TestCase):
+    fixtures = [os.path.join(settings.BASE_DIR, "fixtures", "test-db.yaml")]
+
+    def setUp(self):
+        self.bueu = Place.objects.create(name="BUEU", town=Town.objects.get(pk=15), known_names=["BUEU"])
+        self.beluso = Place.objects.create(name="BELUSO", town=Town.objects.get(pk=15), known_names=["BELUSO"])
+        self.cangas = Place.objects.create(name="RODEIRA", town=Town.objects.get(pk=19), known_names=["RODEIRA"])
+
+    def test_resolve(self):
+        queries = [
+            ("BUEU", self.bueu),
+            ("Beluso (Pontevedra)", self.beluso),
+            ("CANGAS", self.cangas),
+            ("CANGAS DO MORRAZO", self.cangas),
+            ("NOWHERE AT ALL", None),
+        ]
+        for name, expected in queries:
+            self.assertEqual(PlacesService.resolve(name), expected, name)
+
+        with self.assertNumQueries(0):
+            PlacesService.resolve("BUEU")
+
+    def test_province_disambiguation(self):
+        places = {
+            province: Place.objects.create(
+                name="SANTA CRUZ",
+                town=Town.objects.create(name="SANTA CRUZ", province=province, known_names=["SANTA CRUZ"]),
+                known_names=["SANTA CRUZ"],
+            )
+            for province in ["A CORUÑA", "ASTURIAS"]
+        }
+        self.assertEqual(PlacesService.resolve("SANTA CRUZ, ASTURIAS"), places["ASTURIAS"])
+        self.assertEqual(PlacesService.resolve("SANTA CRUZ (A CORUÑA)"), places["A CORUÑA"])
+
+    def test_invalidated_again_on_commit(self):
+        before = gazetteer.revision()[0]
+        with self.captureOnCommitCallbacks(execute=True):
+            self.bueu.save()
+            self.assertEqual(gazetteer.revision()[0], before + 1)
+        self.assertEqual(gazetteer.revision()[0], before + 2)
+
+    def test_shared_revision_checked_once_per_ttl(self):
+        with mock.patch.object(cache, "generations", wraps=cache.generations) as generations:
+            with mock.patch.object(gazetteer, "SHARED_REVISION_TTL", 0):
+                PlacesService.resolve("BUEU")
+            for _ in range(3):
+                PlacesService.resolve("BUEU")
+        self.assertEqual(generations.call_count, 1)
@@ -0,0 +1,61 @@
+import os.path
+from datetime import time
+
+from apps.entities.models import Entity, League
+from apps.entities.services import LeagueService
+from apps.participants.models import Participant, Standing
+from apps.races.models import Race
+from django.conf import settings
+from django.test import TestCase
+
+
+class StandingTest(TestCase):
+    fixtures = [os.path.join(settings.BASE_DIR, "fixtures", "test-db.yaml")]
+
+    def test_refresh_for_races(self):
+        league = League.objects.first()
+        assert league
+        with self.captureOnCommitCallbacks(execute=True):
+            Race.objects.filter(pk=1).update(league=league)
+        leader = Participant.objects.get(pk=1)
+
+        follower = Participant.objects.get(pk=1)
+        follower.pk = None
+        follower.club = Entity.objects.exclude(pk=leader.club_id).first()
+        follower.laps = [time(0, 23, 0)]
+        with self.captureOnCommitCallbacks(execute=True):
+            follower.save()
+
+        Standing.refresh_for_races([leader.race_id])
+        standings = list(LeagueService.get_standings(league, leader.race.date.year))
+        self.assertEqual(
+            [(s.club_id, s.points, s.position) for s in standings],  # pyright: ignore
+            [
+                (leader.club_id, 2, 1),
+                (follower.club_id, 1, 2),
+            ],
+        )
+
+        Race.objects.filter(pk=1).update(cancelled=True)
+        Standing.refresh_for_races([leader.race_id])
+        self.assertFalse(LeagueService.get_standings(league, leader.race.date.year).exists())
+
+    def test_saves_refresh_standings(self):
+        league, other = League.objects.all()[:2]
+        race = Race.objects.get(pk=1)
+        season = race.date.year
+
+        with self.captureOnCommitCallbacks(execute=True):
+            race.league = league
+            race.save()
+        self.assertTrue(LeagueService.get_standings(league, season).exists())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            race.league = other
+            race.save()
+        self.assertFalse(LeagueService.get_standings(league, season).exists())
+        self.assertTrue(LeagueService.get_standings(other, season).exists())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            race.delete()
+        self.assertFalse(LeagueService.get_standings(other, season).exists())
@@ -1,17 +1,12 @@
 import os.path
-from unittest.mock import patch
 
+import responses
 from apps.actions.management.ingester import TrainerasIngester, build_ingester
 from apps.utils import build_client
 from django.conf import settings
 from django.test import TestCase
 
-from rscraping.data.models import Datasource, dataclass
-
-
-@dataclass
-class Response:
-    content: bytes
+from rscraping.data.models import Datasource
 
 
 class TrainerasIngestionTest(TestCase):
@@ -20,10 +15,13 @@ class TrainerasIngestionTest(TestCase):
         self.ingester = build_ingester(client)
         assert isinstance(self.ingester, TrainerasIngester)
 
-    @patch("requests.get")
-    def test_ingest(self, mock_get):
+    def test_ingest(self):
         with open(os.path.join(settings.BASE_DIR, "fixtures", "ingestion", "multirace_2506.html")) as f:
-            mock_get.return_value = Response(content=f.read().encode("utf-8"))
+            page = f.read()
+
+        with responses.RequestsMock() as server:
+            server.add(responses.GET, self.ingester.client.get_race_details_url("2506"), body=page)
+            races = list(self.ingester._retrieve_race("2506"))
 
-        races = list(self.ingester._retrieve_race("2506"))
-        self.assertEqual(len(races), 3)
+            self.assertEqual(len(races), 3)
+            self.assertEqual(len(server.calls), 1)